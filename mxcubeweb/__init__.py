@@ -14,6 +14,10 @@ import traceback  # noqa: E402
 from mxcubeweb.server import Server as server  # noqa: E402
 from mxcubeweb.app import MXCUBEApplication as mxcube  # noqa: E402
 from mxcubeweb.config import Config  # noqa: E402
+from mxcubeweb.core.components.state_mirror import (  # noqa: E402
+    StateMirror,
+    StatePublisher,
+)
 from mxcubecore import HardwareRepository as HWR  # noqa: E402
 
 sys.modules["Qub"] = mock.Mock()
@@ -99,11 +103,89 @@ def parse_args(argv):
         default=False,
     )
 
+    opt_parser.add_argument(
+        "-p",
+        "--port",
+        dest="port",
+        type=int,
+        help="Port to serve on",
+        default=8081,
+    )
+
+    opt_parser.add_argument(
+        "-F",
+        "--frontend",
+        action="store_true",
+        dest="frontend",
+        help=(
+            "Run a front-end process that only serves Socket.IO connections,"
+            " events are received from the control process through the message"
+            " queue (socketio.message_queue)"
+        ),
+        default=False,
+    )
+
+    opt_parser.add_argument(
+        "-M",
+        "--mirror",
+        action="store_true",
+        dest="mirror",
+        help=(
+            "Run a mirror process that serves the read-only routes from the"
+            " state published by the control process (mirror_interval)"
+        ),
+        default=False,
+    )
+
     # If `argv` is `None`, then `argparse.ArgumentParser.parse_args`
     # will know to read from `sys.argv` instead.
     return opt_parser.parse_args(argv)
 
 
+def find_config_path(hwr_directory):
+    """
+    :param str hwr_directory: Hardware Repository lookup path, directories
+                              separated by os.pathsep
+    :returns: Path of the mxcube-web configuration directory, None if not
+              found. The Hardware Repository is not initialised.
+    """
+    for path in hwr_directory.split(os.path.pathsep):
+        config_path = os.path.join(
+            os.path.abspath(os.path.expanduser(path)), "mxcube-web"
+        )
+
+        if os.path.isdir(config_path):
+            return config_path
+
+    return None
+
+
+def build_frontend_server(cmdline_options, db, test=False):
+    """
+    Builds a server that only serves Socket.IO connections (--frontend)
+    and/or the read-only routes from the state mirrored in Redis <db>
+    (--mirror), without initialising the Hardware Repository. Several
+    front-end processes can serve the clients (for instance observers) of one
+    control process.
+    """
+    cfg = Config(find_config_path(cmdline_options.hwr_directory))
+
+    if cmdline_options.frontend and not cfg.app.socketio.message_queue:
+        print("No message queue (socketio.message_queue) configured, exiting")
+        return None, None
+
+    if test:
+        cfg.flask.USER_DB_PATH = "/tmp/mxcube-test-user.db"
+
+    server.init(cmdline_options, cfg)
+    server.register_frontend_routes(
+        StateMirror(db) if cmdline_options.mirror else None,
+        socketio=cmdline_options.frontend,
+    )
+
+    return server, cfg
+
+
 def build_server_and_config(test=False, argv=None):
     cmdline_options = parse_args(argv)
 
@@ -114,6 +196,9 @@ def build_server_and_config(test=False, argv=None):
         print("No Redis server is running, exiting")
         return None, None
 
+    if cmdline_options.frontend or cmdline_options.mirror:
+        return build_frontend_server(cmdline_options, db, test)
+
     try:
         # This refactoring (with other bits) allows you to pass a 'path1:path2' lookup path
         # as the hwr_directory. I need it for sensible managing of a multi-beamline test set-up
@@ -139,6 +224,12 @@ def build_server_and_config(test=False, argv=None):
         )
 
         server.register_routes(mxcube)
+
+        if cfg.app.mirror_interval > 0:
+            server.state_publisher = StatePublisher(
+                mxcube, StateMirror(db), cfg.app.mirror_interval
+            )
+            server.state_publisher.state_changed()
     except Exception:
         traceback.print_exc()
         raise
@@ -11,6 +11,11 @@ import atexit
 import json
 import time
 
+import functools
+import gevent
+
+from gevent.lock import RLock
+from gevent.pool import Pool
 from pathlib import Path
 from logging import StreamHandler
 from logging.handlers import TimedRotatingFileHandler
@@ -25,6 +30,7 @@ from mxcubeweb.core.util.adapterutils import (
     get_adapter_cls_from_hardware_object,
 )
 from mxcubeweb.core.adapter.adapter_base import AdapterBase
+from mxcubeweb.core.util.pollingutils import Poller
 from mxcubeweb.core.components.component_base import import_component
 from mxcubeweb.core.components.lims import Lims
 from mxcubeweb.core.components.chat import Chat
@@ -54,6 +60,9 @@ class MXCUBECore:
 
     adapter_dict = {}
 
+    # Poller of the hardware objects without reliable signals
+    poller = None
+
     @staticmethod
     def exit_with_error(msg):
         """
@@ -102,6 +111,11 @@ class MXCUBECore:
 
         MXCUBECore.hwr = _hwr
 
+        if MXCUBECore.poller:
+            MXCUBECore.poller.stop()
+
+        MXCUBECore.poller = Poller(app, app.CONFIG.app.poll_concurrency)
+
         try:
             MXCUBECore.beamline = BeamlineAdapter(HWR.beamline, MXCUBEApplication)
             MXCUBECore.adapt_hardware_objects(app)
@@ -115,7 +129,28 @@ class MXCUBECore:
     @staticmethod
     def _get_object_from_id(_id):
         if _id in MXCUBECore.adapter_dict:
-            return MXCUBECore.adapter_dict[_id]["adapter"]
+            item = MXCUBECore.adapter_dict[_id]
+
+            if item["adapter"] is None:
+                MXCUBECore._instantiate_adapter(item)
+
+            return item["adapter"]
+
+    @staticmethod
+    def _instantiate_adapter(item):
+        """
+        Creates the adapter of a hardware object registered with a factory
+        (lazy_adapters), once even if requested by several greenlets
+        """
+        with item["lock"]:
+            if item["adapter"] is None:
+                adapter_cls, adapter_instance, init_time = item["factory"]()
+                logging.getLogger("MX3.HWR").info(
+                    "Adapted %s on first access in %.2f s" % (item["id"], init_time)
+                )
+                item["adapter_cls"] = adapter_cls.__name__
+                item["adapter"] = adapter_instance
+                MXCUBECore.poller.add(adapter_instance)
 
     @staticmethod
     def _get_adapter_id(ho):
@@ -124,7 +159,12 @@ class MXCUBECore:
         return _id.replace(" ", "_").lower()
 
     @staticmethod
-    def _add_adapter(_id, adapter_cls, ho, adapter_instance):
+    def _add_adapter(_id, adapter_cls, ho, adapter_instance, factory=None):
+        """
+        Registers the adapter of <ho>, or when <adapter_instance> is None the
+        function returning (adapter class, adapter, initialization time) that
+        creates it on first access
+        """
         if _id not in MXCUBECore.adapter_dict:
             MXCUBECore.adapter_dict[_id] = {
                 "id": str(_id),
@@ -132,6 +172,12 @@ class MXCUBECore:
                 "ho": ho.name()[1:],
                 "adapter": adapter_instance,
             }
+
+            if adapter_instance is None:
+                MXCUBECore.adapter_dict[_id]["factory"] = factory
+                MXCUBECore.adapter_dict[_id]["lock"] = RLock()
+            elif MXCUBECore.poller:
+                MXCUBECore.poller.add(adapter_instance)
         else:
             logging.getLogger("MX3.HWR").warning(
                 f"Skipping {ho.name()}, id: {_id} already exists"
@@ -141,9 +187,72 @@ class MXCUBECore:
     def get_adapter(_id):
         return MXCUBECore._get_object_from_id(_id)
 
+    @staticmethod
+    def get_adapters():
+        """
+        :returns: dictionary with all adapters by id, the adapters that were
+                  not created yet (lazy_adapters) are created concurrently,
+                  at most adapter_init_concurrency at the same time
+        """
+        pool = Pool(max(MXCUBEApplication.CONFIG.app.adapter_init_concurrency, 1))
+
+        # Creating an adapter can register the adapters of its children
+        while True:
+            pending = [
+                item
+                for item in list(MXCUBECore.adapter_dict.values())
+                if item["adapter"] is None
+            ]
+
+            if not pending:
+                break
+
+            for item in pending:
+                pool.spawn(MXCUBECore._instantiate_adapter, item)
+
+            pool.join()
+
+        return {_id: item["adapter"] for _id, item in MXCUBECore.adapter_dict.items()}
+
+    @staticmethod
+    def _adapt_hardware_object(app, _id, ho, adapter_cls):
+        """
+        Creates the adapter of <ho>, an unavailable AdapterBase if it fails
+        or is not created within adapter_init_timeout seconds
+
+        :returns: tuple (adapter class, adapter, initialization time in seconds)
+        """
+        timeout = app.CONFIG.app.adapter_init_timeout or None
+        t0 = time.perf_counter()
+
+        try:
+            with gevent.Timeout(timeout):
+                adapter_instance = adapter_cls.create(ho, _id, app)
+
+            logging.getLogger("MX3.HWR").info("Added adapter for %s" % _id)
+        except gevent.Timeout:
+            logging.getLogger("MX3.HWR").error(
+                "Adapter for %s not initialized within %s s" % (_id, timeout)
+            )
+            logging.getLogger("MX3.HWR").info("%s not available" % _id)
+            adapter_cls = AdapterBase
+            adapter_instance = AdapterBase(None, _id, app)
+            adapter_instance._available = False
+        except Exception:
+            logging.getLogger("MX3.HWR").exception("Could not add adapter for %s" % _id)
+            logging.getLogger("MX3.HWR").info("%s not available" % _id)
+            adapter_cls = AdapterBase
+            adapter_instance = AdapterBase(None, _id, app)
+
+        return adapter_cls, adapter_instance, time.perf_counter() - t0
+
     @staticmethod
     def adapt_hardware_objects(app):
         hwobject_list = [item for item in MXCUBECore.hwr.hardware_objects]
+        pool = Pool(max(app.CONFIG.app.adapter_init_concurrency, 1))
+        tasks = []
+        init_times = {}
+        t0 = time.perf_counter()
 
         for ho_name in hwobject_list:
             # Go through all hardware objects exposed by mxcubecore
@@ -160,32 +269,54 @@ class MXCUBECore:
             # the object
             adapter_cls = get_adapter_cls_from_hardware_object(ho)
 
-            if adapter_cls:
-                try:
-                    adapter_instance = adapter_cls(ho, _id, app)
-                    logging.getLogger("MX3.HWR").info("Added adapter for %s" % _id)
-                except Exception:
-                    logging.getLogger("MX3.HWR").exception(
-                        "Could not add adapter for %s" % _id
-                    )
-                    logging.getLogger("MX3.HWR").info("%s not available" % _id)
-                    adapter_cls = AdapterBase
-                    adapter_instance = AdapterBase(None, _id, app)
-
-                MXCUBECore._add_adapter(_id, adapter_cls, ho, adapter_instance)
+            if adapter_cls and app.CONFIG.app.lazy_adapters:
+                factory = functools.partial(
+                    MXCUBECore._adapt_hardware_object, app, _id, ho, adapter_cls
+                )
+                MXCUBECore._add_adapter(_id, adapter_cls, ho, None, factory)
+            elif adapter_cls:
+                # Adapter constructors mostly wait on the hardware, they are
+                # run concurrently
+                task = pool.spawn(
+                    MXCUBECore._adapt_hardware_object, app, _id, ho, adapter_cls
+                )
+                tasks.append((_id, ho, task))
             else:
                 logging.getLogger("MX3.HWR").info("No adapter for %s" % _id)
 
+        pool.join()
+
+        # Added in the order of the hardware objects, not of completion
+        for _id, ho, task in tasks:
+            adapter_cls, adapter_instance, init_times[_id] = task.get()
+            MXCUBECore._add_adapter(_id, adapter_cls, ho, adapter_instance)
+
         print(
             make_table(
-                ["Beamline attribute (id)", "Adapter", "HO filename"],
+                ["Beamline attribute (id)", "Adapter", "HO filename", "Init time (s)"],
                 [
-                    [item["id"], item["adapter_cls"], item["ho"]]
+                    [
+                        item["id"],
+                        item["adapter_cls"],
+                        item["ho"],
+                        (
+                            "%.2f" % init_times[item["id"]]
+                            if item["id"] in init_times
+                            else "lazy"
+                            if item["adapter"] is None
+                            else ""
+                        ),
+                    ]
                     for item in MXCUBECore.adapter_dict.values()
                 ],
             )
         )
 
+        logging.getLogger("MX3.HWR").info(
+            "Adapted %s hardware objects in %.2f s"
+            % (len(tasks), time.perf_counter() - t0)
+        )
+
 
 class MXCUBEApplication:
     t0 = time.time()
@@ -298,7 +429,7 @@ class MXCUBEApplication:
             cfg.app.usermanager, package="components.user"
         )
 
-        MXCUBEApplication.queue = Queue(MXCUBEApplication, {})
+        MXCUBEApplication.queue = Queue(MXCUBEApplication, cfg.app.queue)
         MXCUBEApplication.lims = Lims(MXCUBEApplication, {})
         MXCUBEApplication.usermanager = _UserManagerCls(
             MXCUBEApplication, cfg.app.usermanager
@@ -341,6 +472,11 @@ class MXCUBEApplication:
         Connects the signal handlers defined in routes/signals.py to the
         corresponding signals/events
         """
+        if MXCUBEApplication.server.metrics:
+            from mxcubeweb.routes import signals
+
+            MXCUBEApplication.server.metrics.instrument_module(signals)
+
         try:
             MXCUBEApplication.queue.init_signals(HWR.beamline.queue_model)
         except Exception:
@@ -554,8 +690,8 @@ class MXCUBEApplication:
         MXCUBEApplication.SC_CONTENTS = data.get(
             "SC_CONTENTS", {"FROM_CODE": {}, "FROM_LOCATION": {}}
         )
-        MXCUBEApplication.SAMPLE_LIST = data.get(
-            "SAMPLE_LIST", {"sampleList": {}, "sampleOrder": []}
+        MXCUBEApplication.lims.sample_list_set(
+            data.get("SAMPLE_LIST", {"sampleList": {}, "sampleOrder": []})
         )
         MXCUBEApplication.ALLOW_REMOTE = data.get("ALLOW_REMOTE", False)
         MXCUBEApplication.TIMEOUT_GIVES_CONTROL = data.get(
@@ -1,6 +1,5 @@
 from mxcubeweb.core.adapter.adapter_base import ActuatorAdapterBase
 from mxcubeweb.core.util.adapterutils import export
-from mxcubeweb.core.util.networkutils import RateLimited
 
 from mxcubeweb.core.models.adaptermodels import (
     HOActuatorValueChangeModel,
@@ -21,16 +20,11 @@ class ActuatorAdapter(ActuatorAdapterBase):
         """
         super(ActuatorAdapter, self).__init__(ho, *args)
         self._event_rate = 4
-
-        @RateLimited(self._event_rate)
-        def _vc(value, **kwargs):
-            self.value_change(value, **kwargs)
-
-        self._vc = _vc
+        self._vc = self._throttle("valueChanged", self.value_change, self._event_rate)
 
         try:
-            ho.connect("valueChanged", self._value_change)
-            ho.connect("stateChanged", self.state_change)
+            self._connect_signal("valueChanged", self._value_change)
+            self._connect_signal("stateChanged", self.state_change)
         except Exception:
             pass
 
@@ -1,4 +1,6 @@
+import functools
 import inspect
+import time
 import traceback
 import typing
 import logging
@@ -11,8 +13,53 @@ from typing import Any
 from mxcubeweb.core.util.adapterutils import (
     get_adapter_cls_from_hardware_object,
 )
+from mxcubeweb.core.util.networkutils import Throttle
+from mxcubeweb.core.util.pollingutils import MOVING_STATES
 from mxcubeweb.core.models.adaptermodels import HOModel, HOActuatorModel
 
+# Socket.IO room (namespace /hwr) of the clients subscribed to the events of
+# all adapters, clients join it when connecting
+ALL_ADAPTERS_ROOM = "adapter:*"
+
+
+def adapter_room(adapter_id):
+    """
+    Returns:
+        (str): Socket.IO room of the clients subscribed to the events of the
+               adapter with id <adapter_id>, ALL_ADAPTERS_ROOM for "*".
+    """
+    return f"adapter:{adapter_id}"
+
+
+@functools.lru_cache(maxsize=None)
+def _models_from_typehints(func):
+    """
+    Pydantic models of the arguments and of the return value of <func>,
+    created once per function.
+
+    Args:
+        (callable): Function (not bound method) with type hints.
+    Returns:
+        (dict): {"args": model, "return": model, "signature": argument names}
+    """
+    input_dict = {}
+    output_dict = {}
+
+    for _n, _t in typing.get_type_hints(func).items():
+        if _n != "return":
+            input_dict[_n] = (_t, pydantic.Field(alias=_n))
+        else:
+            if not inspect.isclass(_t):
+                _t = _t.__class__
+
+            output_dict[_n] = (_t, pydantic.Field(alias=_n))
+
+    return {
+        "args": pydantic.create_model(func.__name__, **input_dict),
+        "return": pydantic.create_model(func.__name__, **output_dict),
+        "signature": list(input_dict.keys()),
+    }
+
 
 class AdapterBase:
     """Hardware Object Adapter Base class"""
@@ -20,6 +67,42 @@ class AdapterBase:
     ATTRIBUTES = []
     METHODS = []
 
+    # Interval in seconds at which the hardware object is polled, for objects
+    # that do not send valueChanged or stateChanged reliably, 0 to not poll.
+    # Polling is enabled for the objects of a beamline with poll_intervals
+    POLL_INTERVAL = 0
+
+    # Models of ATTRIBUTES and METHODS and the description of METHODS
+    # returned by commands(), built once per class by __init_subclass__
+    _models = {}
+    _command_schemas = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        cls._models = {}
+        cls._command_schemas = {}
+
+        for name in set(cls.ATTRIBUTES) | set(cls.METHODS):
+            func = getattr(cls, name, None)
+
+            if not callable(func):
+                continue
+
+            try:
+                cls._models[name] = _models_from_typehints(func)
+            except NameError:
+                # Type hint not resolvable yet (defined later in the module),
+                # the models are created on first use instead
+                continue
+
+            if name in cls.METHODS:
+                cls._command_schemas[name] = {
+                    "signature": cls._models[name]["signature"],
+                    "schema": cls._models[name]["args"].schema_json(),
+                    "display": False,
+                }
+
     def __init__(self, ho, role, app):
         """
         Args:
@@ -34,6 +117,75 @@ class AdapterBase:
         self._type = type(self).__name__.replace("Adapter", "").upper()
         self._unique = True
         self._msg = ""
+        self._throttles = {}
+        # (value, state) read by the last poll
+        self._polled = None
+        # (signal, handler) connected to the hardware object with
+        # _connect_signal, called by poll
+        self._signal_handlers = []
+        # Last dict() returned by cached_dict, when it was taken and the
+        # number of signals that invalidated it
+        self._cached_dict = None
+        self._cached_at = 0
+        self._invalidations = 0
+
+        # Signals after which the cached dictionary representation is stale,
+        # the handlers of the adapter subclasses are connected as well. It is
+        # also invalidated by each emit_ho_* call, for the other signals
+        if hasattr(ho, "connect"):
+            for signal in ("valueChanged", "stateChanged"):
+                self._connect_signal(signal, self._invalidate_dict)
+
+    @classmethod
+    def create(cls, ho, role, app):
+        """
+        Creates the adapter, the signal handlers its constructor connects to
+        <ho> with _connect_signal are disconnected again if it raises or is
+        interrupted (for instance by a gevent.Timeout).
+
+        Args:
+            (object): Hardware object to mediate for.
+            (str): The name of the object.
+            (MXCUBEApplication): The application.
+        Returns:
+            (AdapterBase): The adapter.
+        """
+        adapter = cls.__new__(cls)
+
+        try:
+            adapter.__init__(ho, role, app)
+        except BaseException:
+            adapter._disconnect_signals()
+            raise
+
+        return adapter
+
+    def _connect_signal(self, signal, handler):
+        """
+        Connects <handler> to <signal> of the hardware object, the handlers
+        connected by the constructor are disconnected again by create if it
+        does not complete.
+
+        Args:
+            (str): Signal name.
+            (callable): Handler.
+        """
+        # Recorded first, the connection can be interrupted
+        self._signal_handlers.append((signal, handler))
+        self._ho.connect(signal, handler)
+
+    def _disconnect_signals(self):
+        """
+        Disconnects the handlers connected with _connect_signal.
+        """
+        for signal, handler in getattr(self, "_signal_handlers", []):
+            try:
+                self._ho.disconnect(signal, handler)
+            except Exception:
+                # Interrupted before the handler was connected
+                pass
+
+        self._signal_handlers = []
 
     def get_adapter_id(self, ho=None):
         ho = self._ho if not ho else ho
@@ -45,11 +197,84 @@ class AdapterBase:
         )
 
         _id = f"{self.get_adapter_id()}.{attr_name}"
-        adapter_instance = adapter_cls(ho, _id, self.app)
+        adapter_instance = adapter_cls.create(ho, _id, self.app)
         self.app.mxcubecore._add_adapter(_id, adapter_cls, ho, adapter_instance)
 
         setattr(self, attr_name, adapter_instance)
 
+    def _throttle(self, name, func, max_per_second):
+        """
+        Creates a Throttle for the signal handler <func> of this adapter, the
+        rate can be set per adapter (id or class name) with event_rates in
+        server.yaml.
+
+        Args:
+            (str): Name of the throttled signal.
+            (callable): Function to throttle.
+            (float): Default maximum number of calls per second.
+        Returns:
+            (Throttle): The throttled function.
+        """
+        event_rates = self.app.CONFIG.app.event_rates if self.app.CONFIG else {}
+        max_per_second = event_rates.get(
+            self._name, event_rates.get(type(self).__name__, max_per_second)
+        )
+
+        self._throttles[name] = Throttle(func, max_per_second)
+
+        return self._throttles[name]
+
+    def poll_interval(self):
+        """
+        Interval at which the hardware object is polled by the Poller, can be
+        set per adapter (id or class name) with poll_intervals in server.yaml.
+
+        Returns:
+            (float): Interval in seconds, 0 to not poll.
+        """
+        poll_intervals = self.app.CONFIG.app.poll_intervals if self.app.CONFIG else {}
+
+        return poll_intervals.get(
+            self._name, poll_intervals.get(type(self).__name__, self.POLL_INTERVAL)
+        )
+
+    def poll(self):
+        """
+        Reads the value and state of the hardware object and passes them to
+        the handlers of the valueChanged and stateChanged signals connected
+        by the adapter, when they changed since the last poll.
+
+        Returns:
+            (tuple): (True if the value or state changed, True if moving).
+        """
+        value = self._ho.get_value() if hasattr(self._ho, "get_value") else None
+        state = self._ho.get_state()
+        last, self._polled = self._polled, (value, state)
+        changed = last is not None and last != self._polled
+
+        if changed:
+            self._invalidate_dict()
+
+        for signal, handler in self._signal_handlers:
+            if changed and signal == "valueChanged" and value != last[0]:
+                handler(value)
+            elif changed and signal == "stateChanged" and state != last[1]:
+                handler(state)
+
+        moving = getattr(state, "name", str(state)) in MOVING_STATES
+
+        return changed, moving
+
+    def event_counters(self):
+        """
+        Returns:
+            (dict): Number of delivered and coalesced events for each
+                    throttled signal.
+        """
+        return {
+            name: throttle.get_counters() for name, throttle in self._throttles.items()
+        }
+
     def _set_value(self):
         pass
 
@@ -173,27 +398,27 @@ class AdapterBase:
         return self._available
 
     def _model_from_typehint(self, attr):
-        input_dict = {}
-        output_dict = {}
+        # Bound methods are created on each access, the models are cached
+        # for the function
+        return _models_from_typehints(getattr(attr, "__func__", attr))
 
-        for _n, _t in typing.get_type_hints(attr).items():
-            if _n != "return":
-                input_dict[_n] = (_t, pydantic.Field(alias=_n))
-            else:
-                if not inspect.isclass(_t):
-                    _t = _t.__class__
+    def _model(self, name):
+        """
+        Args:
+            (str): Name of a method of this adapter.
+        Returns:
+            (dict): Models of method <name>, see _models_from_typehints.
+        """
+        model = self._models.get(name)
 
-                output_dict[_n] = (_t, pydantic.Field(alias=_n))
+        if model is None:
+            model = self._model_from_typehint(getattr(self, name))
 
-        return {
-            "args": pydantic.create_model(attr.__name__, **input_dict),
-            "return": pydantic.create_model(attr.__name__, **output_dict),
-            "signature": list(input_dict.keys()),
-        }
+        return model
 
     def _pydantic_model_for_command(self, cmd_name):
         if cmd_name in self.METHODS:
-            return self._model_from_typehint(getattr(self, cmd_name, None))["args"]
+            return self._model(cmd_name)["args"]
         else:
             return self._ho.pydantic_model[cmd_name]
 
@@ -205,10 +430,10 @@ class AdapterBase:
             exported_methods = self._ho.exported_attributes
 
         for method_name in self.METHODS:
-            attr = getattr(self, method_name, None)
-
-            if attr:
-                model = self._model_from_typehint(attr)
+            if method_name in self._command_schemas:
+                exported_methods[method_name] = dict(self._command_schemas[method_name])
+            elif getattr(self, method_name, None):
+                model = self._model(method_name)
                 exported_methods[method_name] = {
                     "signature": model["signature"],
                     "schema": model["args"].schema_json(),
@@ -227,7 +452,7 @@ class AdapterBase:
             attr = getattr(self, attribute_name, None)
 
             if attr:
-                model = self._model_from_typehint(attr)
+                model = self._model(attribute_name)
                 value = attr()
 
                 try:
@@ -240,13 +465,22 @@ class AdapterBase:
                     )
                     _attributes[attribute_name] = {}
                 else:
-                    _attributes[attribute_name] = attr()
+                    _attributes[attribute_name] = value
 
         return _attributes
 
+    def _rooms(self):
+        """
+        Returns:
+            (list): Socket.IO rooms of the clients subscribed to the events of
+                    this adapter.
+        """
+        return [adapter_room(self._name), ALL_ADAPTERS_ROOM]
+
     def emit_ho_attribute_changed(
         self, attribute: str, value: Any, operation: str = "SET"
     ):
+        self._invalidate_dict()
         self.app.server.emit(
             "hardware_object_attribute_changed",
             {
@@ -256,13 +490,16 @@ class AdapterBase:
                 "operation": operation.upper(),
             },
             namespace="/hwr",
+            to=self._rooms(),
         )
 
     def emit_ho_value_changed(self, value: Any):
+        self._invalidate_dict()
         self.app.server.emit(
             "hardware_object_value_changed",
             {"name": self._name, "value": value},
             namespace="/hwr",
+            to=self._rooms(),
         )
 
     def emit_ho_changed(self, state, **kwargs):
@@ -270,6 +507,7 @@ class AdapterBase:
         Signal handler to be used for sending the entire object to the client via
         socketIO
         """
+        self._invalidate_dict()
         data = self.dict()
 
         if hasattr(state, "name"):
@@ -279,7 +517,9 @@ class AdapterBase:
                 f"emit_ho_changed with {state} for {self._ho.name()}"
             )
 
-        self.app.server.emit("hardware_object_changed", data, namespace="/hwr")
+        self.app.server.emit(
+            "hardware_object_changed", data, namespace="/hwr", to=self._rooms()
+        )
 
     def state_change(self, state, **kwargs):
         """
@@ -333,6 +573,33 @@ class AdapterBase:
     def dict(self):
         return self.data().dict()
 
+    def _invalidate_dict(self, *args, **kwargs):
+        self._cached_dict = None
+        self._invalidations += 1
+
+    def cached_dict(self, max_age):
+        """
+        Dictionary representation of the hardware object, taken again only
+        when the value or state changed since, or after <max_age> seconds
+        (0 to always read it again).
+        Returns:
+            (dict): The dictionary, shared between callers.
+        """
+        now = time.monotonic()
+
+        if self._cached_dict is None or now - self._cached_at >= max_age:
+            invalidations = self._invalidations
+            data = self.dict()
+
+            # Not kept if a signal arrived while the hardware object was read
+            if invalidations == self._invalidations:
+                self._cached_dict = data
+                self._cached_at = now
+
+            return data
+
+        return self._cached_dict
+
 
 class ActuatorAdapterBase(AdapterBase):
     def __init__(self, ho, *args):
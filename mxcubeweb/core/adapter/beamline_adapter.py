@@ -58,17 +58,20 @@ class _BeamlineAdapter:
     def get_object(self, name):
         return self.get_attr_from_path(name)
 
-    def dict(self):
+    def dict(self, max_age=0):
         """
         Build dictionary value-representation for each beamline attribute
+        Args:
+            (float): Age in seconds up to which the representation of an
+                     adapter whose value and state did not change is reused,
+                     0 to read all hardware objects.
          Returns:
            (dict): The dictionary.
         """
         attributes = {}
 
-        for attr_name in self.app.mxcubecore.adapter_dict:
-            _d = self.app.mxcubecore.get_adapter(attr_name).dict()
-            attributes.update({attr_name: _d})
+        for attr_name, adapter in self.app.mxcubecore.get_adapters().items():
+            attributes.update({attr_name: adapter.cached_dict(max_age)})
 
         return {"hardwareObjects": attributes}
 
@@ -19,9 +19,9 @@ class DataPublisherAdapter(AdapterBase):
         self._current_info = {}
 
         try:
-            ho.connect("data", self._new_data_handler)
-            ho.connect("start", self._start_handler)
-            ho.connect("end", self._end_handler)
+            self._connect_signal("data", self._new_data_handler)
+            self._connect_signal("start", self._start_handler)
+            self._connect_signal("end", self._end_handler)
         except Exception:
             msg = "Could not initialize DataPublisherAdapter"
             logging.getLogger("MX3.HWR").exception(msg)
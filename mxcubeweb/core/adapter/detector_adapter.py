@@ -8,7 +8,7 @@ class DetectorAdapter(AdapterBase):
             (object): Hardware object.
         """
         super(DetectorAdapter, self).__init__(ho, *args)
-        ho.connect("stateChanged", self._state_change)
+        self._connect_signal("stateChanged", self._state_change)
 
     def _state_change(self, *args, **kwargs):
         self.state_change(*args, **kwargs)
@@ -11,11 +11,12 @@ class DiffractometerAdapter(AdapterBase):
             (object): Hardware object.
         """
         super(DiffractometerAdapter, self).__init__(ho, *args)
-        ho.connect("stateChanged", self._state_change)
-        ho.connect("valueChanged", self._state_change)
-        ho.connect("phaseChanged", self._diffractometer_phase_changed)
+        self._connect_signal("stateChanged", self._state_change)
+        self._connect_signal("valueChanged", self._state_change)
+        self._connect_signal("phaseChanged", self._diffractometer_phase_changed)
 
     def _diffractometer_phase_changed(self, phase):
+        self._invalidate_dict()
         self.app.server.emit(
             "diff_phase_changed",
             {"msg": "Diffractometer phase changed", "phase": phase},
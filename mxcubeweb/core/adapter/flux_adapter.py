@@ -3,7 +3,6 @@ from decimal import Decimal
 from mxcubecore.BaseHardwareObjects import HardwareObjectState
 
 from mxcubeweb.core.adapter.adapter_base import ActuatorAdapterBase
-from mxcubeweb.core.util.networkutils import RateLimited
 
 
 class FluxAdapter(ActuatorAdapterBase):
@@ -15,14 +14,17 @@ class FluxAdapter(ActuatorAdapterBase):
         super(FluxAdapter, self).__init__(ho, *args, **kwargs)
 
         self._read_only = ho.read_only
+        self._vc = self._throttle("valueChanged", self._emit_value_change, 6)
 
         try:
-            ho.connect("valueChanged", self._value_change)
+            self._connect_signal("valueChanged", self._value_change)
         except Exception:
             pass
 
-    @RateLimited(6)
     def _value_change(self, value, **kwargs):
+        self._vc(**kwargs)
+
+    def _emit_value_change(self, **kwargs):
         value = "{:.2E}".format(Decimal(self._ho.get_value()))
         self.value_change(value, **kwargs)
 
@@ -2,7 +2,6 @@ from mxcubecore.BaseHardwareObjects import HardwareObjectState
 
 from mxcubeweb.core.adapter.adapter_base import ActuatorAdapterBase
 from mxcubeweb.core.models.adaptermodels import HOMachineInfoModel
-from mxcubeweb.core.util.networkutils import RateLimited
 
 
 class MachineInfoAdapter(ActuatorAdapterBase):
@@ -14,14 +13,17 @@ class MachineInfoAdapter(ActuatorAdapterBase):
             (object): Hardware object.
         """
         super().__init__(ho, *args)
-        ho.connect("valueChanged", self._value_change)
+        self._vc = self._throttle("valueChanged", self._emit_value_change, 0.1)
+        self._connect_signal("valueChanged", self._value_change)
         self._unique = True
 
     def _set_value(self, value=None):
         pass
 
-    @RateLimited(0.1)
     def _value_change(self, *args, **kwargs):
+        self._vc(**kwargs)
+
+    def _emit_value_change(self, **kwargs):
         self.value_change(self.get_value(), **kwargs)
 
     def _get_value(self) -> HOMachineInfoModel:
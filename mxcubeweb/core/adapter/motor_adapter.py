@@ -1,5 +1,4 @@
 from mxcubeweb.core.adapter.adapter_base import ActuatorAdapterBase
-from mxcubeweb.core.util.networkutils import RateLimited
 
 from mxcubeweb.core.models.adaptermodels import (
     HOActuatorValueChangeModel,
@@ -14,12 +13,12 @@ class MotorAdapter(ActuatorAdapterBase):
             (object): Hardware object.
         """
         super(MotorAdapter, self).__init__(ho, *args)
-        ho.connect("valueChanged", self._value_change)
-        ho.connect("stateChanged", self.state_change)
+        self._vc = self._throttle("valueChanged", self.value_change, 10)
+        self._connect_signal("valueChanged", self._value_change)
+        self._connect_signal("stateChanged", self.state_change)
 
-    @RateLimited(10)
     def _value_change(self, *args, **kwargs):
-        self.value_change(*args, **kwargs)
+        self._vc(*args, **kwargs)
 
     def _set_value(self, value: HOActuatorValueChangeModel):
         """
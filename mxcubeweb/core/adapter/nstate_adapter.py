@@ -18,8 +18,8 @@ class NStateAdapter(ActuatorAdapterBase):
         super(NStateAdapter, self).__init__(ho, *args)
         self._value_change_model = HOActuatorValueChangeModel
 
-        ho.connect("valueChanged", self._value_change)
-        ho.connect("stateChanged", self.state_change)
+        self._connect_signal("valueChanged", self._value_change)
+        self._connect_signal("stateChanged", self.state_change)
 
     def _value_change(self, value):
         if isinstance(value, Enum):
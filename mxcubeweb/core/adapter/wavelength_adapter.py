@@ -1,5 +1,4 @@
 from mxcubeweb.core.adapter.adapter_base import ActuatorAdapterBase
-from mxcubeweb.core.util.networkutils import RateLimited
 
 from mxcubeweb.core.models.adaptermodels import (
     FloatValueModel,
@@ -20,16 +19,16 @@ class WavelengthAdapter(ActuatorAdapterBase):
         """
         super(WavelengthAdapter, self).__init__(ho, *args)
         self._type = "MOTOR"
+        self._vc = self._throttle("energyChanged", self.value_change, 6)
 
         try:
-            ho.connect("energyChanged", self._value_change)
-            ho.connect("stateChanged", self.state_change)
+            self._connect_signal("energyChanged", self._value_change)
+            self._connect_signal("stateChanged", self.state_change)
         except Exception:
             pass
 
-    @RateLimited(6)
     def _value_change(self, pos, wl, *args, **kwargs):
-        self.value_change(wl)
+        self._vc(wl)
 
     def _set_value(self, value: HOActuatorValueChangeModel):
         """
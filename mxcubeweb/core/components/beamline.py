@@ -137,9 +137,14 @@ class Beamline(ComponentBase):
         data.update(beam_info_dict)
         return data
 
-    def beamline_get_all_attributes(self):
+    def beamline_get_all_attributes(self, refresh=False):
+        """
+        :param bool refresh: Read all hardware objects instead of reusing the
+                             representations of the adapters that did not
+                             change (see beamline_cache_max_age)
+        """
         ho = BeamlineAdapter(HWR.beamline)
-        data = ho.dict()
+        data = ho.dict(0 if refresh else self.app.CONFIG.app.beamline_cache_max_age)
         actions = list()
 
         try:
@@ -282,6 +287,38 @@ class Beamline(ComponentBase):
 
         return beam_info_dict
 
+    def get_event_counters(self):
+        """
+        Returns the number of value change events delivered to the clients and
+        coalesced by the adapters, for the adapters with throttled signals.
+
+        :return: Dictionary with adapter id as key and a dictionary on the form
+                 {signal: {delivered: n, coalesced: n}} as value
+        :rtype: dict
+        """
+        counters = {}
+
+        for _id, item in self.app.mxcubecore.adapter_dict.items():
+            # Adapters not created yet (lazy_adapters) have no counters
+            if item["adapter"] is None:
+                continue
+
+            adapter_counters = item["adapter"].event_counters()
+
+            if adapter_counters:
+                counters[_id] = adapter_counters
+
+        return counters
+
+    def get_poll_stats(self):
+        """
+        Returns the interval, number of polls, errors, changes and durations
+        of the polls of each polled adapter, see Poller.get_stats
+
+        :rtype: dict
+        """
+        return self.app.mxcubecore.poller.get_stats()
+
     def prepare_beamline_for_sample(self):
         if hasattr(HWR.beamline.collect, "prepare_for_new_sample"):
             HWR.beamline.collect.prepare_for_new_sample()
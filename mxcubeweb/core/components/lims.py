@@ -23,6 +23,16 @@ VALID_SAMPLE_NAME_REGEXP = re.compile("^[a-zA-Z0-9:+_-]+$")
 class Lims(ComponentBase):
     def __init__(self, app, config):
         super().__init__(app, config)
+        # Locations of samples whose LIMS or sample changer data changed (or
+        # that were added to the queue) since the last synchronization with
+        # the queue, the data is re-applied to the queue model. None for all
+        # samples
+        self._dirty = None
+        # Locations of samples whose representation in the queue changed
+        # since the last synchronization with the queue
+        self._queue_changed = set()
+        # Incremented each time the sample list is updated from the queue
+        self.sync_generation = 0
 
     def new_sample_list(self):
         return {"sampleList": {}, "sampleOrder": []}
@@ -32,6 +42,7 @@ class Lims(ComponentBase):
 
     def sample_list_set(self, sample_list):
         self.app.SAMPLE_LIST = sample_list
+        self.mark_sample_dirty()
 
     def sample_list_set_order(self, sample_order):
         self.app.SAMPLE_LIST["sampleOrder"] = sample_order
@@ -45,6 +56,32 @@ class Lims(ComponentBase):
 
         return res
 
+    def mark_sample_dirty(self, loc=None):
+        """
+        Marks the LIMS and sample changer data of sample <loc> as changed, the
+        data is applied to the queue sample on the next synchronization. All
+        samples are marked if no location is given.
+
+        :param str loc: Sample location (sampleID)
+        """
+        if loc is None:
+            self._dirty = None
+        elif self._dirty is not None:
+            self._dirty.add(loc)
+
+    def mark_queue_sample_changed(self, loc=None):
+        """
+        Marks the queue representation of sample <loc> as changed, the sample
+        list entry is updated on the next synchronization. All samples are
+        marked if no location is given.
+
+        :param str loc: Sample location (sampleID)
+        """
+        if loc is None:
+            self._queue_changed.update(self.app.SAMPLE_LIST["sampleList"].keys())
+        else:
+            self._queue_changed.add(loc)
+
     def sample_list_sync_sample(self, lims_sample):
         lims_code = lims_sample.get("code", None)
         lims_location = lims_sample.get("lims_location")
@@ -66,42 +103,78 @@ class Lims(ComponentBase):
             self.sample_list_update_sample(loc, lims_sample)
 
     def synch_sample_list_with_queue(self, current_queue=None):
+        """
+        Synchronizes the sample list with the queue. Only the samples marked
+        with mark_sample_dirty or mark_queue_sample_changed since the last
+        synchronization are handled.
+        """
         if not current_queue:
             current_queue = self.app.queue.queue_to_dict(include_lims_data=True)
 
-        current_queue.get("sample_order", [])
+        sample_list = self.app.SAMPLE_LIST["sampleList"]
+
+        if self._dirty is None:
+            dirty = set(sample_list.keys())
+        else:
+            dirty = self._dirty
+
+        # Samples that are not in the queue stay dirty, their data is applied
+        # when they are added
+        apply_locs = [loc for loc in dirty if loc in current_queue]
+        update_locs = [
+            loc
+            for loc in self._queue_changed
+            if loc in current_queue and loc not in dirty
+        ]
+
+        self._dirty = dirty.difference(apply_locs)
+        self._queue_changed = set()
 
-        for loc, data in self.app.SAMPLE_LIST["sampleList"].items():
-            if loc in current_queue:
-                sample = current_queue[loc]
+        for loc in apply_locs + update_locs:
+            data = sample_list.get(loc)
 
-                # Don't synchronize, lims attributes from queue sample, if
-                # they are already set by sc or lims
-                if data.get("sampleName", ""):
-                    sample.pop("sampleName")
+            if data is None:
+                continue
+
+            # Copy, so that the queue representation passed is not modified
+            sample = dict(current_queue[loc])
+
+            # Don't synchronize, lims attributes from queue sample, if
+            # they are already set by sc or lims
+            if data.get("sampleName", ""):
+                sample.pop("sampleName")
 
-                if data.get("proteinAcronym", ""):
-                    sample.pop("proteinAcronym")
+            if data.get("proteinAcronym", ""):
+                sample.pop("proteinAcronym")
 
-                # defaultSubDir and prefix are derived from proteinAcronym
-                # and/or sampleName so make sure that those are removed from
-                # queue sample so that they can be updated if changed.
-                if data.get("proteinAcronym", "") or data.get("sampleName", ""):
-                    sample.pop("defaultPrefix")
-                    sample.pop("defaultSubDir")
+            # defaultSubDir and prefix are derived from proteinAcronym
+            # and/or sampleName so make sure that those are removed from
+            # queue sample so that they can be updated if changed.
+            if data.get("proteinAcronym", "") or data.get("sampleName", ""):
+                sample.pop("defaultPrefix")
+                sample.pop("defaultSubDir")
 
+            if loc in dirty:
                 # Make sure that sample in queue is updated with lims information
-                model, entry = self.app.queue.get_entry(sample["queueID"])
+                model = self.app.queue.get_node(sample["queueID"])
                 model.set_from_dict(data)
 
                 # Update sample location, location is Manual for free pin mode
                 # in MXCuBE Web
                 model.loc_str = data.get("sampleID", -1)
                 model.free_pin_mode = data.get("location", "") == "Manual"
+                self.app.queue.invalidate_queue_dict(model)
 
-                self.sample_list_update_sample(loc, sample)
+            self._sample_list_update_sample(loc, sample)
+
+        if apply_locs or update_locs:
+            self.sync_generation += 1
 
     def sample_list_update_sample(self, loc, sample):
+        self.mark_sample_dirty(loc)
+        return self._sample_list_update_sample(loc, sample)
+
+    def _sample_list_update_sample(self, loc, sample):
         _sample = self.app.SAMPLE_LIST["sampleList"].get(loc, {})
 
         # If sample exists in sample list update it, otherwise add it
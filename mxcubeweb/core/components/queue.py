@@ -1,11 +1,13 @@
 # -*- coding: utf-8 -*-
 import os
 import json
+import gevent
 import pickle as pickle
 import redis
 import itertools
 import logging
 import re
+import time
 
 from mock import Mock
 
@@ -17,11 +19,30 @@ from mxcubecore.model import queue_model_objects as qmo
 from mxcubecore.model import queue_model_enumerables as qme
 
 from mxcubecore import queue_entry as qe
-from mxcubecore.queue_entry.base_queue_entry import QUEUE_ENTRY_STATUS
 
 from mxcubecore.HardwareObjects.Gphl import GphlQueueEntry
 
 from mxcubeweb.core.components.component_base import ComponentBase
+from mxcubeweb.core.components.queue_index import QueueIndex
+from mxcubeweb.core.components.queue_changes import QueueChangeLog
+from mxcubeweb.core.components.queue_execution import (
+    ProgressAggregator,
+    QueueExecution,
+)
+from mxcubeweb.core.components.queue_state import (  # noqa: F401
+    SAMPLE_MOUNTED,
+    COLLECTED,
+    WARNING,
+    FAILED,
+    RUNNING,
+    UNCOLLECTED,
+    READY,
+    QueueStateTable,
+)
+from mxcubeweb.core.components.run_number_allocator import (
+    RunNumberAllocator,
+    build_prefix_path_dict,
+)
 from mxcubeweb.core.util.convertutils import str_to_camel, str_to_snake
 from mxcubeweb.core.models.generic import SimpleNameValue
 
@@ -33,56 +54,62 @@ QUEUE_RUNNING = "QueueRunning"
 QUEUE_STOPPED = "QueueStopped"
 QUEUE_FAILED = "QueueFailed"
 
-SAMPLE_MOUNTED = 0x8
-COLLECTED = 0x4
-WARNING = 0x10
-FAILED = 0x2
-RUNNING = 0x1
-UNCOLLECTED = 0x0
-READY = 0
-
 ORIGIN_MX3 = "MX3"
 
+# Task parameters that are required to add a task of a given type to the
+# queue, see Queue.queue_import
+REQUIRED_TASK_PARAMETERS = {
+    "DataCollection": ["prefix", "first_image", "num_images", "shape", "helical"],
+    "Characterisation": ["prefix", "first_image", "num_images", "shape"],
+    "Interleaved": ["swNumImages", "wedges"],
+    "Workflow": ["wfpath"],
+    "GphlWorkflow": ["wfpath"],
+}
+
+TASK_TYPES = [
+    "DataCollection",
+    "Interleaved",
+    "Characterisation",
+    "Workflow",
+    "GphlWorkflow",
+    "xrf_spectrum",
+    "energy_scan",
+]
+
 
 class Queue(ComponentBase):
     def __init__(self, app, config):
         super().__init__(app, config)
+        # Cached dictionary representation of each sample (and its tasks) in
+        # the queue, keyed on include_lims_data and then on sample node id.
+        # Entries are removed when the corresponding sample subtree changes,
+        # see invalidate_queue_dict
+        self._sample_dict_cache = {False: {}, True: {}}
+        self._cache_root = None
+        self._executing_samples = set()
+        self.index = QueueIndex()
+        self.states = QueueStateTable()
+        self.execution = QueueExecution(self)
+        self.progress = ProgressAggregator(self, config.progress_rate)
+        self.changes = QueueChangeLog(config.change_history)
+        self._changes_pending = False
+        self.run_numbers = RunNumberAllocator()
+        # Nodes added to the queue model while an item is imported, removed
+        # again if the item can not be added entirely, see queue_import
+        self._import_nodes = None
+        # Samples changed while importing, their cached representation is
+        # invalidated once all items are imported
+        self._import_samples = None
 
     def build_prefix_path_dict(self, path_list):
-        prefix_path_dict = {}
-
-        for path in path_list:
-            try:
-                path, run_number, img_number = qmo.PathTemplate.interpret_path(path)
-            except ValueError:
-                logging.getLogger("MX3.HWR").info(
-                    '[QUEUE] Warning, failed to interpret path: "%s", please check path'
-                    % path
-                )
-                path, run_number = (path, 0)
-            if path in prefix_path_dict:
-                prefix_path_dict[path] = max(prefix_path_dict[path], run_number)
-            else:
-                prefix_path_dict[path] = run_number
-
-        return prefix_path_dict
+        return build_prefix_path_dict(path_list)
 
     def get_run_number(self, pt):
-        # Path templates of files not yet written to to disk, we are only
-        # interested in the prefix path
-
-        pt.run_number = HWR.beamline.queue_model.get_next_run_number(pt)
-        start_fname, end_fname = pt.get_first_and_last_file()
-
-        while os.path.isfile(start_fname) or os.path.isfile(end_fname):
-            pt.run_number += 1
-
-            if pt.run_number > 1000:
-                raise RuntimeError("Over a thousand runs of the same collection")
-
-            start_fname, end_fname = pt.get_first_and_last_file()
-
-        return pt.run_number
+        """
+        Sets and returns the next available run number for the path template
+        <pt> of a new task, see RunNumberAllocator
+        """
+        return self.run_numbers.allocate(pt, HWR.beamline.queue_model)
 
     def node_index(self, node):
         """
@@ -167,15 +194,189 @@ class Queue(ComponentBase):
                 task dict can be directly used with the set_from_dict methods of
                 the corresponding node.
         """
-        if not node:
-            node = HWR.beamline.queue_model.get_model_root()
+        root = HWR.beamline.queue_model.get_model_root()
 
-        res = reduce(
+        if not node or node is root:
+            res = self._cached_queue_dict(root, include_lims_data)
+
+            if self.config.cache_check:
+                res = self._check_cached_queue_dict(root, res, include_lims_data)
+        else:
+            res = reduce(
+                lambda x, y: x.update(y) or x,
+                self.queue_to_dict_rec(node, include_lims_data),
+                {},
+            )
+
+        return res
+
+    def _cached_queue_dict(self, root, include_lims_data=False, copy=True):
+        """
+        Assembles the dictionary representation of the entire queue from the
+        cached sample dictionaries, only samples that have changed since the
+        last call are rebuilt.
+
+        The sample dictionaries (and task lists) returned are copies, so that
+        callers can modify them without altering the cache. The cached
+        dictionaries themselves are returned when <copy> is False, they must
+        then not be modified.
+        """
+        if root is not self._cache_root:
+            # New model selected or model cleared, node ids are not valid
+            # anymore
+            self.invalidate_queue_dict()
+            self._cache_root = root
+
+        sample_nodes = root.get_children()
+
+        # The cache only handles the usual queue layout, samples directly
+        # under the root node
+        if not all(isinstance(node, qmo.Sample) for node in sample_nodes):
+            self.app.lims.mark_queue_sample_changed()
+
+            return reduce(
+                lambda x, y: x.update(y) or x,
+                self.queue_to_dict_rec(root, include_lims_data),
+                {},
+            )
+
+        cache = self._sample_dict_cache[include_lims_data]
+        now = time.time()
+        sample_order = []
+        res = {"sample_order": sample_order}
+
+        for node in sample_nodes:
+            cached = cache.get(node._node_id)
+
+            if cached is None or (
+                include_lims_data and now - cached[0] > self.config.lims_data_ttl
+            ):
+                sample = self._handle_sample(node, include_lims_data)[node.loc_str]
+                cached = (now, sample)
+                cache[node._node_id] = cached
+                self.app.lims.mark_queue_sample_changed(node.loc_str)
+
+            sample = cached[1]
+
+            if copy:
+                sample = dict(sample, tasks=list(sample["tasks"]))
+
+            res[node.loc_str] = sample
+
+            if node.is_enabled():
+                sample_order.append(node.loc_str)
+
+        return res if sample_nodes else {}
+
+    def _check_cached_queue_dict(self, root, res, include_lims_data=False):
+        """
+        Compares the cached queue representation <res> with a full rebuild,
+        differences are logged and the cache is reset.
+
+        :returns: The fully rebuilt queue representation
+        """
+        full = reduce(
             lambda x, y: x.update(y) or x,
-            self.queue_to_dict_rec(node, include_lims_data),
+            self.queue_to_dict_rec(root, include_lims_data),
             {},
         )
 
+        if full != res:
+            diff = [
+                key
+                for key in set(full.keys()) | set(res.keys())
+                if full.get(key) != res.get(key)
+            ]
+
+            logging.getLogger("MX3.HWR").warning(
+                "[QUEUE] Cached queue differs from queue model for: %s" % diff
+            )
+
+            for cache in self._sample_dict_cache.values():
+                cache.clear()
+
+        return full
+
+    def invalidate_queue_dict(self, node=None):
+        """
+        Marks the cached representation of the sample that <node> belongs to
+        as outdated, so that it is rebuilt on the next call to queue_to_dict.
+        The entire cache is invalidated if no node is given.
+
+        :param TaskNode node: Node that changed
+        """
+        if node is None:
+            for cache in self._sample_dict_cache.values():
+                cache.clear()
+        else:
+            sample_node = node.get_sample_node()
+
+            if sample_node is not None:
+                for cache in self._sample_dict_cache.values():
+                    cache.pop(sample_node._node_id, None)
+
+        self.schedule_queue_changes()
+
+    def schedule_queue_changes(self):
+        """
+        Publishes the changes made to the queue once the current operation is
+        done, several modifications in a row are sent as one set of changes.
+        """
+        if not self._changes_pending:
+            self._changes_pending = True
+            gevent.spawn_later(0, self.publish_queue_changes)
+
+    def publish_queue_changes(self):
+        """
+        Records the changes made to the queue since they were last published
+        and emits them, as JSON patch operations, with the signal
+        'queue_change' on the /hwr namespace.
+
+        :returns: The current queue version
+        """
+        self._changes_pending = False
+
+        root = HWR.beamline.queue_model.get_model_root()
+
+        try:
+            # The cached sample dictionaries are only replaced when a sample
+            # changes, so unchanged samples are skipped without comparing them
+            change = self.changes.update(self._cached_queue_dict(root, copy=False))
+        except Exception:
+            logging.getLogger("MX3.HWR").exception(
+                "[QUEUE] Could not determine queue changes"
+            )
+        else:
+            if change:
+                self.app.server.emit("queue_change", change, namespace="/hwr")
+
+        return self.changes.version
+
+    def get_queue_changes(self, since):
+        """
+        Changes made to the queue after version <since>
+
+        :param int since: Last queue version known by the client
+        :returns: dictionary on the form:
+                {
+                    version: current queue version,
+                    changes: [{version: version, ops: [operations]}, ...]
+                }
+                or, if the changes are not available anymore, the entire queue
+                {
+                    version: current queue version,
+                    reset: True,
+                    queue: same format as queue_to_dict()
+                }
+        """
+        version = self.publish_queue_changes()
+        changes = self.changes.since(since)
+
+        if changes is None:
+            res = {"version": version, "reset": True, "queue": self.queue_to_dict()}
+        else:
+            res = {"version": version, "changes": changes}
+
         return res
 
     def queue_to_json(self, node=None, include_lims_data=False):
@@ -221,30 +422,18 @@ class Queue(ComponentBase):
         :param TaskNode node: Node to get state for
 
         :returns: tuple containing (enabled, state)
-                where state: {0, 1, 2, 3} = {in_queue, running, success, failed}
-                {'sample': sample, 'idx': index, 'queue_id': node_id}
+                where state is one of UNCOLLECTED (0x0), RUNNING (0x1),
+                FAILED (0x2) and COLLECTED (0x4), see QueueStateTable
         """
         try:
-            node, entry = self.get_entry(node_id)
+            node = self.get_node(node_id)
         except Exception:
             return (True, UNCOLLECTED)
 
-        enabled = node.is_enabled()
-        curr_entry = HWR.beamline.queue_manager.get_current_entry()
-        running = HWR.beamline.queue_manager.is_executing() and (
-            curr_entry == entry or curr_entry == entry._parent_container
-        )
-
-        if entry.status == QUEUE_ENTRY_STATUS.FAILED:
-            state = FAILED
-        elif node.is_executed() or entry.status == QUEUE_ENTRY_STATUS.SUCCESS:
-            state = COLLECTED
-        elif running or entry.status == QUEUE_ENTRY_STATUS.RUNNING:
-            state = RUNNING
-        else:
-            state = UNCOLLECTED
+        if node is None:
+            return (True, UNCOLLECTED)
 
-        return (enabled, state)
+        return (node.is_enabled(), self.states.get_state(node))
 
     def get_queue_state(self):
         """
@@ -254,9 +443,13 @@ class Queue(ComponentBase):
                 {
                     loaded: ID of currently loaded sample,
                     queue: same format as queue_to_dict() but without sample_order,
-                    queueStatus: one of [QUEUE_PAUSED, QUEUE_RUNNING, QUEUE_STOPPED]
+                    queueStatus: one of [QUEUE_PAUSED, QUEUE_RUNNING, QUEUE_STOPPED],
+                    queueVersion: queue version, see get_queue_changes,
+                    sampleListGeneration: number of times the sample list
+                                          was synchronized with the queue
                 }
         """
+        version = self.publish_queue_changes()
         queue = self.queue_to_dict(include_lims_data=True)
         sample_order = queue.get("sample_order", [])
         try:
@@ -284,6 +477,8 @@ class Queue(ComponentBase):
             "queue": sample_order,
             "sampleList": self.app.lims.sample_list_get(current_queue=queue),
             "queueStatus": self.queue_exec_state(),
+            "queueVersion": version,
+            "sampleListGeneration": self.app.lims.sync_generation,
         }
 
         res.update(settings)
@@ -513,7 +708,6 @@ class Queue(ComponentBase):
         parameters["fullPath"] = os.path.join(
             parameters["path"], parameters["fileName"]
         )
-        model, entry = self.get_entry(queueID)
 
         res = {
             "label": "XRF Scan",
@@ -613,7 +807,7 @@ class Queue(ComponentBase):
         return res
 
     def _handle_diffraction_plan(self, node, sample_node):
-        model, entry = self.get_entry(node._node_id)
+        model = self.get_node(node._node_id)
         originID = model.get_origin()
         tasks = []
 
@@ -664,18 +858,13 @@ class Queue(ComponentBase):
     def _handle_sample(self, node, include_lims_data=False):
         location = "Manual" if node.free_pin_mode else node.loc_str
         enabled, state = self.get_node_state(node._node_id)
-        children_states = []
-
-        for child in node.get_children():
-            for _c in child.get_children():
-                child_enabled, child_state = self.get_node_state(_c._node_id)
-                children_states.append(child_state)
+        counters = self.states.get_sample_counters(node)
 
-        if RUNNING in children_states:
+        if counters[RUNNING]:
             state = RUNNING & SAMPLE_MOUNTED
-        elif 3 in children_states:
+        elif counters[FAILED]:
             state = FAILED & SAMPLE_MOUNTED
-        elif all(i == COLLECTED for i in children_states) and len(children_states) > 0:
+        elif counters[COLLECTED] == counters["total"] and counters["total"] > 0:
             state = COLLECTED & SAMPLE_MOUNTED
         else:
             state = UNCOLLECTED
@@ -778,6 +967,21 @@ class Queue(ComponentBase):
 
         return state
 
+    def get_node(self, _id):
+        """
+        Retrieves the model node with id <id>, without its queue entry
+
+        :param int id: Node id of node to retrieve
+        :returns: The model, None if there is no node with id <id>
+        """
+        model = self.index.get_node(_id)
+
+        # Node added without passing through the queue model (and the index)
+        if model is None:
+            model = HWR.beamline.queue_model.get_node(int(_id))
+
+        return model
+
     def get_entry(self, _id):
         """
         Retrieves the model and the queue entry for the model node with id <id>
@@ -786,14 +990,20 @@ class Queue(ComponentBase):
         :returns: The tuple model, entry
         :rtype: Tuple
         """
-        model = HWR.beamline.queue_model.get_node(int(_id))
-        entry = HWR.beamline.queue_manager.get_entry_with_model(model)
+        model, entry = self.index.get(_id)
+
+        # Node added without passing through the queue model (and the index)
+        if model is None:
+            model = HWR.beamline.queue_model.get_node(int(_id))
+            entry = HWR.beamline.queue_manager.get_entry_with_model(model)
+
         return model, entry
 
     def set_enabled_entry(self, qid, enabled):
         model, entry = self.get_entry(qid)
         model.set_enabled(enabled)
         entry.set_enabled(enabled)
+        self.invalidate_queue_dict(model)
 
     def delete_entry(self, entry):
         """
@@ -808,15 +1018,15 @@ class Queue(ComponentBase):
         )
 
     def delete_entry_at(self, item_pos_list):
-        current_queue = self.queue_to_dict()
+        entry_list = []
 
+        # Positions refer to the queue before deletion, so look up all entries
+        # before deleting any of them
         for sid, tindex in item_pos_list:
             if tindex in ["undefined", None]:
-                node_id = current_queue[sid]["queueID"]
-                model, entry = self.get_entry(node_id)
+                model, entry = self.index.get_sample(sid)
             else:
-                node_id = current_queue[sid]["tasks"][int(tindex)]["queueID"]
-                model, entry = self.get_entry(node_id)
+                model, entry = self.index.get_task(sid, tindex)
 
                 # Get the TaskGroup of the item, there is currently only one
                 # task per TaskGroup so we have to remove the entire TaskGroup
@@ -824,6 +1034,9 @@ class Queue(ComponentBase):
                 if not isinstance(entry, qe.TaskGroupQueueEntry):
                     entry = entry.get_container()
 
+            entry_list.append(entry)
+
+        for entry in entry_list:
             self.delete_entry(entry)
 
     def enable_entry(self, id_or_qentry, flag):
@@ -840,10 +1053,12 @@ class Queue(ComponentBase):
         if isinstance(id_or_qentry, qe.BaseQueueEntry):
             id_or_qentry.set_enabled(flag)
             id_or_qentry.get_data_model().set_enabled(flag)
+            self.invalidate_queue_dict(id_or_qentry.get_data_model())
         else:
             model, entry = self.get_entry(id_or_qentry)
             entry.set_enabled(flag)
             model.set_enabled(flag)
+            self.invalidate_queue_dict(model)
 
     def swap_task_entry(self, sid, ti1, ti2):
         """
@@ -854,10 +1069,7 @@ class Queue(ComponentBase):
         :param int ti1: Position of task1 (old position)
         :param int ti2: Position of task2 (new position)
         """
-        current_queue = self.queue_to_dict()
-
-        node_id = current_queue[sid]["queueID"]
-        smodel, sentry = self.get_entry(node_id)
+        smodel, sentry = self.index.get_sample(sid)
 
         # Swap the order in the queue model
         ti2_temp_model = smodel.get_children()[ti2]
@@ -869,7 +1081,8 @@ class Queue(ComponentBase):
         sentry._queue_entry_list[ti2] = sentry._queue_entry_list[ti1]
         sentry._queue_entry_list[ti1] = ti2_temp_entry
 
-        logging.getLogger("MX3.HWR").info("[QUEUE] is:\n%s " % self.queue_to_json())
+        self.invalidate_queue_dict(smodel)
+        self.index.invalidate(smodel)
 
     def move_task_entry(self, sid, ti1, ti2):
         """
@@ -880,10 +1093,7 @@ class Queue(ComponentBase):
         :param int ti1: Position of task1 (old position)
         :param int ti2: Position of task2 (new position)
         """
-        current_queue = self.queue_to_dict()
-
-        node_id = current_queue[sid]["queueID"]
-        smodel, sentry = self.get_entry(node_id)
+        smodel, sentry = self.index.get_sample(sid)
 
         # Swap the order in the queue model
         smodel._children.insert(ti2, smodel._children.pop(ti1))
@@ -891,19 +1101,24 @@ class Queue(ComponentBase):
         # Swap queue entry order
         sentry._queue_entry_list.insert(ti2, sentry._queue_entry_list.pop(ti1))
 
-        logging.getLogger("MX3.HWR").info("[QUEUE] is:\n%s " % self.queue_to_json())
+        self.invalidate_queue_dict(smodel)
+        self.index.invalidate(smodel)
 
     def set_sample_order(self, order):
         """
         Set the sample order of the queue
         :param list sample_order: List of sample ids
         """
-        current_queue = self.queue_to_dict()
-        sid_list = list([sid for sid in order if current_queue.get(sid, False)])
+        model_entry_list = []
 
-        if sid_list:
-            queue_id_list = [current_queue[sid]["queueID"] for sid in sid_list]
-            model_entry_list = [self.get_entry(qid) for qid in queue_id_list]
+        for sid in order:
+            try:
+                model_entry_list.append(self.index.get_sample(sid))
+            except KeyError:
+                # Sample not in queue
+                pass
+
+        if model_entry_list:
             model_list = [model_entry[0] for model_entry in model_entry_list]
             entry_list = [model_entry[1] for model_entry in model_entry_list]
 
@@ -911,11 +1126,11 @@ class Queue(ComponentBase):
             HWR.beamline.queue_model.get_model_root()._children = model_list
             # Set queue entry order
             HWR.beamline.queue_manager._queue_entry_list = entry_list
+            self.index.invalidate()
+            self.schedule_queue_changes()
 
         self.app.lims.sample_list_set_order(order)
 
-        logging.getLogger("MX3.HWR").info("[QUEUE] is:\n%s " % self.queue_to_json())
-
     def queue_add_item(self, item_list):
         """
         Adds the queue items in item_list to the queue. The items in the list can
@@ -934,18 +1149,24 @@ class Queue(ComponentBase):
         Each item (dictionary) describes either a sample or a task.
         """
         self._queue_add_item_rec(item_list, None)
+        self._queue_add_interleaved(item_list[0])
+
+        res = self.queue_to_dict()
 
-        # Handling interleaved data collections, swap interleave task with
-        # the first of the data collections that are used as wedges, and then
-        # remove all collections that were used as wedges
-        for task in item_list[0]["tasks"]:
+        return res
+
+    def _queue_add_interleaved(self, item):
+        """
+        Handling interleaved data collections of sample <item>, swap interleave
+        task with the first of the data collections that are used as wedges,
+        and then remove all collections that were used as wedges
+        """
+        for task in item.get("tasks", []):
             if task["type"] == "Interleaved" and task["parameters"].get(
                 "taskIndexList", False
             ):
-                current_queue = self.queue_to_dict()
-
                 sid = task["sampleID"]
-                interleaved_tindex = len(current_queue[sid]["tasks"]) - 1
+                interleaved_tindex = len(self.index.get_task_nodes(sid)) - 1
 
                 tindex_list = sorted(task["parameters"]["taskIndexList"])
 
@@ -965,9 +1186,183 @@ class Queue(ComponentBase):
                 for ti in reversed(tindex_list):
                     self.delete_entry_at([[sid, int(ti)]])
 
-        res = self.queue_to_dict()
+    def _validate_queue_item(self, item, in_sample=False):
+        """
+        Checks that the queue item (sample or task) <item> contains what is
+        needed to add it to the queue.
 
-        return res
+        :param dict item: Queue item, see queue_add_item
+        :param bool in_sample: True if <item> is a task of a sample item
+        :returns: List of error messages, empty if the item is valid
+        """
+        if not isinstance(item, dict):
+            return ["Item is not a dictionary"]
+
+        item_t = item.get("type", None)
+        errors = []
+
+        if not item_t:
+            return ["Item type missing"]
+
+        if "sampleID" not in item:
+            errors.append("%s: sampleID missing" % item_t)
+
+        if item_t == "Sample":
+            for key in ["location", "sampleName"]:
+                if key not in item:
+                    errors.append("Sample: %s missing" % key)
+
+            if item.get("queueID", False) and not self._node_in_queue(item["queueID"]):
+                errors.append("Sample: %s not in queue" % item["queueID"])
+
+            tasks = item.get("tasks", None) or []
+
+            if not isinstance(tasks, list):
+                errors.append("Sample: tasks is not a list")
+                tasks = []
+
+            for task in tasks:
+                errors.extend(self._validate_queue_item(task, True))
+        else:
+            if item_t not in TASK_TYPES and not hasattr(
+                qe, item_t.title().replace("_", "") + "QueueEntry"
+            ):
+                errors.append("%s: unknown task type" % item_t)
+
+            if not in_sample and not self._node_in_queue(
+                item.get("sampleQueueID", None)
+            ):
+                errors.append("%s: sample not in queue" % item_t)
+
+            params = item.get("parameters", None)
+
+            if not isinstance(params, dict):
+                errors.append("%s: parameters missing" % item_t)
+            else:
+                for key in REQUIRED_TASK_PARAMETERS.get(item_t, []):
+                    if key not in params:
+                        errors.append("%s: parameter %s missing" % (item_t, key))
+
+        return errors
+
+    def _node_in_queue(self, node_id):
+        try:
+            return self.get_entry(int(node_id))[0] is not None
+        except (TypeError, ValueError):
+            return False
+
+    def queue_import(self, item_list):
+        """
+        Adds the samples and tasks in item_list to the queue in one batch, the
+        items are on the same format as for queue_add_item.
+
+        All items are validated before anything is added to the queue, invalid
+        items are reported and skipped without aborting the import. An item
+        that fails while being added is removed from the queue again, so that
+        it is either added entirely or not at all. The changes are published
+        once, with the signal 'queue_change', when all items are added.
+
+        :param list item_list: List of queue items
+        :returns: dictionary on the form:
+                {
+                    added: number of items added,
+                    errors: [{index: position in item_list,
+                              sampleID: sample id of item,
+                              errors: [error messages]}, ...]
+                }
+        """
+        errors = []
+        valid_items = []
+        added = 0
+
+        for index, item in enumerate(item_list):
+            item_errors = self._validate_queue_item(item)
+
+            if item_errors:
+                errors.append(
+                    {
+                        "index": index,
+                        "sampleID": (
+                            item.get("sampleID", None)
+                            if isinstance(item, dict)
+                            else None
+                        ),
+                        "errors": item_errors,
+                    }
+                )
+            else:
+                valid_items.append((index, item))
+
+        # All items are added in one pass, run numbers are allocated from a
+        # single listing of each data directory (RunNumberAllocator) and the
+        # cached representation of each sample is invalidated once, when all
+        # items are added (see queue_model_child_added)
+        self._import_samples = set()
+
+        try:
+            for index, item in valid_items:
+                self._import_nodes = []
+
+                try:
+                    self._queue_add_item_rec([item], None)
+                    self._queue_add_interleaved(item)
+                except Exception as ex:
+                    logging.getLogger("MX3.HWR").exception(
+                        "[QUEUE] Could not import item %s" % index
+                    )
+                    self._remove_import_nodes(self._import_nodes)
+                    errors.append(
+                        {
+                            "index": index,
+                            "sampleID": item.get("sampleID", None),
+                            "errors": [str(ex)],
+                        }
+                    )
+                else:
+                    added += 1
+                finally:
+                    self._import_nodes = None
+        finally:
+            samples, self._import_samples = self._import_samples, None
+
+            for sample in samples:
+                self.invalidate_queue_dict(sample)
+
+        self.publish_queue_changes()
+
+        logging.getLogger("MX3.HWR").info(
+            "[QUEUE] Imported %s items, %s failed" % (added, len(errors))
+        )
+
+        return {"added": added, "errors": errors}
+
+    def _remove_import_nodes(self, nodes):
+        """
+        Removes the nodes added to the queue model while importing an item
+        that could not be added entirely, children are removed with their
+        parent.
+
+        :param list nodes: Nodes in the order they were added
+        """
+        added = set(id(node) for node in nodes)
+
+        for node in reversed(nodes):
+            parent = node.get_parent()
+
+            if parent is not None and id(parent) in added:
+                continue
+
+            entry = HWR.beamline.queue_manager.get_entry_with_model(node)
+
+            try:
+                if entry is not None and entry.get_container() is not None:
+                    self.delete_entry(entry)
+                elif parent is not None:
+                    HWR.beamline.queue_model.del_child(parent, node)
+            except Exception:
+                logging.getLogger("MX3.HWR").exception(
+                    "[QUEUE] Could not remove %s" % node.get_name()
+                )
 
     def _queue_add_item_rec(self, item_list, sample_node_id=None):
         """
@@ -1202,6 +1597,8 @@ class Queue(ComponentBase):
         # run number for existing items.
         if not task_data.get("queueID", ""):
             acq.path_template.run_number = self.get_run_number(acq.path_template)
+        else:
+            self.run_numbers.reserve(acq.path_template)
 
         model.set_enabled(task_data["checked"])
         entry.set_enabled(task_data["checked"])
@@ -1809,6 +2206,8 @@ class Queue(ComponentBase):
         HWR.beamline.queue_model.clear_model("free-pin")
         HWR.beamline.queue_model.clear_model("plate")
         HWR.beamline.queue_model.select_model("ispyb")
+        self.invalidate_queue_dict()
+        self.run_numbers.clear()
 
     def save_queue(self, session, redis=redis.Redis()):
         """
@@ -1848,11 +2247,31 @@ class Queue(ComponentBase):
         added. Handels for instance the addition of reference collections for
         characterisations and workflows.
         """
+        self.index.add_node(parent, child)
+        self.states.add_node(parent, child)
+
+        if self._import_nodes is not None:
+            self._import_nodes.append(child)
+
+        if self._import_samples is not None:
+            self._import_samples.add(child.get_sample_node() or parent)
+        else:
+            self.invalidate_queue_dict(parent)
+
+        # Apply LIMS data to samples added to the queue
+        if isinstance(child, qmo.Sample):
+            self.app.lims.mark_sample_dirty(child.loc_str)
+
+        # Tasks added with a run number, for instance by a workflow
+        pt = child.get_path_template()
+
+        if pt:
+            self.run_numbers.reserve(pt)
+
         parent_model, parent_entry = self.get_entry(parent._node_id)
-        child_model, child_entry = self.get_entry(child._node_id)
 
         # Origin is ORIGIN_MX3 if task comes from MXCuBE-3
-        if child_model.get_origin() != ORIGIN_MX3:
+        if child.get_origin() != ORIGIN_MX3:
             if isinstance(child, qmo.DataCollection):
                 dc_entry = qe.DataCollectionQueueEntry(Mock(), child)
 
@@ -1894,7 +2313,105 @@ class Queue(ComponentBase):
                 self.enable_entry(entry, True)
                 parent_entry.enqueue(entry)
 
+    def queue_model_child_removed(self, parent, child):
+        """
+        Listen to the removal of elements from the queue model ('child_removed')
+        """
+        self.invalidate_queue_dict(child)
+        self.invalidate_queue_dict(parent)
+        self.index.remove_node(parent, child)
+        self.states.remove_node(parent, child)
+        self._release_run_numbers(child)
+
+    def _release_run_numbers(self, node):
+        pt = node.get_path_template()
+
+        if pt:
+            self.run_numbers.release(pt)
+
+        for child in node.get_children():
+            self._release_run_numbers(child)
+
+    def queue_entry_execute_started(self, entry):
+        """
+        Listen to 'queue_entry_execute_started', the state of the tasks of the
+        sample being executed changes.
+        """
+        model = entry.get_data_model()
+        sample_node = model.get_sample_node()
+
+        if sample_node is not None:
+            self._executing_samples.add(sample_node)
+
+        self.states.entry_started(entry)
+        self.execution.entry_started(entry)
+        self.invalidate_queue_dict(model)
+
+    def queue_entry_execute_finished(self, entry, status):
+        """
+        Listen to 'queue_entry_execute_finished', data might have been written
+        to the directory of the task.
+        """
+        model = entry.get_data_model()
+        pt = model.get_path_template()
+
+        if pt:
+            self.run_numbers.rescan(pt.directory)
+
+        context = self.execution.current
+
+        if context is not None and context.entry is entry:
+            self.progress.flush(context)
+
+        self.states.entry_finished(entry, status)
+        self.execution.entry_finished(entry, status)
+        self.invalidate_queue_dict(model)
+
+    def collect_oscillation_failed(self, *args, **kwargs):
+        """
+        Listen to 'collectOscillationFailed', the task being executed failed
+        even if its entry is still running.
+        """
+        context = self.execution.current
+
+        # Progress of the last frames is sent before the final state
+        if context is not None:
+            self.progress.flush(context)
+
+        node = self.states.set_current_state(FAILED)
+
+        if node is not None:
+            self.invalidate_queue_dict(node)
+
+    def collect_oscillation_finished(self, *args, **kwargs):
+        """
+        Listen to 'collectOscillationFinished', the data of the task being
+        executed is collected.
+        """
+        context = self.execution.current
+
+        # Progress of the last frames is sent before the final state
+        if context is not None:
+            self.progress.flush(context)
+
+        node = self.states.set_current_state(COLLECTED)
+
+        if node is not None:
+            self.invalidate_queue_dict(node)
+
+    def queue_execution_ended(self, *args):
+        """
+        Listen to 'queue_execution_finished' and 'queue_stopped', entries that
+        were considered running are not anymore.
+        """
+        for sample_node in self._executing_samples:
+            self.invalidate_queue_dict(sample_node)
+
+        self._executing_samples.clear()
+        self.execution.clear()
+
     def queue_model_diff_plan_available(self, char, collection_list):
+        self.invalidate_queue_dict(char)
         cols = []
         for collection in collection_list:
             if isinstance(collection, qmo.DataCollection):
@@ -1950,21 +2467,20 @@ class Queue(ComponentBase):
         :param str sid: sampleID
         :param int tindex: task index of task within sample with id sampleID
         """
-        current_queue = self.queue_to_dict()
         HWR.beamline.queue_manager.set_pause(False)
 
         if tindex in ["undefined", "None", "null", None]:
-            node_id = current_queue[sid]["queueID"]
-
             # The queue does not run the mount defined by the sample entry if it has no
             # tasks, so in order function as expected; just mount the sample
             if (
-                not len(current_queue[sid]["tasks"])
+                not len(self.index.get_task_nodes(sid))
             ) and sid != self.app.sample_changer.get_current_sample().get(
                 "sampleID", ""
             ):
                 try:
-                    self.app.sample_changer.mount_sample_clean_up(current_queue[sid])
+                    self.app.sample_changer.mount_sample_clean_up(
+                        self.queue_to_dict()[sid]
+                    )
                 except Exception:
                     HWR.beamline.queue_manager.emit("queue_execution_failed", (None,))
                 else:
@@ -1972,9 +2488,9 @@ class Queue(ComponentBase):
             else:
                 enabled_entries = []
 
-                for sampleID in current_queue["sample_order"]:
-                    if current_queue[sampleID].get("checked", False):
-                        enabled_entries.append(sampleID)
+                for node in HWR.beamline.queue_model.get_model_root().get_children():
+                    if isinstance(node, qmo.Sample) and node.is_enabled():
+                        enabled_entries.append(node.loc_str)
 
                 enabled_entries.pop(enabled_entries.index(sid))
                 self.app.TEMP_DISABLED = enabled_entries
@@ -1983,12 +2499,10 @@ class Queue(ComponentBase):
 
                 HWR.beamline.queue_manager.execute()
         else:
-            node_id = current_queue[sid]["tasks"][int(tindex)]["queueID"]
-
-            node, entry = self.get_entry(node_id)
+            node, entry = self.index.get_task(sid, tindex)
             # in order to fill lims data, we execute first the parent (group_id missing)
-            parent_id = node.get_parent()._node_id
-            node, entry = self.get_entry(parent_id)
+            node = node.get_parent()
+            entry = self.index.get_entry(node)
 
             try:
                 HWR.beamline.queue_manager.execute(entry)
@@ -2001,6 +2515,17 @@ class Queue(ComponentBase):
         """
         from mxcubeweb.routes import signals
 
+        HWR.beamline.collect.connect(
+            HWR.beamline.collect,
+            "collectOscillationFailed",
+            self.collect_oscillation_failed,
+        )
+        HWR.beamline.collect.connect(
+            HWR.beamline.collect,
+            "collectOscillationFinished",
+            self.collect_oscillation_finished,
+        )
+
         HWR.beamline.collect.connect(
             HWR.beamline.collect,
             "collectStarted",
@@ -2029,6 +2554,7 @@ class Queue(ComponentBase):
         )
 
         queue.connect(queue, "child_added", self.queue_model_child_added)
+        queue.connect(queue, "child_removed", self.queue_model_child_removed)
 
         queue.connect(
             queue,
@@ -2036,6 +2562,20 @@ class Queue(ComponentBase):
             self.queue_model_diff_plan_available,
         )
 
+        HWR.beamline.queue_manager.connect(
+            "queue_entry_execute_started", self.queue_entry_execute_started
+        )
+
+        HWR.beamline.queue_manager.connect(
+            "queue_entry_execute_finished", self.queue_entry_execute_finished
+        )
+
+        HWR.beamline.queue_manager.connect(
+            "queue_execution_finished", self.queue_execution_ended
+        )
+
+        HWR.beamline.queue_manager.connect("queue_stopped", self.queue_execution_ended)
+
         HWR.beamline.queue_manager.connect(
             "queue_execute_started", signals.queue_execution_started
         )
@@ -2085,11 +2625,9 @@ class Queue(ComponentBase):
         )
 
     def enable_sample_entries(self, sample_id_list, flag):
-        current_queue = self.queue_to_dict()
-
         for sample_id in sample_id_list:
-            sample_data = current_queue[sample_id]
-            self.enable_entry(sample_data["queueID"], flag)
+            model, entry = self.index.get_sample(sample_id)
+            self.enable_entry(entry, flag)
 
     def set_auto_mount_sample(self, automount, current_sample=None):
         """
@@ -2237,7 +2775,7 @@ class Queue(ComponentBase):
         elif data["type"] == "Characterisation":
             self.set_char_params(model, entry, data, sample_model)
 
-        logging.getLogger("MX3.HWR").info("[QUEUE] is:\n%s " % self.queue_to_json())
+        self.invalidate_queue_dict(model)
 
         return model
 
@@ -2246,13 +2784,13 @@ class Queue(ComponentBase):
             self.set_enabled_entry(qid, enabled)
 
     def update_sample(self, sid, params):
-        sample_node = HWR.beamline.queue_model.get_node(sid)
+        sample_node, sample_entry = self.get_entry(sid)
 
         if sample_node:
-            sample_entry = HWR.beamline.queue_manager.get_entry_with_model(sample_node)
             # TODO: update here the model with the new 'params'
             # missing lines...
             sample_entry.set_data_model(sample_node)
+            self.invalidate_queue_dict(sample_node)
             logging.getLogger("MX3.HWR").info("[QUEUE] sample updated")
         else:
             msg = "[QUEUE] Sample with id %s not in queue, can't update" % sid
@@ -2260,9 +2798,7 @@ class Queue(ComponentBase):
             raise Exception(msg)
 
     def toggle_node(self, node_id):
-        node = HWR.beamline.queue_model.get_node(node_id)
-        entry = HWR.beamline.queue_manager.get_entry_with_model(node)
-        queue = self.queue_to_dict()
+        node, entry = self.get_entry(node_id)
 
         if isinstance(entry, qe.SampleQueueEntry):
             # this is a sample entry, thus, go through its checked children and
@@ -2275,11 +2811,8 @@ class Queue(ComponentBase):
                 node.set_enabled(True)
 
             new_state = entry.is_enabled()
-            for elem in queue[node_id]:
-                child_node = HWR.beamline.queue_model.get_node(elem["queueID"])
-                child_entry = HWR.beamline.queue_manager.get_entry_with_model(
-                    child_node
-                )
+            for child_node in self.index.get_task_nodes(node.loc_str):
+                child_entry = self.index.get_entry(child_node)
                 if new_state:
                     child_entry.set_enabled(True)
                     child_node.set_enabled(True)
@@ -2299,18 +2832,15 @@ class Queue(ComponentBase):
             parent_node = parent_node.get_parent()
             if isinstance(parent_node, qmo.TaskGroup):
                 parent_node = parent_node.get_parent()
-            parent = parent_node._node_id
-            parent_entry = HWR.beamline.queue_manager.get_entry_with_model(parent_node)
+            parent_entry = self.index.get_entry(parent_node)
+            siblings = self.index.get_task_nodes(parent_node.loc_str)
             # now that we know the sample parent no matter what is the entry
             # (char, dc) check if the brother&sisters are enabled (and enable the
             # parent)
-            checked = 0
+            checked = any(
+                sibling is not node and sibling.is_enabled() for sibling in siblings
+            )
 
-            for i in queue[parent]:
-                # at least one brother is enabled, no need to change parent
-                if i["queueID"] != node_id and i["checked"] == 1:
-                    checked = 1
-                    break
             if entry.is_enabled():
                 entry.set_enabled(False)
                 node.set_enabled(False)
@@ -2320,14 +2850,13 @@ class Queue(ComponentBase):
                 node.set_enabled(True)
 
             new_state = entry.is_enabled()
-            for met in queue[parent]:
-                if int(met.get("queueID")) == node_id:
-                    if new_state == 0 and checked == 0:
-                        parent_entry.set_enabled(False)
-                        parent_node.set_enabled(False)
-                    elif new_state == 1 and checked == 0:
-                        parent_entry.set_enabled(True)
-                        parent_node.set_enabled(True)
+
+            # at least one brother is enabled, no need to change parent
+            if not checked and any(sibling is node for sibling in siblings):
+                parent_entry.set_enabled(new_state)
+                parent_node.set_enabled(new_state)
+
+        self.invalidate_queue_dict(node)
 
     def add_centring(self, _id, params):
         msg = "[QUEUE] centring add requested with data: " + str(params)
@@ -2337,8 +2866,7 @@ class Queue(ComponentBase):
         cent_entry = qe.SampleCentringQueueEntry()
         cent_entry.set_data_model(cent_node)
         cent_entry.set_queue_controller(self.app.mxcubecore.qm)
-        node = HWR.beamline.queue_model.get_node(int(_id))
-        entry = HWR.beamline.queue_manager.get_entry_with_model(node)
+        node, entry = self.get_entry(_id)
         entry._set_background_color = Mock()
 
         new_node = HWR.beamline.queue_model.add_child_at_id(int(_id), cent_node)
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+from collections import deque
+
+
+def _pointer(*parts):
+    """
+    :returns: JSON pointer (RFC 6901) built from <parts>
+    """
+    return "".join(
+        "/" + str(part).replace("~", "~0").replace("/", "~1") for part in parts
+    )
+
+
+def _diff_dict(old, new, path, exclude=()):
+    ops = []
+
+    for key in old.keys() - new.keys():
+        if key not in exclude:
+            ops.append({"op": "remove", "path": _pointer(*path, key)})
+
+    for key, value in new.items():
+        if key in exclude:
+            continue
+
+        if key not in old:
+            ops.append({"op": "add", "path": _pointer(*path, key), "value": value})
+        elif old[key] != value:
+            ops.append({"op": "replace", "path": _pointer(*path, key), "value": value})
+
+    return ops
+
+
+def _diff_tasks(old_tasks, new_tasks, path):
+    ops = []
+    new_ids = set(task["queueID"] for task in new_tasks)
+    old_by_id = {task["queueID"]: task for task in old_tasks}
+
+    # Removed tasks, from the end so that the indices of the remaining ones
+    # are not changed
+    for index in reversed(range(len(old_tasks))):
+        if old_tasks[index]["queueID"] not in new_ids:
+            ops.append({"op": "remove", "path": _pointer(*path, index)})
+
+    current = [task["queueID"] for task in old_tasks if task["queueID"] in new_ids]
+
+    # Added and moved tasks, applied in order of the new task list
+    for index, task in enumerate(new_tasks):
+        qid = task["queueID"]
+
+        if qid not in old_by_id:
+            ops.append({"op": "add", "path": _pointer(*path, index), "value": task})
+            current.insert(index, qid)
+        elif current[index] != qid:
+            from_index = current.index(qid)
+            ops.append(
+                {
+                    "op": "move",
+                    "from": _pointer(*path, from_index),
+                    "path": _pointer(*path, index),
+                }
+            )
+            current.insert(index, current.pop(from_index))
+
+    # Changed tasks, state, parameters and so on
+    for index, task in enumerate(new_tasks):
+        old_task = old_by_id.get(task["queueID"])
+
+        if old_task is not None and old_task != task:
+            ops.extend(_diff_dict(old_task, task, path + (index,)))
+
+    return ops
+
+
+def diff_queue(old, new):
+    """
+    Computes the changes between two dictionary representations of the
+    queue, as returned by Queue.queue_to_dict.
+
+    :param dict old: Previous queue
+    :param dict new: Current queue
+    :returns: List of JSON patch (RFC 6902) operations that transforms <old>
+              into <new>
+    """
+    ops = []
+
+    if old.get("sample_order", []) != new.get("sample_order", []):
+        ops.append(
+            {
+                "op": "replace" if "sample_order" in old else "add",
+                "path": _pointer("sample_order"),
+                "value": new.get("sample_order", []),
+            }
+        )
+
+    for sid in old.keys() - new.keys():
+        if sid != "sample_order":
+            ops.append({"op": "remove", "path": _pointer(sid)})
+
+    for sid, sample in new.items():
+        if sid == "sample_order":
+            continue
+
+        old_sample = old.get(sid)
+
+        if old_sample is None:
+            ops.append({"op": "add", "path": _pointer(sid), "value": sample})
+        elif old_sample is not sample and old_sample != sample:
+            ops.extend(_diff_dict(old_sample, sample, (sid,), exclude=("tasks",)))
+            ops.extend(
+                _diff_tasks(
+                    old_sample.get("tasks", []),
+                    sample.get("tasks", []),
+                    (sid, "tasks"),
+                )
+            )
+
+    return ops
+
+
+class QueueChangeLog:
+    """
+    Versioned log of the changes made to the queue. Each set of changes is
+    a list of JSON patch operations with a monotonically increasing version,
+    the <history> most recent ones are kept so that clients can catch up.
+    """
+
+    def __init__(self, history=1000):
+        self.version = 0
+        self._changes = deque(maxlen=history)
+        self._queue = None
+
+    def update(self, queue):
+        """
+        Records the changes between the previously seen queue and <queue>.
+        Samples that are the same object as in the previous queue are
+        considered unchanged, <queue> is kept as is and must not be modified.
+
+        :param dict queue: Current queue, as returned by Queue.queue_to_dict
+        :returns: The recorded change on the form
+                  {"version": version, "ops": [operations]} or None if
+                  nothing changed
+        """
+        if self._queue is None:
+            self._queue = queue
+            return None
+
+        ops = diff_queue(self._queue, queue)
+        self._queue = queue
+
+        if not ops:
+            return None
+
+        self.version += 1
+        change = {"version": self.version, "ops": ops}
+        self._changes.append(change)
+
+        return change
+
+    def since(self, version):
+        """
+        :param int version: Last version seen by the client
+        :returns: List of changes made after <version>, None if they are not
+                  all available anymore (or <version> is unknown)
+        """
+        if version > self.version or version < 0:
+            return None
+
+        if version == self.version:
+            return []
+
+        if not self._changes or self._changes[0]["version"] > version + 1:
+            return None
+
+        return [change for change in self._changes if change["version"] > version]
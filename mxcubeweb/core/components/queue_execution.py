@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+import gevent
+import logging
+import time
+
+from mxcubecore import HardwareRepository as HWR
+from mxcubecore.model import queue_model_objects as qmo
+
+from mxcubeweb.core.components.queue_state import COLLECTED, RUNNING
+
+
+class ExecutionContext:
+    """
+    The node of a queue entry being executed, and what the collection signal
+    handlers need to know about it. Created once when the execution of the
+    entry starts so that the handlers, called for every detector frame, only
+    read attributes.
+    """
+
+    def __init__(self, queue, entry):
+        node = entry.get_data_model()
+
+        # Reference collections are orphans, the node we want is the
+        # characterisation not the reference collection itself
+        if "refdc" in node.get_name():
+            parent = node.get_parent()
+            node = parent._children[0]
+
+        self.entry = entry
+        self.node = node
+        self.queue_id = node._node_id
+        self.interleaved = queue.is_interleaved(node)
+        self.sample = None
+        self.idx = None
+        self.sample_node = None
+        self.total_images = None
+
+        try:
+            index = queue.node_index(node)
+        except Exception:
+            logging.getLogger("MX3.HWR").exception(
+                "[QUEUE] Could not get index of node %s" % node
+            )
+        else:
+            self.sample = index["sample"]
+            self.idx = index["idx"]
+            self.sample_node = index["sample_node"]
+
+        if isinstance(node, qmo.Characterisation):
+            dc = node.reference_image_collection
+            num_images = dc.acquisitions[0].acquisition_parameters.num_images
+            self.total_images = float(num_images) * 2
+        elif getattr(node, "acquisitions", None):
+            num_images = node.acquisitions[0].acquisition_parameters.num_images
+            self.total_images = float(num_images)
+
+    def as_dict(self):
+        """
+        :returns: dictionary on the form returned by Queue.node_index, with
+                  the node under the key 'node'
+        """
+        return {
+            "sample": self.sample,
+            "idx": self.idx,
+            "queue_id": self.queue_id,
+            "sample_node": self.sample_node,
+            "node": self.node,
+        }
+
+    def progress(self, pdata):
+        """
+        Same as Queue.get_task_progress for the node being executed
+
+        :param pdata: Frame number, or dictionary with the keys current_idx,
+                      sw_size and nitems for interleaved collections
+        :returns: Progress between 0 and 1
+        """
+        if self.node.is_executed():
+            return 1
+        elif self.interleaved:
+            return (
+                (pdata["current_idx"] + 1)
+                * pdata["sw_size"]
+                / float(pdata["nitems"] * pdata["sw_size"])
+            )
+        elif self.total_images:
+            return pdata / self.total_images
+
+        return 0
+
+
+class QueueExecution:
+    """
+    Stack of the contexts of the queue entries being executed, in the same
+    order as queue_manager._current_queue_entries. Contexts are pushed when
+    'queue_entry_execute_started' is emitted and removed on
+    'queue_entry_execute_finished'.
+    """
+
+    def __init__(self, queue):
+        self._queue = queue
+        self._contexts = []
+
+    def entry_started(self, entry):
+        self._contexts.append(ExecutionContext(self._queue, entry))
+
+    def entry_finished(self, entry, *args):
+        # The queue manager emits 'queue_entry_execute_finished' more than
+        # once for aborted entries
+        for context in reversed(self._contexts):
+            if context.entry is entry:
+                self._contexts.remove(context)
+                break
+
+    def clear(self, *args):
+        self._contexts = []
+
+    @property
+    def current(self):
+        """
+        :returns: ExecutionContext of the entry being executed, the last one
+                  started, None if nothing is executed
+        """
+        if self._contexts:
+            return self._contexts[-1]
+
+        # Entry started before the signals were connected
+        entries = HWR.beamline.queue_manager._current_queue_entries
+
+        if entries:
+            self._contexts.append(ExecutionContext(self._queue, entries[-1]))
+            return self._contexts[-1]
+
+        return None
+
+
+class ProgressAggregator:
+    """
+    Coalesces the frame progress of the tasks being executed.
+
+    Detector frame callbacks only record the latest frame, a greenlet
+    publishes the progress of all tasks with new frames <rate> times per
+    second. The progress of a task is published at once when its last frame
+    is taken and it is flushed with flush before its final state is sent, so
+    that the last update is never lost or received after the final state.
+    """
+
+    def __init__(self, queue, rate=1):
+        self._queue = queue
+        self._interval = 1.0 / rate
+        # queue id -> (context, latest frame data)
+        self._pending = {}
+        self._task = None
+        self._last_tick = (time.time(), 0)
+        self.frames = 0
+        self.coalesced = 0
+        self.published = 0
+        self.frame_rate = 0
+
+    def frame_taken(self, context, pdata):
+        """
+        Records frame <pdata> of the task with context <context>, to be called
+        for every frame taken.
+        """
+        self.frames += 1
+
+        if context.queue_id in self._pending:
+            self.coalesced += 1
+
+        self._pending[context.queue_id] = (context, pdata)
+
+        if context.total_images and not context.interleaved:
+            if pdata >= context.total_images:
+                self.flush(context)
+                return
+
+        if self._task is None:
+            self._last_tick = (time.time(), self.frames)
+            self._task = gevent.spawn(self._run)
+
+    def _run(self):
+        try:
+            while self._pending:
+                gevent.sleep(self._interval)
+                self._update_frame_rate()
+                self.publish()
+        finally:
+            self._task = None
+            self.frame_rate = 0
+
+    def _update_frame_rate(self):
+        now = time.time()
+        last_time, last_frames = self._last_tick
+
+        if now > last_time:
+            self.frame_rate = (self.frames - last_frames) / (now - last_time)
+
+        self._last_tick = (now, self.frames)
+
+    def _emit(self, context, pdata):
+        progress = context.progress(pdata)
+
+        msg = {
+            "Signal": "collectImageTaken",
+            "Message": "Image acquired",
+            "taskIndex": context.idx,
+            "queueID": context.queue_id,
+            "sample": context.sample,
+            "state": RUNNING if progress < 1 else COLLECTED,
+            "progress": progress,
+        }
+
+        logging.getLogger("HWR").debug("[TASK CALLBACK] " + str(msg))
+
+        try:
+            self._queue.app.server.emit("task", msg, namespace="/hwr")
+        except Exception:
+            logging.getLogger("HWR").error("error sending message: " + str(msg))
+
+        self.published += 1
+
+    def publish(self):
+        """
+        Publishes the progress of all tasks with frames taken since the last
+        time
+        """
+        pending = self._pending
+        self._pending = {}
+
+        for context, pdata in pending.values():
+            self._emit(context, pdata)
+
+    def flush(self, context):
+        """
+        Publishes the progress of the task with context <context> if it has
+        frames that are not published
+        """
+        pending = self._pending.pop(context.queue_id, None)
+
+        if pending is not None:
+            self._emit(*pending)
+
+    def get_metrics(self):
+        """
+        :returns: dictionary on the form:
+                {
+                    frames: number of frames taken,
+                    frameRate: frames per second during the last period,
+                    coalesced: number of frames whose progress was not
+                               published on its own,
+                    published: number of progress updates published,
+                    pending: number of tasks with progress to publish
+                }
+        """
+        return {
+            "frames": self.frames,
+            "frameRate": self.frame_rate,
+            "coalesced": self.coalesced,
+            "published": self.published,
+            "pending": len(self._pending),
+        }
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+from mxcubecore import HardwareRepository as HWR
+from mxcubecore.model import queue_model_objects as qmo
+
+# Node types that are represented as a task in the dictionary representation
+# of the queue, see Queue.queue_to_dict_rec
+TASK_NODE_TYPES = (
+    qmo.Characterisation,
+    qmo.Workflow,
+    qmo.GphlWorkflow,
+    qmo.XRFSpectrum,
+    qmo.EnergyScan,
+)
+
+
+def is_task_node(node):
+    """
+    :returns: True if <node> is a task in the dictionary representation of
+              the queue, False if it is a container that is traversed
+    """
+    if isinstance(node, TASK_NODE_TYPES) or node.__class__ is qmo.DataCollection:
+        return True
+
+    if isinstance(node, qmo.TaskGroup) and node.interleave_num_images:
+        return True
+
+    return isinstance(node, qmo.TaskNode) and bool(node.task_data)
+
+
+def task_nodes(node):
+    """
+    Flattened list of task nodes under <node>, the position of a node in the
+    list is its task index (taskIndex) in the dictionary representation of
+    the queue.
+
+    :param TaskNode node: Node to get tasks for (usually a Sample)
+    :returns: List of TaskNode
+    """
+    result = []
+
+    for child in node.get_children():
+        if is_task_node(child):
+            result.append(child)
+        else:
+            result.extend(task_nodes(child))
+
+    return result
+
+
+class QueueIndex:
+    """
+    Index of the nodes in HWR.beamline.queue_model and their queue entries.
+
+    Maps node ids, sample ids (as used by the client) and task positions to
+    (model, entry) tuples without searching the queue model or the queue
+    entries. The index is kept in sync with the queue model through add_node
+    and remove_node, connected to the 'child_added' and 'child_removed'
+    signals, and through invalidate for changes made directly on the model
+    (re-ordering of nodes).
+    """
+
+    def __init__(self):
+        self._root = None
+        # node id -> model
+        self._nodes = {}
+        # node id -> queue entry, resolved when first needed since entries
+        # are enqueued after the model is added
+        self._entries = {}
+        # sample id -> sample model
+        self._samples = {}
+        # sample node id -> list of task models, built when first needed
+        self._tasks = {}
+
+    def _check_root(self):
+        root = HWR.beamline.queue_model.get_model_root()
+
+        # New model selected or model cleared, node ids are only unique within
+        # a model
+        if root is not self._root:
+            self.reset(root)
+
+        return root
+
+    def _add_subtree(self, node):
+        self._nodes[node._node_id] = node
+
+        for child in node.get_children():
+            self._add_subtree(child)
+
+    def _remove_subtree(self, node):
+        self._nodes.pop(node._node_id, None)
+        self._entries.pop(node._node_id, None)
+        self._tasks.pop(node._node_id, None)
+
+        for child in node.get_children():
+            self._remove_subtree(child)
+
+    def _index_samples(self):
+        self._samples = {}
+
+        for node in self._root.get_children():
+            if isinstance(node, qmo.Sample):
+                self._samples[node.loc_str] = node
+
+    def reset(self, root=None):
+        """
+        Rebuilds the index from the queue model with root <root>, current
+        model root used if nothing is passed.
+        """
+        if root is None:
+            root = HWR.beamline.queue_model.get_model_root()
+
+        self._root = root
+        self._nodes = {}
+        self._entries = {}
+        self._tasks = {}
+
+        for node in root.get_children():
+            self._add_subtree(node)
+
+        self._index_samples()
+
+    def invalidate(self, node=None):
+        """
+        Marks the task positions of the sample that <node> belongs to as
+        outdated, the sample index is rebuilt if no node is given.
+
+        :param TaskNode node: Node that changed
+        """
+        if node is None:
+            self._tasks = {}
+
+            if self._root is not None:
+                self._index_samples()
+        else:
+            sample_node = node.get_sample_node()
+
+            if sample_node is not None:
+                self._tasks.pop(sample_node._node_id, None)
+
+    def add_node(self, parent, child):
+        """
+        Adds <child> (and its children) to the index, connected to the
+        'child_added' signal of the queue model
+        """
+        root = self._check_root()
+        self._add_subtree(child)
+        self.invalidate(child)
+
+        if isinstance(child, qmo.Sample) and parent is root:
+            self._samples[child.loc_str] = child
+
+    def remove_node(self, parent, child):
+        """
+        Removes <child> (and its children) from the index, connected to the
+        'child_removed' signal of the queue model
+        """
+        self._check_root()
+        self.invalidate(child)
+        self._remove_subtree(child)
+
+        if isinstance(child, qmo.Sample):
+            if self._samples.get(child.loc_str) is child:
+                self._samples.pop(child.loc_str)
+
+    def get_entry(self, model):
+        """
+        :returns: The queue entry with the data model <model>, None if the
+                  model is not (yet) enqueued
+        """
+        entry = self._entries.get(model._node_id)
+
+        if entry is None or entry.get_data_model() is not model:
+            parent = model.get_parent()
+            entry_list = []
+
+            # The queue entries are organized in the same way as the model, so
+            # its enough to look among the entries of the parent
+            if parent is None or parent is self._root:
+                entry_list = HWR.beamline.queue_manager._queue_entry_list
+            else:
+                parent_entry = self.get_entry(parent)
+
+                if parent_entry is not None:
+                    entry_list = parent_entry._queue_entry_list
+
+            entry = None
+
+            for _entry in entry_list:
+                if _entry.get_data_model() is model:
+                    entry = _entry
+                    self._entries[model._node_id] = entry
+                    break
+
+        return entry
+
+    def get_node(self, node_id):
+        """
+        :param int node_id: Node id
+        :returns: The model with id <node_id>, None if there is no such node
+        """
+        self._check_root()
+        return self._nodes.get(int(node_id))
+
+    def get(self, node_id):
+        """
+        :param int node_id: Node id
+        :returns: The tuple model, entry. model is None if there is no node
+                  with id <node_id>
+        """
+        model = self.get_node(node_id)
+        entry = self.get_entry(model) if model is not None else None
+
+        return model, entry
+
+    def get_sample_node(self, sid):
+        """
+        :param str sid: Sample id
+        :returns: The sample model
+        :raises KeyError: If there is no sample with id <sid> in the queue
+        """
+        root = self._check_root()
+        node = self._samples.get(sid)
+
+        # The sample location can be changed after the sample was added, see
+        # Lims.synch_sample_list_with_queue
+        if node is None or node.loc_str != sid or node.get_parent() is not root:
+            self._index_samples()
+            node = self._samples[sid]
+
+        return node
+
+    def get_sample(self, sid):
+        """
+        :param str sid: Sample id
+        :returns: The tuple model, entry of sample <sid>
+        :raises KeyError: If there is no sample with id <sid> in the queue
+        """
+        node = self.get_sample_node(sid)
+        return node, self.get_entry(node)
+
+    def get_task_nodes(self, sid):
+        """
+        :param str sid: Sample id
+        :returns: List of task models of sample <sid> ordered by task index
+        """
+        node = self.get_sample_node(sid)
+        tasks = self._tasks.get(node._node_id)
+
+        if tasks is None:
+            tasks = task_nodes(node)
+            self._tasks[node._node_id] = tasks
+
+        return tasks
+
+    def get_task(self, sid, tindex):
+        """
+        :param str sid: Sample id
+        :param int tindex: Task index within sample
+        :returns: The tuple model, entry of task <tindex> of sample <sid>
+        """
+        model = self.get_task_nodes(sid)[int(tindex)]
+        return model, self.get_entry(model)
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+from collections import Counter
+
+from mxcubecore import HardwareRepository as HWR
+from mxcubecore.model import queue_model_objects as qmo
+
+# Important: same constants as in constants.js
+SAMPLE_MOUNTED = 0x8
+COLLECTED = 0x4
+WARNING = 0x10
+FAILED = 0x2
+RUNNING = 0x1
+UNCOLLECTED = 0x0
+READY = 0
+
+# Status passed with 'queue_entry_execute_finished' -> task state, the same
+# mapping as from the status of the queue entry (QUEUE_ENTRY_STATUS) before:
+# aborted entries have the status FAILED and skipped entries are left
+# uncollected. The states are the bit values of constants.js (TASK_*), not
+# the QUEUE_ENTRY_STATUS values
+FINISHED_STATES = {
+    "Successful": COLLECTED,
+    "Failed": FAILED,
+    "Aborted": FAILED,
+    "Skipped": UNCOLLECTED,
+}
+
+
+class QueueStateTable:
+    """
+    Execution state of the nodes in HWR.beamline.queue_model.
+
+    The state of each node is updated from the queue manager and collect
+    signals as the queue is executed, so that the state of a node can be
+    looked up without querying its queue entry. The states of the tasks of
+    each sample (the children of its task groups) are also counted so that
+    the state of a sample is available without going through its tasks.
+    """
+
+    def __init__(self):
+        self._root = None
+        # node id -> state, nodes that are not in the table are UNCOLLECTED
+        self._states = {}
+        # node id of sample task -> node id of sample
+        self._members = {}
+        # sample node id -> Counter of task states, and "total"
+        self._counters = {}
+        # Model of the innermost entry being executed
+        self._current = None
+
+    def _check_root(self):
+        root = HWR.beamline.queue_model.get_model_root()
+
+        # New model selected or model cleared, node ids are only unique within
+        # a model
+        if root is not self._root:
+            self.reset(root)
+
+    @staticmethod
+    def _sample_of(node):
+        """
+        :returns: The sample of <node> if <node> is a task of a task group
+                  directly under the sample, otherwise None
+        """
+        parent = node.get_parent()
+        sample = parent.get_parent() if parent is not None else None
+
+        return sample if isinstance(sample, qmo.Sample) else None
+
+    def _set_state(self, node_id, state):
+        old_state = self._states.get(node_id, UNCOLLECTED)
+
+        if state == UNCOLLECTED:
+            self._states.pop(node_id, None)
+        else:
+            self._states[node_id] = state
+
+        sample_id = self._members.get(node_id)
+
+        if sample_id is not None:
+            counter = self._counters[sample_id]
+            counter[old_state] -= 1
+            counter[state] += 1
+
+    def _add_subtree(self, node):
+        if node.is_executed():
+            self._states.setdefault(node._node_id, COLLECTED)
+
+        sample = self._sample_of(node)
+
+        # A node can be added more than once, when the model is re-emitted
+        if sample is not None and node._node_id not in self._members:
+            self._members[node._node_id] = sample._node_id
+            counter = self._counters.setdefault(sample._node_id, Counter())
+            counter["total"] += 1
+            counter[self._states.get(node._node_id, UNCOLLECTED)] += 1
+
+        for child in node.get_children():
+            self._add_subtree(child)
+
+    def _remove_subtree(self, node):
+        state = self._states.pop(node._node_id, UNCOLLECTED)
+        sample_id = self._members.pop(node._node_id, None)
+
+        if sample_id is not None and sample_id in self._counters:
+            counter = self._counters[sample_id]
+            counter["total"] -= 1
+            counter[state] -= 1
+
+        self._counters.pop(node._node_id, None)
+
+        for child in node.get_children():
+            self._remove_subtree(child)
+
+    def reset(self, root=None):
+        """
+        Rebuilds the table from the queue model with root <root>, current
+        model root used if nothing is passed. Only nodes marked as executed
+        in the model are considered collected.
+        """
+        if root is None:
+            root = HWR.beamline.queue_model.get_model_root()
+
+        self._root = root
+        self._states = {}
+        self._members = {}
+        self._counters = {}
+        self._current = None
+
+        for node in root.get_children():
+            self._add_subtree(node)
+
+    def add_node(self, parent, child):
+        """
+        Adds <child> (and its children) to the table, connected to the
+        'child_added' signal of the queue model
+        """
+        self._check_root()
+        self._add_subtree(child)
+
+    def remove_node(self, parent, child):
+        """
+        Removes <child> (and its children) from the table, connected to the
+        'child_removed' signal of the queue model
+        """
+        self._check_root()
+        self._remove_subtree(child)
+
+    def entry_started(self, entry):
+        """
+        Marks the node of <entry> as running, connected to
+        'queue_entry_execute_started'
+        """
+        self._check_root()
+        self._current = entry.get_data_model()
+        self._set_state(self._current._node_id, RUNNING)
+
+    def entry_finished(self, entry, status):
+        """
+        Sets the state of the node of <entry> from <status>, connected to
+        'queue_entry_execute_finished'. The parent of the node becomes the
+        node being executed again if it is still running.
+        """
+        self._check_root()
+        model = entry.get_data_model()
+        self._set_state(model._node_id, FINISHED_STATES.get(status, UNCOLLECTED))
+
+        if self._current is model:
+            parent = model.get_parent()
+
+            if parent is not None and self._states.get(parent._node_id) == RUNNING:
+                self._current = parent
+            else:
+                self._current = None
+
+    def set_current_state(self, state):
+        """
+        Sets the state of the node being executed, for signals emitted during
+        the execution (for instance 'collectOscillationFailed')
+
+        :returns: The node being executed, None if there is none
+        """
+        if self._current is not None:
+            self._set_state(self._current._node_id, state)
+
+        return self._current
+
+    def get_state(self, node):
+        """
+        :param TaskNode node: Node to get state for
+        :returns: One of UNCOLLECTED, RUNNING, COLLECTED, FAILED
+        """
+        self._check_root()
+        state = self._states.get(node._node_id, UNCOLLECTED)
+
+        if state != FAILED and node.is_executed():
+            state = COLLECTED
+        elif state == UNCOLLECTED and self._current is not None:
+            # Children of the container being executed are considered running
+            if self._current is node.get_parent():
+                state = RUNNING
+
+        return state
+
+    def get_sample_counters(self, node):
+        """
+        :param Sample node: Sample to get counters for
+        :returns: Counter with the number of tasks of sample <node> in each
+                  state, and the total number of tasks under the key "total"
+        """
+        self._check_root()
+        return self._counters.get(node._node_id, Counter())
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+import os
+import logging
+
+from collections import OrderedDict
+
+from mxcubecore.model import queue_model_objects as qmo
+
+MAX_RUN_NUMBER = 1000
+
+
+def build_prefix_path_dict(path_list):
+    """
+    :param list path_list: List of file paths
+    :returns: dictionary with the highest run number for each prefix path
+              (directory and prefix) in <path_list>
+    """
+    prefix_path_dict = {}
+
+    for path in path_list:
+        try:
+            path, run_number, img_number = qmo.PathTemplate.interpret_path(path)
+        except ValueError:
+            # Directory listings contain other files than images, logged at
+            # debug level to not log each of them
+            logging.getLogger("MX3.HWR").debug(
+                '[QUEUE] Warning, failed to interpret path: "%s", please check path'
+                % path
+            )
+            path, run_number = (path, 0)
+        if path in prefix_path_dict:
+            prefix_path_dict[path] = max(prefix_path_dict[path], run_number)
+        else:
+            prefix_path_dict[path] = run_number
+
+    return prefix_path_dict
+
+
+class RunNumberAllocator:
+    """
+    Hands out run numbers for the path templates of new tasks.
+
+    Each data directory is listed once, the highest run number of each
+    prefix on disk is kept in memory together with the run numbers already
+    handed out (reserved) so that tasks added after each other, or at the
+    same time, never get the same run number. A directory is only listed
+    again after a collection wrote to it, see rescan. The run number of a
+    task is reserved until it is released, when the task is removed from
+    the queue.
+    """
+
+    def __init__(self, max_directories=100):
+        self._max_directories = max_directories
+        # directory -> (file names, {prefix path: highest run number})
+        self._listings = OrderedDict()
+        # prefix path -> {id of path template: reserved run number}
+        self._reserved = {}
+
+    @staticmethod
+    def _prefix_path(pt):
+        return os.path.join(os.path.normpath(pt.directory), pt.get_prefix())
+
+    def _highest_reserved(self, prefix_path):
+        return max(self._reserved.get(prefix_path, {}).values(), default=0)
+
+    def _get_listing(self, directory):
+        listing = self._listings.get(directory)
+
+        if listing is None:
+            try:
+                files = os.listdir(directory)
+            except OSError:
+                # Directory not created yet
+                files = []
+
+            listing = (
+                set(files),
+                build_prefix_path_dict(
+                    [os.path.join(directory, fname) for fname in files]
+                ),
+            )
+
+            self._listings[directory] = listing
+
+            while len(self._listings) > self._max_directories:
+                self._listings.popitem(last=False)
+        else:
+            self._listings.move_to_end(directory)
+
+        return listing
+
+    def allocate(self, pt, queue_model=None):
+        """
+        Reserves and sets the next available run number of path template <pt>
+
+        :param PathTemplate pt: Path template of new task
+        :param QueueModel queue_model: Queue model, the run numbers of the
+                                       tasks in the model are also taken into
+                                       account when given
+        :returns: The run number
+        """
+        directory = os.path.normpath(pt.directory)
+        prefix_path = self._prefix_path(pt)
+        files, prefix_path_dict = self._get_listing(directory)
+
+        on_disk = prefix_path_dict.get(prefix_path, 0)
+        reserved = self._highest_reserved(prefix_path)
+        # Tasks with a run number that was not reserved through the allocator
+        in_queue = queue_model.get_next_run_number(pt) - 1 if queue_model else 0
+        pt.run_number = max(on_disk, reserved, in_queue) + 1
+
+        # Files with names that can not be interpreted by build_prefix_path_dict
+        while any(
+            os.path.basename(fname) in files for fname in pt.get_first_and_last_file()
+        ):
+            pt.run_number += 1
+
+            if pt.run_number > MAX_RUN_NUMBER:
+                raise RuntimeError("Over a thousand runs of the same collection")
+
+        self._reserved.setdefault(prefix_path, {})[id(pt)] = pt.run_number
+
+        return pt.run_number
+
+    def reserve(self, pt):
+        """
+        Marks the run number of path template <pt> as used, for tasks that
+        already have a run number (for instance added by a workflow or
+        loaded from a saved queue)
+        """
+        if pt.run_number:
+            prefix_path = self._prefix_path(pt)
+            self._reserved.setdefault(prefix_path, {})[id(pt)] = pt.run_number
+
+    def release(self, pt):
+        """
+        Releases the run number of path template <pt>, to be called when its
+        task is removed from the queue
+        """
+        prefix_path = self._prefix_path(pt)
+        reserved = self._reserved.get(prefix_path)
+
+        if reserved is not None:
+            reserved.pop(id(pt), None)
+
+            if not reserved:
+                self._reserved.pop(prefix_path)
+
+    def rescan(self, directory):
+        """
+        Lists <directory> again the next time a run number is needed for it,
+        to be called when a collection has written data to <directory>
+        """
+        self._listings.pop(os.path.normpath(directory), None)
+
+    def clear(self):
+        """
+        Releases all reserved run numbers, for instance when the queue is
+        cleared
+        """
+        self._reserved = {}
@@ -162,6 +162,7 @@ class SampleChanger(ComponentBase):
             self.app.SC_CONTENTS.get("FROM_CODE")[code] = sample
         if location:
             self.app.SC_CONTENTS.get("FROM_LOCATION")[location] = sample
+            self.app.lims.mark_sample_dirty(location)
 
     def sc_contents_from_code_get(self, code):
         return self.app.SC_CONTENTS["FROM_CODE"].get(code, {})
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+import gevent
+import json
+import logging
+
+from mxcubeweb import logging_handler
+
+KEY_PREFIX = "mxcubeweb:mirror:"
+
+# Snapshot -> events after which the snapshot is published again
+SNAPSHOT_EVENTS = {
+    "beamline": (
+        "hardware_object_changed",
+        "hardware_object_value_changed",
+        "hardware_object_attribute_changed",
+        "beam_changed",
+    ),
+    "queue_state": (
+        "queue",
+        "task",
+        "add_task",
+        "queue_change",
+        "queue_stopped",
+        "set_current_sample",
+        "update_task_lims_data",
+    ),
+    "sc_contents": (
+        "sc",
+        "sc_state",
+        "sc_contents_update",
+        "loaded_sample_changed",
+    ),
+    "shapes": ("update_shapes", "grid_result_available"),
+    "log": ("log_record",),
+}
+
+
+class StateMirror:
+    """
+    Snapshots of the state read by observers (the JSON replies of the
+    corresponding read-only routes), written to Redis by the control process
+    and read by mirror processes, see the --mirror option.
+    """
+
+    def __init__(self, db):
+        self._db = db
+
+    def set(self, name, payload):
+        self._db.set(KEY_PREFIX + name, payload)
+
+    def get(self, name):
+        """
+        :returns: JSON snapshot <name>, None if it was never published
+        """
+        return self._db.get(KEY_PREFIX + name)
+
+
+class StatePublisher:
+    """
+    Publishes the snapshots of the control process to a StateMirror. A
+    snapshot is published again, at most once per <interval> seconds, after
+    one of its events (SNAPSHOT_EVENTS) was emitted or after a request
+    that can change the state, so that the hardware objects are read at the
+    same rate whatever the number of observers.
+    """
+
+    def __init__(self, app, mirror, interval):
+        self._mirror = mirror
+        self._interval = interval
+        self._events = {
+            event: name for name, events in SNAPSHOT_EVENTS.items() for event in events
+        }
+        self._snapshots = {
+            "beamline": app.beamline.beamline_get_all_attributes,
+            "queue_state": app.queue.get_queue_state,
+            "sc_contents": app.sample_changer.get_sc_contents,
+            "shapes": app.sample_view.get_shapes,
+            "log": self._get_log,
+        }
+        self._dirty = set()
+        self._task = None
+
+    @staticmethod
+    def _get_log():
+        for handler in logging.getLogger("MX3.HWR").handlers:
+            if isinstance(handler, logging_handler.MX3LoggingHandler):
+                return handler.buffer
+
+        return []
+
+    def _schedule(self):
+        if self._task is None:
+            self._task = gevent.spawn_later(self._interval, self._run)
+
+    def _run(self):
+        self._task = None
+        self.publish()
+
+    def event_emitted(self, event):
+        name = self._events.get(event)
+
+        if name is not None:
+            self._dirty.add(name)
+            self._schedule()
+
+    def state_changed(self):
+        """
+        Publishes all snapshots again, for changes that are not followed by
+        an event (for instance a task added by the operator)
+        """
+        self._dirty.update(self._snapshots)
+        self._schedule()
+
+    def publish(self):
+        """
+        Publishes the snapshots that changed since the last time
+        """
+        dirty, self._dirty = self._dirty, set()
+
+        for name in dirty:
+            try:
+                snapshot = self._snapshots[name]()
+                self._mirror.set(name, json.dumps(snapshot, default=str))
+            except Exception:
+                logging.getLogger("MX3.HWR").exception(
+                    "Could not publish %s snapshot" % name
+                )
@@ -1,5 +1,5 @@
 from enum import Enum
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, confloat
 from typing import List, Dict, Optional
 import datetime
 
@@ -91,6 +91,94 @@ class UserManagerConfigModel(BaseModel):
     users: List[UserManagerUserConfigModel]
 
 
+class QueueConfigModel(BaseModel):
+    cache_check: bool = Field(
+        False,
+        description=(
+            "Compare the cached queue representation with a full rebuild "
+            "each time it is used, for debugging"
+        ),
+    )
+    lims_data_ttl: float = Field(
+        30,
+        description=(
+            "Time in seconds LIMS result data is kept in the cached queue "
+            "representation before it is fetched again"
+        ),
+    )
+    change_history: int = Field(
+        1000,
+        gt=0,
+        description="Number of queue changes kept for clients catching up",
+    )
+    progress_rate: float = Field(
+        1,
+        gt=0,
+        description=(
+            "Number of times per second the progress of the tasks being "
+            "collected is sent to the clients, greater than 0"
+        ),
+    )
+
+
+class SocketIOConfigModel(BaseModel):
+    batch_interval: float = Field(
+        0,
+        description=(
+            "Time in seconds during which emitted events are collected and "
+            "sent as one batch, 0 to send each event directly"
+        ),
+    )
+    batch_bypass: List[str] = Field(
+        ["forceSignout", "forceSignoutObservers", "resumeQueueDialog"],
+        description="Events that are always sent directly",
+    )
+    batch_size: int = Field(
+        100,
+        gt=0,
+        description=(
+            "Number of events collected for a namespace and room after which "
+            "they are sent without waiting for batch_interval"
+        ),
+    )
+    replay_buffer: int = Field(
+        0,
+        description=(
+            "Number of emitted events kept to be sent again to clients that "
+            "reconnect, 0 to disable"
+        ),
+    )
+    binary_min_length: int = Field(
+        0,
+        description=(
+            "Minimum length of the numeric arrays sent as binary buffers to "
+            "the clients that ask for it, 0 to always send JSON"
+        ),
+    )
+    message_queue: str = Field(
+        "",
+        description=(
+            "URL of the message queue (for instance redis://localhost:6379/0) "
+            "through which events are sent to front-end processes, empty when "
+            "all clients connect to the control process"
+        ),
+    )
+    slow_client_limit: int = Field(
+        0,
+        description=(
+            "Number of packets waiting to be written to a client from which "
+            "only the latest state of each object is sent, 0 to disable"
+        ),
+    )
+    client_reset_limit: int = Field(
+        1000,
+        description=(
+            "Number of packets waiting to be written to a client from which "
+            "the client is reset, 0 to never reset clients"
+        ),
+    )
+
+
 class ModeEnum(str, Enum):
     SSX_INJECTOR = "SSX-INJECTOR"
     SSX_CHIP = "SSX-CHIP"
@@ -120,6 +208,77 @@ class MXCUBEAppConfigModel(BaseModel):
         ModeEnum.OSC, description="MXCuBE mode OSC, SSX-CHIP or SSX-INJECTOR"
     )
     usermanager: UserManagerConfigModel
+    queue: QueueConfigModel = QueueConfigModel()
+    socketio: SocketIOConfigModel = SocketIOConfigModel()
+    event_rates: Dict[str, confloat(ge=0)] = Field(
+        {},
+        description=(
+            "Maximum number of value change events per second sent to the "
+            "clients, by adapter id or adapter class name, 0 to send all"
+        ),
+    )
+    poll_intervals: Dict[str, confloat(gt=0)] = Field(
+        {},
+        description=(
+            "Interval in seconds at which hardware objects that do not send "
+            "value and state changes reliably are polled, by adapter id or "
+            "adapter class name, the others are not polled"
+        ),
+    )
+    poll_concurrency: int = Field(
+        4, description="Number of hardware objects polled at the same time"
+    )
+    loop_stall_threshold: int = Field(
+        0,
+        description=(
+            "Time in milliseconds during which the gevent hub does not run "
+            "that is logged as a stall, with the blocking stack, 0 to disable"
+        ),
+    )
+    metrics: bool = Field(
+        False,
+        description=(
+            "Collect metrics of the emitted events, requests and signal "
+            "handlers, served on /mxcube/api/v0.1/metrics"
+        ),
+    )
+    mirror_interval: float = Field(
+        0,
+        description=(
+            "Minimum time in seconds between the publications of the state "
+            "read by mirror processes, 0 to not publish the state"
+        ),
+    )
+    beamline_cache_max_age: float = Field(
+        10,
+        description=(
+            "Time in seconds during which the representation of an adapter "
+            "whose value and state did not change is reused by GET /beamline, "
+            "0 to read all hardware objects on each request"
+        ),
+    )
+    adapter_init_concurrency: int = Field(
+        8,
+        description=(
+            "Number of hardware objects adapted concurrently at startup, 1 to "
+            "adapt them one after the other"
+        ),
+    )
+    adapter_init_timeout: float = Field(
+        30,
+        description=(
+            "Time in seconds after which the adapter of a hardware object that "
+            "is not initialized is replaced by an unavailable one, 0 to wait "
+            "indefinitely"
+        ),
+    )
+    lazy_adapters: bool = Field(
+        False,
+        description=(
+            "Create the adapter of a hardware object when it is first used "
+            "instead of at startup"
+        ),
+    )
     ui_properties: Dict[str, UIPropertiesModel] = {}
 
 
@@ -1,4 +1,6 @@
+import array
 import re
+import sys
 
 
 def convert_to_dict(ispyb_object):
@@ -64,3 +66,75 @@ def to_camel(d):
 
 def from_camel(d):
     return _convert_dict_rec(str_to_snake, d)
+
+
+# array type code -> type name used by the clients (TypedArray)
+ARRAY_TYPES = {"i": "int32", "d": "float64"}
+
+
+def _pack_array(values):
+    """
+    :returns: {"__array__": type, "data": bytes} with the numbers <values> as
+              little endian int32 or float64, None if <values> contains
+              other things than numbers
+    """
+    typecode = "i"
+
+    for value in values:
+        if type(value) is float:
+            typecode = "d"
+        elif type(value) is not int:
+            return None
+
+    try:
+        packed = array.array(typecode, values)
+    except OverflowError:
+        packed = array.array("d", values)
+
+    if sys.byteorder == "big":
+        packed.byteswap()
+
+    return {"__array__": ARRAY_TYPES[packed.typecode], "data": packed.tobytes()}
+
+
+def _pack_arrays_rec(value, min_length):
+    if isinstance(value, dict):
+        items = value.items()
+        packed = {k: _pack_arrays_rec(v, min_length) for k, v in items}
+    elif isinstance(value, (list, tuple)):
+        if len(value) >= min_length:
+            array_dict = _pack_array(value)
+
+            if array_dict is not None:
+                return array_dict
+
+        packed = [_pack_arrays_rec(v, min_length) for v in value]
+        items = enumerate(value)
+    else:
+        return value
+
+    # Unchanged values are returned as they are
+    if all(packed[k] is v for k, v in items):
+        return value
+
+    return packed
+
+
+def pack_arrays(data, min_length):
+    """
+    Replaces the lists of at least <min_length> numbers nested in <data> with
+    dictionaries {"__array__": "int32" or "float64", "data": bytes}, sent as
+    binary buffers by Socket.IO. <data> itself is never replaced.
+
+    :returns: The packed data, <data> itself if it has no list to pack
+    """
+    if isinstance(data, dict):
+        packed = {k: _pack_arrays_rec(v, min_length) for k, v in data.items()}
+        changed = any(packed[k] is not v for k, v in data.items())
+    elif isinstance(data, (list, tuple)):
+        packed = [_pack_arrays_rec(v, min_length) for v in data]
+        changed = any(p is not v for p, v in zip(packed, data))
+    else:
+        return data
+
+    return packed if changed else data
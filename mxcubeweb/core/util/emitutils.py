@@ -0,0 +1,472 @@
+import collections
+import gevent
+import itertools
+import logging
+import uuid
+
+from mxcubeweb.core.util.convertutils import pack_arrays
+
+# Events that carry the latest state of an object, an event that is not yet
+# sent is replaced by a newer one for the same object (name)
+SUPERSEDED_EVENTS = (
+    "hardware_object_value_changed",
+    "hardware_object_changed",
+    "beam_changed",
+    "motor_position",
+    "motor_state",
+)
+
+# Keyword arguments of SocketIO.emit that are handled by the batcher, events
+# emitted with other arguments (callback, skip_sid ...) are sent directly
+BATCHED_KWARGS = ("namespace", "room", "to")
+
+# Room of the clients that receive numeric arrays as binary buffers
+BINARY_ROOM = "encoding:binary"
+
+
+def _target(kwargs):
+    """
+    :returns: tuple (namespace, room) of an event emitted with <kwargs>, a
+              list of rooms is returned as a tuple
+    """
+    room = kwargs.get("to", kwargs.get("room"))
+
+    if isinstance(room, list):
+        room = tuple(room)
+
+    return (kwargs.get("namespace"), room)
+
+
+def _participants(socketio, namespace, room):
+    """
+    :returns: dictionary {sid: eio sid} of the clients that receive the
+              events sent to <namespace> and <room> (all clients if None)
+    """
+    manager = socketio.server.manager
+    participants = {}
+
+    for _room in room if isinstance(room, tuple) else (room,):
+        participants.update(manager.get_participants(namespace, _room))
+
+    return participants
+
+
+def send_events(socketio, events, stamp=None, **kwargs):
+    """
+    Sends the list of [event, data] pairs <events> with <kwargs>. A single
+    event without <stamp> is sent as it is, otherwise the events are sent as
+    one 'batch' event, on the form {log, seq, events} if <stamp> (see
+    EventLog.append) is given.
+    """
+    if stamp is not None:
+        socketio.emit("batch", dict(stamp, events=events), **kwargs)
+    elif len(events) == 1:
+        socketio.emit(*events[0], **kwargs)
+    else:
+        socketio.emit("batch", events, **kwargs)
+
+
+class BinaryArrayEmitter:
+    """
+    Same interface as SocketIO.emit, the numeric arrays of at least
+    <min_length> items in the emitted data are sent as binary buffers (see
+    pack_arrays) to the clients in BINARY_ROOM. Other clients get JSON.
+    """
+
+    def __init__(self, socketio, min_length):
+        self._socketio = socketio
+        self._min_length = min_length
+
+    def _binary_sids(self, namespace, room):
+        """
+        :returns: Set of the clients in BINARY_ROOM that receive events sent
+                  to <namespace> and <room>
+        """
+        sids = set(_participants(self._socketio, namespace, BINARY_ROOM))
+
+        if sids and room is not None:
+            sids.intersection_update(_participants(self._socketio, namespace, room))
+
+        return sids
+
+    def emit(self, event, *args, skip_sid=None, **kwargs):
+        namespace, room = _target(kwargs)
+
+        if any(key not in BATCHED_KWARGS for key in kwargs):
+            self._socketio.emit(event, *args, skip_sid=skip_sid, **kwargs)
+            return
+
+        skip = set(skip_sid if isinstance(skip_sid, list) else [skip_sid])
+        sids = self._binary_sids(namespace or "/", room) - skip
+        packed = pack_arrays(args, self._min_length) if sids else args
+
+        if packed is args:
+            self._socketio.emit(event, *args, skip_sid=skip_sid, **kwargs)
+        else:
+            self._socketio.emit(event, *args, skip_sid=list(skip | sids), **kwargs)
+            self._socketio.emit(event, *packed, namespace=namespace, to=list(sids))
+
+
+class BackpressureEmitter:
+    """
+    Same interface as SocketIO.emit, emits through <emitter> while keeping
+    track of the number of packets waiting to be written to each client.
+
+    Events in SUPERSEDED_EVENTS (also within 'batch' events) are held back
+    for clients with <soft_limit> packets or more waiting, only the latest
+    event for an object is sent once the client has caught up. Other events
+    are sent as usual. A client with <hard_limit> packets or more waiting is
+    reset, the packets are dropped and the client is sent 'resync' and
+    disconnected so that it reloads its state when it reconnects.
+    """
+
+    def __init__(self, socketio, emitter, soft_limit, hard_limit, interval=0.5):
+        self._socketio = socketio
+        self._emitter = emitter
+        self._soft_limit = soft_limit
+        self._hard_limit = hard_limit
+        self._interval = interval
+        # (namespace, sid) -> (eio sid, {key: [event, data]})
+        self._held = {}
+        # eio sid -> number of events dropped for a newer one
+        self._dropped = {}
+        self._task = None
+        self.resets = 0
+
+    def _queue(self, eio_sid):
+        """
+        :returns: Queue of the packets waiting to be written to the client
+                  (engine.io socket) <eio_sid>, None if it is disconnected
+        """
+        socket = self._socketio.server.eio.sockets.get(eio_sid)
+        return socket.queue if socket is not None else None
+
+    def queue_depth(self, eio_sid):
+        queue = self._queue(eio_sid)
+        return queue.qsize() if queue is not None else 0
+
+    @staticmethod
+    def _split(event, args):
+        """
+        :returns: tuple (state events, other events), the events of a 'batch'
+                  event are split
+        """
+        if event == "batch" and args:
+            batch = args[0]
+            events = batch if isinstance(batch, list) else batch["events"]
+        else:
+            events = [[event, *args]]
+
+        state, other = [], []
+
+        for _event in events:
+            data = _event[1] if len(_event) == 2 else None
+
+            if _event[0] in SUPERSEDED_EVENTS and isinstance(data, dict):
+                state.append(((_event[0], data.get("name")), _event))
+            else:
+                other.append(_event)
+
+        return state, other
+
+    def _send_other(self, event, args, other, namespace, sid):
+        if event == "batch" and args:
+            batch = args[0]
+            stamp = None if isinstance(batch, list) else batch
+
+            if stamp is not None:
+                stamp = {k: v for k, v in stamp.items() if k != "events"}
+
+            send_events(self._emitter, other, stamp, namespace=namespace, to=sid)
+        else:
+            self._emitter.emit(*other[0], namespace=namespace, to=sid)
+
+    def _hold(self, event, args, namespace, sid, eio_sid):
+        state, other = self._split(event, args)
+
+        if state:
+            _, held = self._held.setdefault((namespace, sid), (eio_sid, {}))
+
+            for key, _event in state:
+                if key in held:
+                    self._dropped[eio_sid] = self._dropped.get(eio_sid, 0) + 1
+
+                # Moved last, after the events it was emitted after
+                held.pop(key, None)
+                held[key] = _event
+
+            if self._task is None:
+                self._task = gevent.spawn(self._run)
+
+        if other:
+            self._send_other(event, args, other, namespace, sid)
+
+    def _run(self):
+        try:
+            while self._held:
+                gevent.sleep(self._interval)
+
+                for target, (eio_sid, held) in list(self._held.items()):
+                    queue = self._queue(eio_sid)
+
+                    if queue is None:
+                        self._held.pop(target)
+                    elif queue.qsize() < self._soft_limit:
+                        self._held.pop(target)
+                        namespace, sid = target
+                        send_events(
+                            self._emitter,
+                            list(held.values()),
+                            namespace=namespace,
+                            to=sid,
+                        )
+        except Exception:
+            logging.getLogger("MX3.HWR").exception("Could not send held events")
+        finally:
+            self._task = None
+
+    def reset(self, eio_sid):
+        """
+        Drops the packets waiting to be written to the client <eio_sid>,
+        sends it 'resync' and disconnects it from all namespaces
+        """
+        queue = self._queue(eio_sid)
+
+        if queue is None:
+            return
+
+        while not queue.empty():
+            queue.get_nowait()
+            queue.task_done()
+
+        manager = self._socketio.server.manager
+        self.resets += 1
+
+        logging.getLogger("MX3.HWR").warning(
+            "Client %s is too slow, resetting it" % eio_sid
+        )
+
+        for namespace in list(manager.get_namespaces()):
+            sid = manager.sid_from_eio_sid(eio_sid, namespace)
+
+            if sid is not None:
+                self._held.pop((namespace, sid), None)
+                self._socketio.emit("resync", namespace=namespace, to=sid)
+                self._socketio.server.disconnect(sid, namespace=namespace)
+
+    def emit(self, event, *args, **kwargs):
+        namespace, room = _target(kwargs)
+
+        if any(key not in BATCHED_KWARGS for key in kwargs):
+            self._emitter.emit(event, *args, **kwargs)
+            return
+
+        namespace = namespace or "/"
+        slow = {}
+
+        for sid, eio_sid in _participants(self._socketio, namespace, room).items():
+            depth = self.queue_depth(eio_sid)
+
+            if depth >= self._hard_limit:
+                self.reset(eio_sid)
+                slow[sid] = None
+            elif depth >= self._soft_limit:
+                slow[sid] = eio_sid
+
+        if not slow:
+            self._emitter.emit(event, *args, **kwargs)
+            return
+
+        self._emitter.emit(event, *args, skip_sid=list(slow), **kwargs)
+
+        for sid, eio_sid in slow.items():
+            if eio_sid is not None:
+                self._hold(event, args, namespace, sid, eio_sid)
+
+    def get_clients(self, namespace):
+        """
+        :returns: List of dictionaries on the form:
+                {
+                    sid: session id of the client in <namespace>,
+                    queueDepth: number of packets waiting to be written,
+                    held: number of events held back,
+                    dropped: number of events dropped for a newer one
+                }
+        """
+        # Forget the clients that are disconnected
+        self._dropped = {
+            eio_sid: dropped
+            for eio_sid, dropped in self._dropped.items()
+            if self._queue(eio_sid) is not None
+        }
+
+        clients = []
+
+        for sid, eio_sid in _participants(self._socketio, namespace, None).items():
+            _, held = self._held.get((namespace, sid), (None, {}))
+
+            clients.append(
+                {
+                    "sid": sid,
+                    "queueDepth": self.queue_depth(eio_sid),
+                    "held": len(held),
+                    "dropped": self._dropped.get(eio_sid, 0),
+                }
+            )
+
+        return clients
+
+
+class EventLog:
+    """
+    Keeps the last <size> events emitted with Server.emit, numbered in the
+    order they were emitted, so that a client that reconnects can be sent the
+    events it missed instead of reloading the whole application state.
+    """
+
+    def __init__(self, size):
+        # Identifies this log, a client that reconnects to a restarted server
+        # has to reload
+        self.id = uuid.uuid4().hex
+        self.seq = 0
+        # (seq, namespace, room, [event, data])
+        self._events = collections.deque(maxlen=size)
+
+    def append(self, event, *args, **kwargs):
+        """
+        Numbers and keeps the event <event> emitted with <args> and <kwargs>
+
+        :returns: dictionary {log, seq} with the id of the log and the
+                  sequence number of the event, None for events that are not
+                  kept (emitted with a callback, skip_sid ...)
+        """
+        if any(key not in BATCHED_KWARGS for key in kwargs):
+            return None
+
+        self.seq += 1
+        namespace, room = _target(kwargs)
+        self._events.append((self.seq, namespace, room, [event, *args]))
+
+        return {"log": self.id, "seq": self.seq}
+
+    def since(self, log, seq, namespace, rooms):
+        """
+        :param str log: Id of the log the client received <seq> from
+        :param int seq: Sequence number of the last event received
+        :param str namespace: Namespace of the client
+        :param list rooms: Rooms the client is in
+        :returns: List of [event, data] emitted after <seq> to <namespace>,
+                  to all clients or to one of <rooms>. None if the events are
+                  not available (from another log or no longer kept)
+        """
+        if log != self.id or seq > self.seq or seq < self.seq - len(self._events):
+            return None
+
+        rooms = set(rooms)
+        events = []
+
+        for _seq, _namespace, room, event in self._events:
+            if _seq <= seq or (_namespace or "/") != namespace:
+                continue
+
+            if room is None:
+                events.append(event)
+            elif rooms.intersection(room if isinstance(room, tuple) else (room,)):
+                events.append(event)
+
+        return events
+
+
+class EmitBatcher:
+    """
+    Collects the events emitted with Server.emit during <interval> seconds and
+    sends them as one 'batch' event, a list of [event, data] pairs, per
+    namespace and room. Events in SUPERSEDED_EVENTS are collapsed so that only
+    the latest event for an object is sent. Events in <bypass> are sent
+    directly, after the events collected for the same namespace and room.
+    The events of a namespace and room are sent before the interval is over
+    once <max_events> are collected. The batch carries the stamp of the last
+    event collected (see EventLog).
+    """
+
+    def __init__(self, socketio, interval, bypass=(), max_events=100):
+        self._socketio = socketio
+        self._interval = interval
+        self._bypass = set(bypass)
+        self._max_events = max_events
+        # (namespace, room) -> {key: [event, data]}
+        self._pending = {}
+        # (namespace, room) -> stamp of the last event collected
+        self._stamps = {}
+        self._counter = itertools.count()
+        self._timer = None
+
+    def emit(self, event, *args, stamp=None, **kwargs):
+        target = _target(kwargs)
+
+        if (
+            event in self._bypass
+            or len(args) > 1
+            or any(key not in BATCHED_KWARGS for key in kwargs)
+        ):
+            self.flush(target)
+            send_events(self._socketio, [[event, *args]], stamp, **kwargs)
+            return
+
+        data = args[0] if args else None
+
+        if event in SUPERSEDED_EVENTS and isinstance(data, dict):
+            key = (event, data.get("name"))
+        else:
+            key = next(self._counter)
+
+        events = self._pending.setdefault(target, {})
+        # Moved last, after the events it was emitted after
+        events.pop(key, None)
+        events[key] = [event, *args]
+
+        if stamp is not None:
+            self._stamps[target] = stamp
+
+        if len(events) >= self._max_events:
+            self.flush(target)
+        elif self._timer is None:
+            self._timer = gevent.spawn_later(self._interval, self._flush_all)
+
+    def _send(self, target, events):
+        namespace, room = target
+        kwargs = {"namespace": namespace}
+
+        if isinstance(room, tuple):
+            kwargs["to"] = list(room)
+        elif room is not None:
+            kwargs["to"] = room
+
+        try:
+            send_events(
+                self._socketio, events, self._stamps.pop(target, None), **kwargs
+            )
+        except Exception:
+            logging.getLogger("MX3.HWR").exception(
+                "Could not send %s events to %s" % (len(events), target)
+            )
+
+    def flush(self, target=None):
+        """
+        Sends the events collected for <target> (namespace, room) directly,
+        the events of all namespaces and rooms if no target is given
+        """
+        if target is None:
+            pending, self._pending = self._pending, {}
+        else:
+            pending = {}
+
+            if target in self._pending:
+                pending[target] = self._pending.pop(target)
+
+        for _target, events in pending.items():
+            self._send(_target, list(events.values()))
+
+    def _flush_all(self):
+        self._timer = None
+        self.flush()
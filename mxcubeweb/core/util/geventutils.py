@@ -0,0 +1,291 @@
+import gevent
+import logging
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+
+from gevent import monkey
+
+# time.sleep is patched to gevent.sleep, the watcher thread needs the original
+_thread_sleep = monkey.get_original("time", "sleep")
+
+# Innermost frames in these packages are reported as the cause of a stall
+APPLICATION_PACKAGES = ("mxcubeweb", "mxcubecore")
+
+
+def _offender(stack):
+    """
+    :returns: "file:line in function" of the innermost frame of <stack> in
+              APPLICATION_PACKAGES, the innermost frame if there is none
+    """
+    frames = [
+        frame
+        for frame in stack
+        if any(package in frame.filename for package in APPLICATION_PACKAGES)
+    ] or stack
+
+    frame = frames[-1]
+
+    return "%s:%s in %s" % (frame.filename, frame.lineno, frame.name)
+
+
+class LoopMonitor:
+    """
+    Detects when the gevent hub does not run for more than <threshold>
+    seconds, that is when a greenlet blocks all others with a call that does
+    not yield (I/O that is not patched, CPU bound work ...).
+
+    A greenlet records a heartbeat every <threshold> / 2 seconds, and a
+    native thread checks it as often. When the heartbeat is late the thread
+    captures the stack of the thread running the hub, the code that keeps
+    the hub from running. The stall is recorded with its duration once the
+    heartbeat greenlet runs again. The <max_offenders> locations that blocked
+    the hub for the longest time in total are kept.
+    """
+
+    def __init__(self, threshold, max_offenders=20):
+        self._threshold = threshold
+        self._max_offenders = max_offenders
+        self._hub_thread = None
+        self._last_beat = time.perf_counter()
+        # (heartbeat time, stack) captured by the watcher thread
+        self._captured = None
+        # location -> {count, totalTime, maxTime, stack}
+        self._offenders = {}
+        self._stopped = threading.Event()
+        self.stalls = 0
+        self.total_time = 0
+        self.max_time = 0
+
+    def start(self):
+        """
+        Starts monitoring the hub of the calling thread
+        """
+        self._hub_thread = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._stopped.clear()
+
+        gevent.spawn(self._beat)
+        threading.Thread(target=self._watch, name="LoopMonitor", daemon=True).start()
+
+    def stop(self):
+        """
+        Stops monitoring, the stalls recorded are kept
+        """
+        self._stopped.set()
+
+    def _watch(self):
+        interval = self._threshold / 2
+
+        while not self._stopped.is_set():
+            _thread_sleep(interval)
+            last_beat = self._last_beat
+
+            # The heartbeat greenlet sleeps <interval> between beats
+            if time.perf_counter() - last_beat < interval + self._threshold:
+                continue
+
+            # Only the first stack of a stall is captured
+            if self._captured is None or self._captured[0] != last_beat:
+                frame = sys._current_frames().get(self._hub_thread)
+
+                if frame is not None:
+                    self._captured = (last_beat, traceback.extract_stack(frame))
+
+    def _beat(self):
+        interval = self._threshold / 2
+
+        while not self._stopped.is_set():
+            gevent.sleep(interval)
+
+            now = time.perf_counter()
+            last_beat, self._last_beat = self._last_beat, now
+            captured = self._captured
+
+            if captured is not None and captured[0] == last_beat:
+                self._captured = None
+                self._record(now - last_beat - interval, captured[1])
+
+    def _record(self, duration, stack):
+        location = _offender(stack)
+
+        self.stalls += 1
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+
+        offender = self._offenders.setdefault(
+            location, {"count": 0, "totalTime": 0, "maxTime": 0}
+        )
+        offender["count"] += 1
+        offender["totalTime"] += duration
+        offender["maxTime"] = max(offender["maxTime"], duration)
+        offender["stack"] = traceback.format_list(stack)
+
+        if len(self._offenders) > self._max_offenders:
+            least = min(self._offenders, key=lambda k: self._offenders[k]["totalTime"])
+            self._offenders.pop(least)
+
+        logging.getLogger("MX3.HWR").warning(
+            "Event loop blocked for %.0f ms by %s\n%s"
+            % (duration * 1000, location, "".join(offender["stack"]))
+        )
+
+    def get_stats(self):
+        """
+        :returns: dictionary on the form:
+                {
+                    threshold: seconds without running the hub that count as
+                               a stall,
+                    stalls: number of stalls,
+                    totalTime: total duration of the stalls in seconds,
+                    maxTime: duration of the longest stall in seconds,
+                    offenders: list of dictionaries {location, count,
+                               totalTime, maxTime, stack} ordered by
+                               totalTime, stack is the last one captured
+                }
+        """
+        offenders = sorted(
+            (
+                dict(offender, location=location)
+                for location, offender in self._offenders.items()
+            ),
+            key=lambda offender: offender["totalTime"],
+            reverse=True,
+        )
+
+        return {
+            "threshold": self._threshold,
+            "stalls": self.stalls,
+            "totalTime": self.total_time,
+            "maxTime": self.max_time,
+            "offenders": offenders,
+        }
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler of the greenlets running in the thread of the hub.
+
+    A native thread samples the stack of the hub thread, that is of the
+    greenlet running at that time (the hub itself when all of them wait),
+    <rate> times per second. The stacks are counted in the collapsed format
+    read by flame graph tools ("frame;frame;... count" per line, outermost
+    frame first). The memory allocated meanwhile is traced with tracemalloc.
+
+    Sampling does not interrupt the greenlets, the caller of profile waits
+    with gevent.sleep so that a profile can be taken while the queue is
+    executed. Only one profile is taken at a time.
+    """
+
+    def __init__(self, rate=100, max_seconds=60):
+        self._rate = rate
+        self._max_seconds = max_seconds
+        self.running = False
+
+    @staticmethod
+    def _collapse(frame):
+        names = []
+
+        while frame is not None:
+            code = frame.f_code
+            names.append("%s:%s" % (code.co_filename, code.co_name))
+            frame = frame.f_back
+
+        return ";".join(reversed(names))
+
+    def _sample(self, thread_id, stacks, done):
+        interval = 1.0 / self._rate
+
+        while not done.is_set():
+            frame = sys._current_frames().get(thread_id)
+
+            if frame is not None:
+                stack = self._collapse(frame)
+                stacks[stack] = stacks.get(stack, 0) + 1
+
+            del frame
+            _thread_sleep(interval)
+
+    def profile(self, seconds, allocations=0):
+        """
+        Profiles the greenlets of the calling thread for <seconds> seconds,
+        at most max_seconds
+
+        :param int allocations: Number of locations that allocated the most
+                                memory to return, 0 (default) to not trace
+                                allocations, which slows down the greenlets
+
+        :returns: dictionary on the form:
+                {
+                    seconds: duration of the profile,
+                    samples: number of samples taken,
+                    collapsed: collapsed stacks, one "stack count" per line,
+                    allocations: list of dictionaries {location, size, count}
+                                 of the memory allocated and not yet freed,
+                                 ordered by size
+                }
+
+        :raises RuntimeError: if a profile is already being taken
+        """
+        if self.running:
+            raise RuntimeError("A profile is already being taken")
+
+        seconds = min(max(float(seconds), 0), self._max_seconds)
+        trace = allocations > 0 and not tracemalloc.is_tracing()
+        stacks = {}
+        done = threading.Event()
+        self.running = True
+
+        try:
+            if trace:
+                tracemalloc.start()
+
+            sampler = threading.Thread(
+                target=self._sample,
+                args=(threading.get_ident(), stacks, done),
+                name="SamplingProfiler",
+                daemon=True,
+            )
+            sampler.start()
+
+            try:
+                gevent.sleep(seconds)
+            finally:
+                done.set()
+                sampler.join()
+
+            top = []
+
+            if allocations > 0:
+                snapshot = tracemalloc.take_snapshot().filter_traces(
+                    (tracemalloc.Filter(False, tracemalloc.__file__),)
+                )
+
+                for stat in snapshot.statistics("lineno")[:allocations]:
+                    frame = stat.traceback[0]
+                    top.append(
+                        {
+                            "location": "%s:%s" % (frame.filename, frame.lineno),
+                            "size": stat.size,
+                            "count": stat.count,
+                        }
+                    )
+        finally:
+            if trace:
+                tracemalloc.stop()
+
+            self.running = False
+
+        collapsed = "".join(
+            "%s %s\n" % (stack, count)
+            for stack, count in sorted(stacks.items(), key=lambda item: -item[1])
+        )
+
+        return {
+            "seconds": seconds,
+            "samples": sum(stacks.values()),
+            "collapsed": collapsed,
+            "allocations": top,
+        }
@@ -0,0 +1,235 @@
+import functools
+import inspect
+import json
+import time
+
+# Upper bounds, in seconds, of the request duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# One emit in EMIT_SAMPLE_INTERVAL of each event is serialised to measure the
+# size of its data, the others are counted with the last size measured
+EMIT_SAMPLE_INTERVAL = 10
+
+
+def _labels(**labels):
+    """
+    :returns: Prometheus label set {name="value", ...} of <labels>
+    """
+    escaped = []
+
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        escaped.append('%s="%s"' % (name, value.replace("\n", "\\n")))
+
+    return "{%s}" % ",".join(escaped)
+
+
+class Histogram:
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, **labels):
+        lines = []
+        cumulative = 0
+
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(
+                "%s_bucket%s %s" % (name, _labels(**labels, le=bound), cumulative)
+            )
+
+        lines.append(
+            "%s_bucket%s %s" % (name, _labels(**labels, le="+Inf"), self.count)
+        )
+        lines.append("%s_sum%s %s" % (name, _labels(**labels), self.sum))
+        lines.append("%s_count%s %s" % (name, _labels(**labels), self.count))
+
+        return lines
+
+
+class Metrics:
+    """
+    Counters of the events emitted with Server.emit, the requests handled by
+    the Flask routes, the calls of the signal handlers and the polls of the
+    hardware objects, rendered in the Prometheus text format by render.
+    """
+
+    def __init__(self):
+        # (event, namespace) -> [count, payload bytes, serialisation seconds,
+        #                        last size, last serialisation seconds]
+        self._emits = {}
+        # (endpoint, method, status) -> Histogram of durations
+        self._requests = {}
+        # handler name -> [calls, seconds]
+        self._handlers = {}
+        # adapter id -> [Histogram of durations, errors]
+        self._polls = {}
+
+    def emitted(self, event, args, namespace):
+        """
+        Counts event <event> emitted with data <args> to <namespace>, the
+        data is serialised to JSON to measure its size once every
+        EMIT_SAMPLE_INTERVAL emits
+        """
+        counters = self._emits.setdefault((event, namespace or "/"), [0, 0, 0, 0, 0])
+
+        if counters[0] % EMIT_SAMPLE_INTERVAL == 0:
+            t0 = time.perf_counter()
+            counters[3] = len(json.dumps(args, default=str))
+            counters[4] = time.perf_counter() - t0
+
+        counters[0] += 1
+        counters[1] += counters[3]
+        counters[2] += counters[4]
+
+    def request_handled(self, endpoint, method, status, duration):
+        key = (endpoint, method, status)
+
+        if key not in self._requests:
+            self._requests[key] = Histogram()
+
+        self._requests[key].observe(duration)
+
+    def polled(self, adapter_id, duration, error):
+        if adapter_id not in self._polls:
+            self._polls[adapter_id] = [Histogram(), 0]
+
+        self._polls[adapter_id][0].observe(duration)
+        self._polls[adapter_id][1] += error
+
+    def instrument_module(self, module):
+        """
+        Replaces the functions defined in <module> with functions that count
+        their calls and the time spent in them, for instance the signal
+        handlers of routes/signals.py before they are connected
+        """
+        for name, func in inspect.getmembers(module, inspect.isfunction):
+            if func.__module__ != module.__name__:
+                continue
+
+            # Already instrumented
+            if getattr(func, "instrumented", False):
+                continue
+
+            setattr(module, name, self._instrument(name, func))
+
+    def _instrument(self, name, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+
+            try:
+                return func(*args, **kwargs)
+            finally:
+                counters = self._handlers.setdefault(name, [0, 0])
+                counters[0] += 1
+                counters[1] += time.perf_counter() - t0
+
+        wrapper.instrumented = True
+
+        return wrapper
+
+    def render(self):
+        """
+        :returns: All metrics in the Prometheus text exposition format
+        """
+        lines = [
+            "# HELP mxcubeweb_emit_total Events emitted with Server.emit",
+            "# TYPE mxcubeweb_emit_total counter",
+        ]
+
+        for (event, namespace), (count, *_) in sorted(self._emits.items()):
+            labels = _labels(event=event, namespace=namespace)
+            lines.append("mxcubeweb_emit_total%s %s" % (labels, count))
+
+        lines += [
+            "# HELP mxcubeweb_emit_bytes_total Size of the emitted data as "
+            "JSON, estimated from one emit in %s" % EMIT_SAMPLE_INTERVAL,
+            "# TYPE mxcubeweb_emit_bytes_total counter",
+        ]
+
+        for (event, namespace), (_, size, *_) in sorted(self._emits.items()):
+            labels = _labels(event=event, namespace=namespace)
+            lines.append("mxcubeweb_emit_bytes_total%s %s" % (labels, size))
+
+        lines += [
+            "# HELP mxcubeweb_emit_serialization_seconds_total Time spent "
+            "serialising the emitted data to JSON, estimated from one emit "
+            "in %s" % EMIT_SAMPLE_INTERVAL,
+            "# TYPE mxcubeweb_emit_serialization_seconds_total counter",
+        ]
+
+        for (event, namespace), (_, _, elapsed, *_) in sorted(self._emits.items()):
+            labels = _labels(event=event, namespace=namespace)
+            lines.append(
+                "mxcubeweb_emit_serialization_seconds_total%s %s" % (labels, elapsed)
+            )
+
+        lines += [
+            "# HELP mxcubeweb_request_duration_seconds Duration of the requests",
+            "# TYPE mxcubeweb_request_duration_seconds histogram",
+        ]
+
+        for (endpoint, method, status), histogram in sorted(self._requests.items()):
+            lines += histogram.render(
+                "mxcubeweb_request_duration_seconds",
+                endpoint=endpoint,
+                method=method,
+                status=status,
+            )
+
+        lines += [
+            "# HELP mxcubeweb_signal_handler_calls_total Calls of the signal handlers",
+            "# TYPE mxcubeweb_signal_handler_calls_total counter",
+        ]
+
+        for name, (calls, _) in sorted(self._handlers.items()):
+            labels = _labels(handler=name)
+            lines.append("mxcubeweb_signal_handler_calls_total%s %s" % (labels, calls))
+
+        lines += [
+            (
+                "# HELP mxcubeweb_signal_handler_seconds_total Time spent in the "
+                "signal handlers"
+            ),
+            "# TYPE mxcubeweb_signal_handler_seconds_total counter",
+        ]
+
+        for name, (_, elapsed) in sorted(self._handlers.items()):
+            labels = _labels(handler=name)
+            lines.append(
+                "mxcubeweb_signal_handler_seconds_total%s %s" % (labels, elapsed)
+            )
+
+        lines += [
+            "# HELP mxcubeweb_poll_duration_seconds Duration of the polls",
+            "# TYPE mxcubeweb_poll_duration_seconds histogram",
+        ]
+
+        for adapter_id, (histogram, _) in sorted(self._polls.items()):
+            lines += histogram.render(
+                "mxcubeweb_poll_duration_seconds", adapter=adapter_id
+            )
+
+        lines += [
+            "# HELP mxcubeweb_poll_errors_total Polls that failed",
+            "# TYPE mxcubeweb_poll_errors_total counter",
+        ]
+
+        for adapter_id, (_, errors) in sorted(self._polls.items()):
+            labels = _labels(adapter=adapter_id)
+            lines.append("mxcubeweb_poll_errors_total%s %s" % (labels, errors))
+
+        return "\n".join(lines) + "\n"
@@ -5,6 +5,7 @@ import smtplib
 import time
 import os
 import logging
+import gevent
 
 from email.mime.text import MIMEText
 from email.utils import make_msgid
@@ -26,6 +27,7 @@ def RateLimited(maxPerSecond):
     lastTimeCalled = {}
 
     def decorate(func):
+        @functools.wraps(func)
         def rateLimitedFunction(*args, **kargs):
             if type(args[0]) is dict:
                 key = args[0].get("Signal")
@@ -45,6 +47,75 @@ def RateLimited(maxPerSecond):
     return decorate
 
 
+class Throttle:
+    """
+    Calls <func> at most <max_per_second> times per second.
+
+    The first call is made directly (leading edge), calls made within the
+    interval are coalesced and only the latest one is made when the interval
+    has passed (trailing edge), so that the last value is always delivered.
+    Each Throttle keeps only the latest call, one Throttle is used per
+    adapter and signal. A <max_per_second> of 0 makes every call directly.
+    """
+
+    def __init__(self, func, max_per_second):
+        self._func = func
+        self._interval = 1.0 / float(max_per_second) if max_per_second else 0
+        self._last_call = 0
+        self._pending = None
+        self._timer = None
+        self.delivered = 0
+        self.coalesced = 0
+
+    def __call__(self, *args, **kwargs):
+        elapsed = time.time() - self._last_call
+
+        if elapsed >= self._interval and self._timer is None:
+            return self._deliver(args, kwargs)
+
+        if self._pending is not None:
+            self.coalesced += 1
+
+        self._pending = (args, kwargs)
+
+        if self._timer is None:
+            self._timer = gevent.spawn_later(self._interval - elapsed, self._flush)
+
+    def _deliver(self, args, kwargs):
+        self._last_call = time.time()
+        self.delivered += 1
+
+        return self._func(*args, **kwargs)
+
+    def _flush(self):
+        self._timer = None
+        pending, self._pending = self._pending, None
+
+        if pending is not None:
+            try:
+                self._deliver(*pending)
+            except Exception:
+                logging.getLogger("MX3.HWR").exception(
+                    "Error in throttled call to %s" % self._func
+                )
+
+    def cancel(self):
+        """
+        Drops the pending call, if any
+        """
+        if self._timer is not None:
+            self._timer.kill(block=False)
+            self._timer = None
+
+        self._pending = None
+
+    def get_counters(self):
+        """
+        :returns: dictionary on the form {delivered: n, coalesced: n}
+        """
+        return {"delivered": self.delivered, "coalesced": self.coalesced}
+
+
 def remote_addr():
     hdr = flask.request.headers.get("x-forwarded-for", flask.request.remote_addr)
 
@@ -99,6 +170,17 @@ def require_control(f):
     return wrapped
 
 
+def require_staff(f):
+    @functools.wraps(f)
+    def wrapped(*args, **kwargs):
+        if not (current_user.is_authenticated and current_user.isstaff):
+            return flask.Response(status=401)
+        else:
+            return f(*args, **kwargs)
+
+    return wrapped
+
+
 def ws_valid_login_only(f):
     @functools.wraps(f)
     def wrapped(*args, **kwargs):
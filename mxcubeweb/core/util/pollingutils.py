@@ -0,0 +1,134 @@
+import gevent
+import logging
+import random
+import time
+
+from gevent.pool import Pool
+
+# The interval of an adapter whose value and state do not change is doubled
+# after each poll, up to POLL_BACKOFF times its configured interval
+POLL_BACKOFF = 8
+
+# Intervals are varied by up to this fraction so that the adapters polled at
+# the same rate are not all polled at the same time
+POLL_JITTER = 0.1
+
+# States in which an adapter is polled at its configured interval
+MOVING_STATES = ("BUSY", "MOVING")
+
+
+class Poller:
+    """
+    Polls the hardware objects that do not send valueChanged or stateChanged
+    reliably, for the adapters with a poll interval (AdapterBase.poll_interval).
+
+    Each adapter is polled at its interval while its value or state changes
+    or while it is moving, the interval is then doubled after each poll
+    without change up to POLL_BACKOFF times the configured one. At most
+    <concurrency> hardware objects are read at the same time. The changes are
+    sent by the adapter as if the signals were received (AdapterBase.poll).
+    """
+
+    def __init__(self, app, concurrency):
+        self._app = app
+        self._pool = Pool(max(concurrency, 1))
+        # adapter id -> {adapter, interval, polls, errors, changes, ...}
+        self._entries = {}
+        # adapter id -> greenlet polling the adapter
+        self._greenlets = {}
+
+    def add(self, adapter):
+        """
+        Starts polling <adapter> if it has a poll interval
+        """
+        interval = adapter.poll_interval()
+
+        if not interval or adapter.ho is None:
+            return
+
+        entry = {
+            "adapter": adapter,
+            "minInterval": interval,
+            "interval": interval,
+            "polls": 0,
+            "errors": 0,
+            "changes": 0,
+            "totalTime": 0,
+            "maxTime": 0,
+            "lastPollFailed": False,
+        }
+
+        if self._entries.setdefault(adapter._name, entry) is entry:
+            self._greenlets[adapter._name] = gevent.spawn(self._run, entry)
+
+    def stop(self):
+        """
+        Stops polling all adapters
+        """
+        gevent.killall(list(self._greenlets.values()))
+        self._pool.kill()
+        self._greenlets.clear()
+        self._entries.clear()
+
+    def _run(self, entry):
+        while True:
+            jitter = random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+            gevent.sleep(entry["interval"] * jitter)
+            self._pool.spawn(self._poll, entry).join()
+
+    def _poll(self, entry):
+        adapter = entry["adapter"]
+        t0 = time.perf_counter()
+        error = False
+
+        try:
+            changed, moving = adapter.poll()
+        except Exception:
+            # Logged once until the hardware object can be read again
+            if not entry["lastPollFailed"]:
+                logging.getLogger("MX3.HWR").exception(
+                    "Could not poll %s" % adapter._name
+                )
+
+            error = True
+            changed = moving = False
+
+        duration = time.perf_counter() - t0
+
+        entry["polls"] += 1
+        entry["errors"] += error
+        entry["changes"] += changed
+        entry["totalTime"] += duration
+        entry["maxTime"] = max(entry["maxTime"], duration)
+        entry["lastPollFailed"] = error
+
+        if changed or moving:
+            entry["interval"] = entry["minInterval"]
+        else:
+            entry["interval"] = min(
+                entry["interval"] * 2, entry["minInterval"] * POLL_BACKOFF
+            )
+
+        metrics = self._app.server.metrics if self._app.server else None
+
+        if metrics:
+            metrics.polled(adapter._name, duration, error)
+
+    def get_stats(self):
+        """
+        :returns: dictionary with adapter id as key and a dictionary on the
+                  form {interval, polls, errors, changes, meanTime, maxTime}
+                  as value, the times are the durations of the polls in
+                  seconds
+        """
+        return {
+            _id: {
+                "interval": entry["interval"],
+                "polls": entry["polls"],
+                "errors": entry["errors"],
+                "changes": entry["changes"],
+                "meanTime": entry["totalTime"] / max(entry["polls"], 1),
+                "maxTime": entry["maxTime"],
+            }
+            for _id, entry in self._entries.items()
+        }
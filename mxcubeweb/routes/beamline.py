@@ -1,12 +1,18 @@
 import sys
 import logging
 import typing
+import pydantic
 import spectree
 from werkzeug.exceptions import UnsupportedMediaType
 
 from flask import Blueprint, Response, jsonify, request, make_response
+from flask_socketio import join_room, leave_room
 
-from mxcubeweb.core.adapter.adapter_base import ActuatorAdapterBase
+from mxcubeweb.core.adapter.adapter_base import (
+    ActuatorAdapterBase,
+    adapter_room,
+    ALL_ADAPTERS_ROOM,
+)
 
 from mxcubecore import HardwareRepository as HWR
 
@@ -82,7 +88,111 @@ def create_route(app, server, bp, adapter, obj, cmd_name):
     set_func.__name__ = f"{obj}_{cmd_name}"
 
 
+def _get_adapter_method(app, atype, name, attr):
+    adapter = app.mxcubecore.get_adapter(name)
+
+    if adapter is None or adapter.adapter_type.lower() != atype:
+        return None
+
+    return getattr(adapter, attr, None)
+
+
+def add_lazy_adapter_routes(app, server, bp):
+    """
+    Routes of add_adapter_routes that find the adapter, its method and the
+    models of the method when they are requested, so that the adapters do
+    not have to be created when the routes are registered (lazy_adapters).
+    The request data is validated in the route instead of by spectree.
+    """
+
+    @bp.route("/<string:atype>/<string:name>/<string:attr>", methods=["POST"])
+    @server.restrict
+    def adapter_get(atype, name, attr):
+        if not (attr == "data" or attr.startswith("get")):
+            return Response(status=404)
+
+        func = _get_adapter_method(app, atype, name, attr)
+
+        if not callable(func):
+            return Response(status=404)
+
+        model = app.mxcubecore.get_adapter(name)._model_from_typehint(func)
+
+        try:
+            args = request.get_json()
+        except UnsupportedMediaType:
+            args = {}
+
+        args = args or {}
+
+        try:
+            model["args"].parse_obj(args)
+        except pydantic.ValidationError as ex:
+            return make_response(ex.json(), 422)
+
+        result = model["return"](**{"return": func(**args)})
+
+        return make_response(result.json(), 200)
+
+    @bp.route("/<string:atype>/<string:setter>/<string:name>", methods=["PUT"])
+    @server.require_control
+    @server.restrict
+    def adapter_set(atype, setter, name):
+        """
+        Tries to set < name > to value
+        Replies with status code 200 on success and 409 on exceptions.
+        """
+        attr = "_set_value" if setter == "value" else f"set_{setter}"
+        func = _get_adapter_method(app, atype, name, attr)
+        set_type_hint = typing.get_type_hints(func) if callable(func) else {}
+
+        if "value" not in set_type_hint:
+            return Response(status=404)
+
+        try:
+            rd = set_type_hint["value"].parse_raw(request.data)
+        except pydantic.ValidationError as ex:
+            return make_response(ex.json(), 422)
+
+        # Set on the adapter named in the data, like the routes of
+        # add_adapter_routes
+        func = _get_adapter_method(app, atype, rd.name.lower(), attr)
+
+        if not callable(func):
+            return Response(status=404)
+
+        func(rd)
+        return "Value set successfully"
+
+    @bp.route("/<string:obj>/command/<string:cmd_name>", methods=["POST"])
+    @server.require_control
+    @server.restrict
+    def adapter_command(obj, cmd_name):
+        """
+        Tries to set < name > to value
+        Replies with status code 200 on success and 409 on exceptions.
+        """
+        adapter = app.mxcubecore.get_adapter(obj.lower())
+
+        if adapter is None or cmd_name not in adapter._exported_methods():
+            return Response(status=404)
+
+        args = request.get_json()
+
+        try:
+            adapter._pydantic_model_for_command(cmd_name).parse_obj(args)
+        except pydantic.ValidationError as ex:
+            return make_response(ex.json(), 422)
+
+        adapter.execute_command(cmd_name, args)
+        return "Command executed successfull"
+
+
 def add_adapter_routes(app, server, bp):
+    if app.CONFIG.app.lazy_adapters:
+        add_lazy_adapter_routes(app, server, bp)
+        return
+
     adapter_type_list = []
 
     for _id, a in app.mxcubecore.adapter_dict.items():
@@ -119,15 +229,84 @@ def add_adapter_routes(app, server, bp):
             create_route(app, server, bp, adapter, _id, cmd_name)
 
 
+def get_adapter_rooms(app, adapter_ids):
+    """
+    :returns: dictionary with the Socket.IO room of each known adapter id in
+              <adapter_ids>, "*" for all adapters. All ids are considered
+              known if <app> is None (front-end process without adapters)
+    """
+    if isinstance(adapter_ids, str):
+        adapter_ids = [adapter_ids]
+
+    rooms = {}
+
+    for _id in adapter_ids or []:
+        if _id == "*":
+            rooms[_id] = ALL_ADAPTERS_ROOM
+        elif app is None or _id in app.mxcubecore.adapter_dict:
+            rooms[_id] = adapter_room(_id)
+
+    return rooms
+
+
+def init_subscription_handlers(app, server):
+    """
+    Registers the Socket.IO handlers with which clients subscribe to the
+    events of specific adapters, <app> is None in a front-end process
+    """
+
+    @server.flask_socketio.on("subscribe", namespace="/hwr")
+    @server.ws_restrict
+    def subscribe(adapter_ids):
+        """
+        Subscribes the client to the events of the adapters with the given
+        ids, "*" for all adapters. Clients are subscribed to all adapters
+        when connecting.
+
+        :returns: List of the ids subscribed to, unknown ids are ignored
+        """
+        rooms = get_adapter_rooms(app, adapter_ids)
+
+        # Adapters not created yet (lazy_adapters) are created on the first
+        # subscription to their events
+        for _id in rooms:
+            if app is not None and _id != "*":
+                app.mxcubecore.get_adapter(_id)
+
+        for room in rooms.values():
+            join_room(room)
+
+        return list(rooms.keys())
+
+    @server.flask_socketio.on("unsubscribe", namespace="/hwr")
+    @server.ws_restrict
+    def unsubscribe(adapter_ids):
+        """
+        Unsubscribes the client from the events of the adapters with the given
+        ids, "*" to only receive the events of the adapters explicitly
+        subscribed to.
+
+        :returns: List of the ids unsubscribed from
+        """
+        rooms = get_adapter_rooms(app, adapter_ids)
+
+        for room in rooms.values():
+            leave_room(room)
+
+        return list(rooms.keys())
+
+
 def init_route(app, server, url_prefix):
     bp = Blueprint("beamline", __name__, url_prefix=url_prefix)
 
     add_adapter_routes(app, server, bp)
+    init_subscription_handlers(app, server)
 
     @bp.route("/", methods=["GET"])
     @server.restrict
     def beamline_get_all_attributes():
-        return jsonify(app.beamline.beamline_get_all_attributes())
+        refresh = request.args.get("refresh", "false").lower() in ("1", "true")
+        return jsonify(app.beamline.beamline_get_all_attributes(refresh))
 
     @bp.route("/<name>/abort", methods=["GET"])
     @server.require_control
@@ -182,6 +361,23 @@ def init_route(app, server, url_prefix):
         """
         return jsonify(app.beamline.get_beam_info())
 
+    @bp.route("/event_counters", methods=["GET"])
+    @server.restrict
+    def beamline_get_event_counters():
+        """
+        Number of value change events delivered and coalesced by each adapter
+        """
+        return jsonify(app.beamline.get_event_counters())
+
+    @bp.route("/poll_stats", methods=["GET"])
+    @server.restrict
+    def beamline_get_poll_stats():
+        """
+        Interval, number of polls, errors and changes, and duration of the
+        polls of each polled adapter
+        """
+        return jsonify(app.beamline.get_poll_stats())
+
     @bp.route("/datapath", methods=["GET"])
     @server.restrict
     def beamline_get_data_path():
@@ -5,7 +5,7 @@ import flask_login
 
 from datetime import datetime
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, make_response
 from spectree import Response
 
 from mxcubeweb import __version__
@@ -38,6 +38,20 @@ def init_route(app, server, url_prefix):
         logging.getLogger("HWR").info("[Main] Serving main page")
         return server.flask.send_static_file("index.html")
 
+    @bp.route("/metrics")
+    def get_metrics():
+        """
+        Metrics of the emitted events, requests and signal handlers in the
+        Prometheus text format, not restricted so that they can be scraped.
+        Replies with status code 404 if metrics are not enabled.
+        """
+        if server.metrics is None:
+            return make_response("", 404)
+
+        return make_response(
+            server.metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4"}
+        )
+
     @bp.route("/uiproperties")
     @server.restrict
     @server.validate(resp=Response(HTTP_200=UIPropertiesListModel))
@@ -0,0 +1,35 @@
+from flask import Blueprint, Response
+
+# Read-only route -> snapshot (see SNAPSHOT_EVENTS)
+MIRRORED_ROUTES = {
+    "/beamline/": "beamline",
+    "/queue/queue_state": "queue_state",
+    "/sample_changer/contents": "sc_contents",
+    "/sampleview/shapes": "shapes",
+    "/log/": "log",
+}
+
+
+def init_route(mirror, server, url_prefix):
+    """
+    Routes of a mirror process (see the --mirror option), the read-only
+    routes of the control process served from the snapshots in <mirror>
+    """
+    bp = Blueprint("mirror", __name__, url_prefix=url_prefix)
+
+    def create_route(rule, name):
+        @bp.route(rule, endpoint=f"get_{name}", methods=["GET"])
+        @server.restrict
+        def get_snapshot():
+            payload = mirror.get(name)
+
+            # Not published yet by the control process
+            if payload is None:
+                return Response(status=503)
+
+            return Response(payload, status=200, mimetype="application/json")
+
+    for rule, name in MIRRORED_ROUTES.items():
+        create_route(rule, name)
+
+    return bp
@@ -131,6 +131,44 @@ def init_route(app, server, url_prefix):  # noqa: C901
         resp.status_code = 200
         return resp
 
+    @bp.route("/changes", methods=["GET"])
+    @server.restrict
+    def queue_get_changes():
+        """
+        Get the changes made to the queue after a given version, the version
+        is passed with the query parameter since.
+
+        :returns: Response object response Content-Type: application/json, json
+                object containing the changes. The status code is set to:
+
+                200: On success
+                400: Invalid version
+        """
+        try:
+            since = int(request.args.get("since", 0))
+        except ValueError:
+            return Response(status=400)
+
+        resp = jsonify(app.queue.get_queue_changes(since))
+        resp.status_code = 200
+        return resp
+
+    @bp.route("/progress_metrics", methods=["GET"])
+    @server.restrict
+    def queue_get_progress_metrics():
+        """
+        Get the frame progress metrics, number of frames taken, frames per
+        second and the number of progress updates published and coalesced.
+
+        :returns: Response object response Content-Type: application/json, json
+                  object containing the metrics. The status code is set to:
+
+                  200: On success
+        """
+        resp = jsonify(app.queue.progress.get_metrics())
+        resp.status_code = 200
+        return resp
+
     @bp.route("/<sid>/<tindex>/execute", methods=["PUT"])
     @server.require_control
     @server.restrict
@@ -180,6 +218,47 @@ def init_route(app, server, url_prefix):  # noqa: C901
 
         return resp
 
+    @bp.route("/import", methods=["POST"])
+    @server.require_control
+    @server.restrict
+    def queue_import():
+        """
+        Add a list of samples and tasks to the queue in one batch, items that
+        could not be added are reported with the errors that occurred.
+
+        :returns: Response object response Content-Type: application/json, json
+                object on the form:
+                {
+                    added: number of items added,
+                    errors: [{index, sampleID, errors}, ...],
+                    sampleOrder: sample order of the queue,
+                    sampleList: sample list
+                }
+        :statuscode: 200: no error
+        :statuscode: 400: the body is not a list of items
+        """
+        item_list = request.get_json()
+
+        if not isinstance(item_list, list):
+            return Response(status=400)
+
+        # The changes are sent to all clients with the signal 'queue_change'
+        result = app.queue.queue_import(item_list)
+        queue = app.queue.queue_to_dict()
+        sample_list = app.lims.sample_list_get(current_queue=queue)
+
+        result.update(
+            {
+                "sampleOrder": queue.get("sample_order", []),
+                "sampleList": sample_list.get("sampleList", {}),
+            }
+        )
+
+        resp = jsonify(result)
+        resp.status_code = 200
+
+        return resp
+
     @bp.route("/<sqid>/<tqid>", methods=["POST"])
     @server.require_control
     @server.restrict
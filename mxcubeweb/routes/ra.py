@@ -11,6 +11,9 @@ from flask import (
 )
 
 from flask_login import current_user
+from flask_socketio import join_room
+
+from mxcubeweb.core.adapter.adapter_base import ALL_ADAPTERS_ROOM
 
 DISCONNECT_HANDLED = True
 
@@ -195,12 +198,93 @@ def init_route(app, server, url_prefix):  # noqa: C901
     def get_all_mesages():
         return jsonify({"messages": app.chat.get_all_messages()})
 
+    @bp.route("/clients", methods=["GET"])
+    @server.require_staff
+    @server.restrict
+    def get_clients():
+        """
+        Number of packets waiting to be written to each client connected to
+        /hwr, and the number of events held back or dropped for slow clients.
+        Only available to staff.
+        """
+        if server.backpressure is None:
+            return jsonify({"clients": [], "resets": 0})
+
+        users = {_u.socketio_session_id: _u for _u in app.usermanager.get_observers()}
+        operator = app.usermanager.get_operator()
+
+        if operator:
+            users[operator.socketio_session_id] = operator
+
+        clients = server.backpressure.get_clients("/hwr")
+
+        for client in clients:
+            user = users.get(client["sid"])
+            client["username"] = user.username if user else None
+            client["nickname"] = user.nickname if user else None
+
+        return jsonify({"clients": clients, "resets": server.backpressure.resets})
+
+    @bp.route("/loop_stalls", methods=["GET"])
+    @server.require_staff
+    @server.restrict
+    def get_loop_stalls():
+        """
+        Number and duration of the times the gevent hub was blocked, and the
+        code that blocked it for the longest time (see LoopMonitor). Only
+        available to staff.
+        """
+        if server.loop_monitor is None:
+            return Response(status=404)
+
+        return jsonify(server.loop_monitor.get_stats())
+
+    @bp.route("/profile", methods=["GET"])
+    @server.require_staff
+    @server.restrict
+    def get_profile():
+        """
+        Samples the stacks of the running greenlets for the given number of
+        seconds (see SamplingProfiler). Only available to staff.
+
+        Args:
+            seconds: duration of the profile, default 10, at most 60
+            allocations: number of top memory allocations, default 0 to not
+                         trace allocations
+            format: "collapsed" for the collapsed stacks as text, to be read
+                    by flame graph tools, JSON by default
+
+        Returns: 400 if seconds is not a positive number or allocations is
+                 negative, 409 if a profile is already being taken
+        """
+        try:
+            seconds = float(request.args.get("seconds", 10))
+            allocations = int(request.args.get("allocations", 0))
+        except ValueError:
+            return Response(status=400)
+
+        if not 0 < seconds < float("inf") or allocations < 0:
+            return Response(status=400)
+
+        if server.profiler.running:
+            return Response(status=409)
+
+        profile = server.profiler.profile(seconds, allocations)
+
+        if request.args.get("format") == "collapsed":
+            return Response(profile["collapsed"], mimetype="text/plain")
+
+        return jsonify(profile)
+
     @server.flask_socketio.on("connect", namespace="/hwr")
     @server.ws_restrict
     def connect():
         current_user.socketio_session_id = request.sid
         app.usermanager.update_user(current_user)
 
+        # Events of all adapters until the client subscribes to specific ones
+        join_room(ALL_ADAPTERS_ROOM)
+
     @server.flask_socketio.on("disconnect", namespace="/hwr")
     def disconnect():
         if current_user.is_anonymous:
@@ -28,19 +28,21 @@ from mxcubeweb.core.util.networkutils import RateLimited
 from mxcubecore import HardwareRepository as HWR
 
 
-def last_queue_node():
-    node = HWR.beamline.queue_manager._current_queue_entries[-1].get_data_model()
-
-    # Reference collections are orphans, the node we want is the
-    # characterisation not the reference collection itself
-    if "refdc" in node.get_name():
-        parent = node.get_parent()
-        node = parent._children[0]
-
-    res = mxcube.queue.node_index(node)
-    res["node"] = node
+def current_context(signal):
+    """
+    :param str signal: Name of the signal being handled, for logging
+    :returns: ExecutionContext of the entry being executed, None if no entry
+              is executed (for instance a collection started outside of the
+              queue)
+    """
+    context = mxcube.queue.execution.current
+
+    if context is None:
+        logging.getLogger("HWR").debug(
+            "[TASK CALLBACK] %s ignored, no queue entry is executed" % signal
+        )
 
-    return res
+    return context
 
 
 beam_signals = [
@@ -381,15 +383,18 @@ def queue_execution_failed(entry):
 
 
 def collect_oscillation_started(*args):
-    node = last_queue_node()
+    context = current_context("collectOscillationStarted")
 
-    if not mxcube.queue.is_interleaved(node["node"]):
+    if context is None:
+        return
+
+    if not context.interleaved:
         msg = {
             "Signal": "collectOscillationStarted",
             "Message": task_signals["collectOscillationStarted"],
-            "taskIndex": node["idx"],
-            "queueID": node["queue_id"],
-            "sample": node["sample"],
+            "taskIndex": context.idx,
+            "queueID": context.queue_id,
+            "sample": context.sample,
             "state": RUNNING,
             "progress": 0,
         }
@@ -403,30 +408,14 @@ def collect_oscillation_started(*args):
 
 
 def collect_image_taken(frame):
-    node = last_queue_node()
-
-    if not mxcube.queue.is_interleaved(node["node"]):
-        progress = mxcube.queue.get_task_progress(last_queue_node()["node"], frame)
+    context = current_context("collectImageTaken")
 
-        msg = {
-            "Signal": "collectImageTaken",
-            "Message": task_signals["collectImageTaken"],
-            "taskIndex": node["idx"],
-            "queueID": node["queue_id"],
-            "sample": node["sample"],
-            "state": RUNNING if progress < 1 else COLLECTED,
-            "progress": progress,
-        }
-        try:
-            _emit_progress(msg)
-        except Exception:
-            logging.getLogger("HWR").error("error sending message: " + str(msg))
+    if context is None:
+        return
 
-
-@RateLimited(1)
-def _emit_progress(msg):
-    logging.getLogger("HWR").debug("[TASK CALLBACK] " + str(msg))
-    server.emit("task", msg, namespace="/hwr")
+    # Progress is published periodically, see ProgressAggregator
+    if not context.interleaved:
+        mxcube.queue.progress.frame_taken(context, frame)
 
 
 def collect_oscillation_failed(
@@ -437,11 +426,14 @@ def collect_oscillation_failed(
     osc_id=None,
     params=None,
 ):
-    node = last_queue_node()
+    context = current_context("collectOscillationFailed")
+
+    if context is None:
+        return
 
-    mxcube.NODE_ID_TO_LIMS_ID[node["queue_id"]] = lims_id
+    mxcube.NODE_ID_TO_LIMS_ID[context.queue_id] = lims_id
 
-    if not mxcube.queue.is_interleaved(node["node"]):
+    if not context.interleaved:
         try:
             HWR.beamline.lims_rest.get_dc(lims_id)
         except Exception:
@@ -450,9 +442,9 @@ def collect_oscillation_failed(
         msg = {
             "Signal": "collectOscillationFailed",
             "Message": task_signals["collectOscillationFailed"],
-            "taskIndex": node["idx"],
-            "queueID": node["queue_id"],
-            "sample": node["sample"],
+            "taskIndex": context.idx,
+            "queueID": context.queue_id,
+            "sample": context.sample,
             "state": FAILED,
             "progress": 0,
         }
@@ -466,16 +458,20 @@ def collect_oscillation_failed(
 
 
 def collect_oscillation_finished(owner, status, state, lims_id, osc_id, params):
-    node = last_queue_node()
-    mxcube.NODE_ID_TO_LIMS_ID[node["queue_id"]] = lims_id
+    context = current_context("collectOscillationFinished")
+
+    if context is None:
+        return
 
-    if not mxcube.queue.is_interleaved(node["node"]):
+    mxcube.NODE_ID_TO_LIMS_ID[context.queue_id] = lims_id
+
+    if not context.interleaved:
         msg = {
             "Signal": "collectOscillationFinished",
             "Message": task_signals["collectOscillationFinished"],
-            "taskIndex": node["idx"],
-            "queueID": node["queue_id"],
-            "sample": node["sample"],
+            "taskIndex": context.idx,
+            "queueID": context.queue_id,
+            "sample": context.sample,
             "state": COLLECTED,
             "progress": 1,
         }
@@ -489,17 +485,20 @@ def collect_oscillation_finished(owner, status, state, lims_id, osc_id, params):
 
 
 def collect_ended(owner, success, message):
-    node = last_queue_node()
+    context = current_context("collectEnded")
+
+    if context is None:
+        return
 
-    if not mxcube.queue.is_interleaved(node["node"]):
+    if not context.interleaved:
         state = COLLECTED if success else WARNING
 
         msg = {
             "Signal": "collectOscillationFinished",
             "Message": message,
-            "taskIndex": node["idx"],
-            "queueID": node["queue_id"],
-            "sample": node["sample"],
+            "taskIndex": context.idx,
+            "queueID": context.queue_id,
+            "sample": context.sample,
             "state": state,
             "progress": 1,
         }
@@ -513,15 +512,18 @@ def collect_ended(owner, success, message):
 
 
 def collect_started(*args, **kwargs):
-    node = last_queue_node()
+    context = current_context(kwargs["signal"])
+
+    if context is None:
+        return
 
-    if not mxcube.queue.is_interleaved(node["node"]):
+    if not context.interleaved:
         msg = {
             "Signal": kwargs["signal"],
             "Message": task_signals[kwargs["signal"]],
-            "taskIndex": last_queue_node()["idx"],
-            "queueID": last_queue_node()["queue_id"],
-            "sample": last_queue_node()["sample"],
+            "taskIndex": context.idx,
+            "queueID": context.queue_id,
+            "sample": context.sample,
             "state": RUNNING,
             "progress": 0,
         }
@@ -547,14 +549,17 @@ def energy_scan_finished(pk, ip, rm, sample):
 
 
 def queue_interleaved_started():
-    node = last_queue_node()
+    context = current_context("queue_interleaved_started")
+
+    if context is None:
+        return
 
     msg = {
         "Signal": "queue_interleaved_started",
         "Message": "Interleaved collection started",
-        "taskIndex": node["idx"],
-        "queueID": node["queue_id"],
-        "sample": node["sample"],
+        "taskIndex": context.idx,
+        "queueID": context.queue_id,
+        "sample": context.sample,
         "state": RUNNING,
         "progress": 0,
     }
@@ -568,14 +573,17 @@ def queue_interleaved_started():
 
 
 def queue_interleaved_finished():
-    node = last_queue_node()
+    context = current_context("queue_interleaved_finished")
+
+    if context is None:
+        return
 
     msg = {
         "Signal": "queue_interleaved_finished",
         "Message": "Interleaved collection ended",
-        "taskIndex": node["idx"],
-        "queueID": node["queue_id"],
-        "sample": node["sample"],
+        "taskIndex": context.idx,
+        "queueID": context.queue_id,
+        "sample": context.sample,
         "state": COLLECTED,
         "progress": 1,
     }
@@ -589,15 +597,19 @@ def queue_interleaved_finished():
 
 
 def queue_interleaved_sw_done(data):
-    node = last_queue_node()
-    progress = mxcube.queue.get_task_progress(node["node"], data)
+    context = current_context("queue_interleaved_sw_done")
+
+    if context is None:
+        return
+
+    progress = context.progress(data)
 
     msg = {
         "Signal": "collectImageTaken",
         "Message": task_signals["collectImageTaken"],
-        "taskIndex": node["idx"],
-        "queueID": node["queue_id"],
-        "sample": node["sample"],
+        "taskIndex": context.idx,
+        "queueID": context.queue_id,
+        "sample": context.sample,
         "state": RUNNING if progress < 1 else COLLECTED,
         "progress": progress,
     }
@@ -611,14 +623,17 @@ def queue_interleaved_sw_done(data):
 
 
 def xrf_task_progress(taskId, progress):
-    node = last_queue_node()
+    context = current_context("XRFTaskUpdate")
+
+    if context is None:
+        return
 
     msg = {
         "Signal": "XRFTaskUpdate",
         "Message": "XRFTaskUpdate",
-        "taskIndex": node["idx"],
-        "queueID": node["queue_id"],
-        "sample": node["sample"],
+        "taskIndex": context.idx,
+        "queueID": context.queue_id,
+        "sample": context.sample,
         "state": RUNNING if progress < 1 else COLLECTED,
         "progress": progress,
     }
@@ -3,19 +3,31 @@ import logging
 import signal
 import atexit
 import os
+import time
 import werkzeug
 
 import gevent
 
 from werkzeug.middleware.proxy_fix import ProxyFix
-from flask import Flask, request
-from flask_socketio import SocketIO
+from flask import Flask, g, request
+from flask_login import current_user
+from flask_socketio import SocketIO, join_room, leave_room, rooms
 
 import flask_security
 
 from spectree import SpecTree
 
 from mxcubeweb.core.util import networkutils
+from mxcubeweb.core.util.geventutils import LoopMonitor, SamplingProfiler
+from mxcubeweb.core.util.metricsutils import Metrics
+from mxcubeweb.core.util.emitutils import (
+    BINARY_ROOM,
+    BackpressureEmitter,
+    BinaryArrayEmitter,
+    EmitBatcher,
+    EventLog,
+    send_events,
+)
 from mxcubeweb.core.components.user.database import (
     init_db,
     UserDatastore,
@@ -31,6 +43,17 @@ class Server:
     user_datastore = None
     db_session = None
     flask_socketio = None
+    # SocketIO, or BinaryArrayEmitter and BackpressureEmitter wrapping it
+    emitter = None
+    backpressure = None
+    emit_batcher = None
+    event_log = None
+    # StatePublisher of the control process, when mirror processes are used
+    state_publisher = None
+    metrics = None
+    loop_monitor = None
+    profiler = None
+    port = 8081
 
     def __init__(self):
         raise NotImplementedError(
@@ -43,8 +66,41 @@ class Server:
         logging.getLogger("exceptions").exception(err_msg)
         return err_msg + ": " + traceback.format_exc(), 409
 
+    @staticmethod
+    def after_request(response):
+        # Requests other than GET can change the state without an event
+        # being emitted, the mirrored snapshots are published again
+        if Server.state_publisher and request.method != "GET":
+            Server.state_publisher.state_changed()
+
+        return response
+
+    @staticmethod
+    def request_started():
+        if Server.metrics:
+            g.request_started = time.perf_counter()
+
+    @staticmethod
+    def request_finished(response):
+        started = g.get("request_started")
+
+        if Server.metrics and started is not None:
+            Server.metrics.request_handled(
+                request.endpoint,
+                request.method,
+                response.status_code,
+                time.perf_counter() - started,
+            )
+
+        return response
+
     @staticmethod
     def kill_processes():
+        from mxcubeweb.app import MXCUBECore
+
+        if MXCUBECore.poller:
+            MXCUBECore.poller.stop()
+
         # Killing the processes causes pytest to fail because
         # of non-zero exit code, so we don't kill the processes
         # when running the tests
@@ -73,6 +129,19 @@ class Server:
         Server.flask.wsgi_app = ProxyFix(Server.flask.wsgi_app)
         Server.flask.config.from_object(cfg.flask)
         Server.flask.register_error_handler(Exception, Server.exception_handler)
+        Server.port = cmdline_options.port
+        Server.flask.after_request(Server.after_request)
+
+        if cfg.app.loop_stall_threshold > 0 and Server.loop_monitor is None:
+            Server.loop_monitor = LoopMonitor(cfg.app.loop_stall_threshold / 1000.0)
+
+        if Server.profiler is None:
+            Server.profiler = SamplingProfiler()
+
+        # The hooks do nothing when metrics are not enabled
+        Server.metrics = Metrics() if cfg.app.metrics else None
+        Server.flask.before_request(Server.request_started)
+        Server.flask.after_request(Server.request_finished)
 
         db_session = init_db(cfg.flask.USER_DB_PATH)
         Server.user_datastore = UserDatastore(
@@ -84,9 +153,37 @@ class Server:
         Server.flask_socketio = SocketIO(
             manage_session=False,
             cors_allowed_origins=cfg.flask.ALLOWED_CORS_ORIGINS,
+            message_queue=cfg.app.socketio.message_queue or None,
         )
         Server.flask_socketio.init_app(Server.flask)
 
+        Server.emitter = Server.flask_socketio
+
+        if cfg.app.socketio.binary_min_length > 0:
+            Server.emitter = BinaryArrayEmitter(
+                Server.flask_socketio, cfg.app.socketio.binary_min_length
+            )
+
+        if cfg.app.socketio.slow_client_limit > 0:
+            Server.backpressure = BackpressureEmitter(
+                Server.flask_socketio,
+                Server.emitter,
+                cfg.app.socketio.slow_client_limit,
+                cfg.app.socketio.client_reset_limit or float("inf"),
+            )
+            Server.emitter = Server.backpressure
+
+        if cfg.app.socketio.batch_interval > 0:
+            Server.emit_batcher = EmitBatcher(
+                Server.emitter,
+                cfg.app.socketio.batch_interval,
+                cfg.app.socketio.batch_bypass,
+                cfg.app.socketio.batch_size,
+            )
+
+        if cfg.app.socketio.replay_buffer > 0:
+            Server.event_log = EventLog(cfg.app.socketio.replay_buffer)
+
         Server.api = SpecTree(
             "flask",
             app=Server.flask,
@@ -107,6 +204,7 @@ class Server:
             # Make the valid_login_only decorator available on server object
             Server.restrict = staticmethod(networkutils.auth_required)
             Server.require_control = staticmethod(networkutils.require_control)
+            Server.require_staff = staticmethod(networkutils.require_staff)
             Server.ws_restrict = staticmethod(networkutils.ws_valid_login_only)
             Server.route = staticmethod(Server.flask.route)
 
@@ -209,14 +307,129 @@ class Server:
             init_harvester_route, mxcube, f"{url_root_prefix}/harvester"
         )
 
+        for namespace in ("/hwr", "/logging"):
+            if Server.event_log:
+                Server.flask_socketio.on_event(
+                    "replay", Server.ws_restrict(Server.replay), namespace=namespace
+                )
+
+            if isinstance(Server.emitter, BinaryArrayEmitter):
+                Server.flask_socketio.on_event(
+                    "set_encoding",
+                    Server.ws_restrict(Server.set_encoding),
+                    namespace=namespace,
+                )
+
         Server.security = flask_security.Security(Server.flask, Server.user_datastore)
 
+    @staticmethod
+    def register_frontend_routes(mirror=None, socketio=True):
+        """
+        Registers the routes of a front-end process (see the --frontend and
+        --mirror options). With <socketio> the process serves Socket.IO
+        connections, events are emitted by the control process through the
+        message queue. With a StateMirror <mirror> the process serves the
+        read-only routes of the control process from the mirrored snapshots.
+        """
+        from mxcubeweb.core.adapter.adapter_base import ALL_ADAPTERS_ROOM
+        from mxcubeweb.routes.beamline import init_subscription_handlers
+        from mxcubeweb.routes.mirror import init_route as init_mirror_route
+
+        Server.security = flask_security.Security(
+            Server.flask, Server.user_datastore, register_blueprint=False
+        )
+
+        if mirror is not None:
+            Server._register_route(init_mirror_route, mirror, "/mxcube/api/v0.1")
+
+        if not socketio:
+            return
+
+        @Server.flask_socketio.on("connect", namespace="/hwr")
+        @Server.ws_restrict
+        def connect():
+            current_user.socketio_session_id = request.sid
+            Server.user_datastore.put(current_user)
+            Server.user_datastore.commit()
+
+            join_room(ALL_ADAPTERS_ROOM)
+
+        @Server.flask_socketio.on("connect", namespace="/logging")
+        @Server.ws_restrict
+        def connect_logging():
+            pass
+
+        init_subscription_handlers(None, Server)
+
+        # The events are numbered by the control process, the replay requests
+        # of reconnecting clients are answered with a reset so that they
+        # reload their state. Without a set_encoding handler the clients
+        # receive numeric arrays as JSON
+        if Server.event_log:
+            for namespace in ("/hwr", "/logging"):
+                Server.flask_socketio.on_event(
+                    "replay", Server.ws_restrict(Server.replay), namespace=namespace
+                )
+
     @staticmethod
     def emit(*args, **kwargs):
-        Server.flask_socketio.emit(*args, **kwargs)
+        stamp = None
+
+        if Server.state_publisher:
+            Server.state_publisher.event_emitted(args[0])
+
+        if Server.metrics:
+            Server.metrics.emitted(args[0], args[1:], kwargs.get("namespace"))
+
+        if Server.event_log:
+            stamp = Server.event_log.append(*args, **kwargs)
+
+        if Server.emit_batcher:
+            Server.emit_batcher.emit(*args, stamp=stamp, **kwargs)
+        else:
+            send_events(Server.emitter, [list(args)], stamp, **kwargs)
+
+    @staticmethod
+    def set_encoding(encoding):
+        """
+        Socket.IO handler, clients that send "binary" receive numeric arrays
+        as binary buffers, "json" (default) to receive them as JSON
+        """
+        if encoding == "binary":
+            join_room(BINARY_ROOM)
+        else:
+            leave_room(BINARY_ROOM)
+
+    @staticmethod
+    def replay(data):
+        """
+        Socket.IO handler for clients that reconnect, <data> is the stamp
+        {log, seq} of the last event received.
+
+        :returns: The events emitted since on the form {log, seq, events},
+                  with the key reset set if they are not available and the
+                  client has to reload its state
+        """
+        # Events collected by the batcher are already numbered
+        if Server.emit_batcher:
+            Server.emit_batcher.flush()
+
+        stamp = {"log": Server.event_log.id, "seq": Server.event_log.seq}
+        events = Server.event_log.since(
+            data.get("log"), data.get("seq", 0), request.namespace, rooms()
+        )
+
+        if events is None:
+            return dict(stamp, reset=True)
+
+        return dict(stamp, events=events)
 
     @staticmethod
     def run(cfg):
+        # Started once initialised, loading the beamline blocks the hub
+        if Server.loop_monitor:
+            Server.loop_monitor.start()
+
         if cfg.flask.CERT == "SIGNED" and cfg.flask.CERT_PEM and cfg.flask.CERT_KEY:
             ssl_context = werkzeug.serving.load_ssl_context(
                 cfg.flask.CERT_PEM, cfg.flask.CERT_KEY
@@ -233,7 +446,7 @@ class Server:
                 Server.flask,
                 ssl_context=ssl_context,
                 host="0.0.0.0",
-                port=8081,
+                port=Server.port,
             )
         else:
-            Server.flask_socketio.run(Server.flask, host="0.0.0.0", port=8081)
+            Server.flask_socketio.run(Server.flask, host="0.0.0.0", port=Server.port)
@@ -25,15 +25,38 @@ sys.path.append(MXCUBE_ROOT)
 sys.path.append("./")
 
 
+import mxcubeweb
+
 from mxcubecore import HardwareRepository
 from mxcubeweb import build_server_and_config
+from mxcubeweb.app import MXCUBECore
+from mxcubeweb.config import Config
+from mxcubeweb.server import Server
 from flask_login import current_user
 
 _SIO_TEST_CLIENT = None
 
 
-@pytest.fixture
-def client():
+class LazyAdaptersConfig(Config):
+    def __init__(self, fpath):
+        super().__init__(fpath)
+        self.app.lazy_adapters = True
+
+
+class MessageQueueConfig(Config):
+    def __init__(self, fpath):
+        super().__init__(fpath)
+        self.app.socketio.message_queue = "memory://"
+        self.app.socketio.replay_buffer = 100
+
+
+class MirrorConfig(Config):
+    def __init__(self, fpath):
+        super().__init__(fpath)
+        self.app.mirror_interval = 0.1
+
+
+def _build_client():
     try:
         os.remove("/tmp/mxcube-test-user.db")
     except FileNotFoundError:
@@ -87,8 +110,39 @@ def client():
 
     assert resp.status_code == 200
 
-    yield client
+    return client
+
+
+def _restore_server(monkeypatch):
+    """
+    Restores the attributes of the server after the test, for tests that
+    build several servers or enable components that later tests do not
+    """
+    for key, value in list(vars(Server).items()):
+        if not key.startswith("__"):
+            monkeypatch.setattr(Server, key, value)
+
+
+def _build_frontend_client(client, argv):
+    """
+    Builds a front-end server with the command line options <argv>
+
+    :returns: Test client of the front-end server, with the session of the
+              control server test client <client>
+    """
+    with client.session_transaction() as session:
+        credentials = dict(session)
+
+    build_server_and_config(test=True, argv=argv)
+    frontend_client = Server.flask.test_client()
+
+    with frontend_client.session_transaction() as session:
+        session.update(credentials)
 
+    return frontend_client
+
+
+def _close_client(client):
     client.get("/mxcube/api/v0.1/login/signout/")
 
     try:
@@ -97,6 +151,67 @@ def client():
         pass
 
 
+@pytest.fixture
+def client():
+    client = _build_client()
+    yield client
+    _close_client(client)
+
+
+@pytest.fixture
+def lazy_client(monkeypatch):
+    """Fixture for a server started with lazy_adapters, the adapters of the
+    previous tests are dropped so that they are registered lazily
+    """
+    monkeypatch.setattr(mxcubeweb, "Config", LazyAdaptersConfig)
+    MXCUBECore.adapter_dict.clear()
+
+    client = _build_client()
+    yield client
+    _close_client(client)
+
+    MXCUBECore.adapter_dict.clear()
+
+
+@pytest.fixture
+def frontend(monkeypatch):
+    """Fixture for a control server and a front-end server (--frontend)
+    connected through an in-process message queue. Yields the test client of
+    the control server, a test client of the front-end server with the same
+    session, and the emitter and event log of the control server. The
+    front-end server is left as the current server.
+    """
+    pytest.importorskip("kombu")
+    monkeypatch.setattr(mxcubeweb, "Config", MessageQueueConfig)
+    _restore_server(monkeypatch)
+
+    client = _build_client()
+    emitter, event_log = Server.emitter, Server.event_log
+    frontend_client = _build_frontend_client(client, ["--frontend"])
+
+    yield client, frontend_client, emitter, event_log
+    _close_client(client)
+
+
+@pytest.fixture
+def mirror(monkeypatch):
+    """Fixture for a control server publishing its state and a mirror
+    server (--mirror) serving it. Yields the test client of the control
+    server and a test client of the mirror server with the same session, the
+    state is published before the mirror server is built.
+    """
+    monkeypatch.setattr(mxcubeweb, "Config", MirrorConfig)
+    _restore_server(monkeypatch)
+
+    client = _build_client()
+    Server.state_publisher.state_changed()
+    Server.state_publisher.publish()
+    mirror_client = _build_frontend_client(client, ["--mirror"])
+
+    yield client, mirror_client
+    _close_client(client)
+
+
 @pytest.fixture
 def add_sample(client):
     """Fixture to add a sample to the queue, since it is required for alot of test cases.
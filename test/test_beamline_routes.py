@@ -1,4 +1,7 @@
+import gevent
 import json
+import pydantic
+import time
 
 # Python 2 and 3 compatibility
 try:
@@ -6,7 +9,11 @@ try:
 except:
     unicode = str
 
-from fixture import client
+from fixture import client, lazy_client
+from mxcubecore.BaseHardwareObjects import HardwareObjectState
+from mxcubeweb.app import MXCUBEApplication, MXCUBECore
+from mxcubeweb.core.adapter.adapter_base import AdapterBase, _models_from_typehints
+from mxcubeweb.server import Server
 
 
 def test_beamline_get_all_attribute(client):
@@ -60,6 +67,97 @@ def test_beamline_get_all_attribute(client):
     assert len(actual) == len(expected)
 
 
+def test_beamline_get_all_attribute_refresh(client):
+    """
+    Checks that reading all hardware objects again returns the same
+    representation as the cached one
+    """
+    resp = client.get("/mxcube/api/v0.1/beamline/")
+    cached = json.loads(resp.data)["hardwareObjects"]
+
+    resp = client.get("/mxcube/api/v0.1/beamline/?refresh=true")
+    refreshed = json.loads(resp.data)["hardwareObjects"]
+
+    assert resp.status_code == 200
+    assert cached.keys() == refreshed.keys()
+
+    for name in ("resolution", "transmission", "safety_shutter"):
+        assert cached[name]["value"] == refreshed[name]["value"]
+        assert cached[name]["state"] == refreshed[name]["state"]
+
+
+def test_beamline_get_all_attribute_models_reused(client, monkeypatch):
+    """
+    Checks that the pydantic models of the adapter attributes are created
+    once per class, and not again each time the hardware objects are read
+    """
+    client.get("/mxcube/api/v0.1/beamline/?refresh=true")
+
+    created = []
+    create_model = pydantic.create_model
+
+    def counting_create_model(*args, **kwargs):
+        created.append(args[0])
+        return create_model(*args, **kwargs)
+
+    monkeypatch.setattr(pydantic, "create_model", counting_create_model)
+
+    resp = client.get("/mxcube/api/v0.1/beamline/?refresh=true")
+
+    assert resp.status_code == 200
+    assert created == []
+
+
+def test_adapter_models_benchmark(client):
+    """
+    Time taken to get the models of the attributes and methods of an adapter
+    when they are created on each call, as before the per class registry, and
+    from the registry, and time taken by emit_ho_changed which reads them,
+    run with -s to see the results
+    """
+    adapter = MXCUBECore.get_adapter("resolution")
+    names = [
+        name
+        for name in adapter.ATTRIBUTES + adapter.METHODS
+        if callable(getattr(adapter, name, None))
+    ]
+    repeat = 100
+
+    t0 = time.perf_counter()
+
+    for _ in range(repeat):
+        for name in names:
+            models = _models_from_typehints.__wrapped__(getattr(type(adapter), name))
+
+            if name in adapter.METHODS:
+                models["args"].schema_json()
+
+    created_time = (time.perf_counter() - t0) / repeat
+    t0 = time.perf_counter()
+
+    for _ in range(repeat):
+        for name in names:
+            adapter._model(name)
+
+        adapter.commands()
+
+    registry_time = (time.perf_counter() - t0) / repeat
+    t0 = time.perf_counter()
+
+    for _ in range(repeat):
+        adapter.emit_ho_changed(HardwareObjectState.READY)
+
+    emit_time = (time.perf_counter() - t0) / repeat
+
+    print(
+        "%d models: created %.3f ms, registry %.3f ms, emit_ho_changed %.3f ms"
+        % (len(names), created_time * 1000, registry_time * 1000, emit_time * 1000)
+    )
+
+    assert names
+    assert registry_time < created_time
+
+
 def test_beamline_get_attribute(client):
     """
     Tests retrieval of all the beamline attributes (one by one), checks that
@@ -129,6 +227,143 @@ def test_beamline_set_attribute(client):
         assert value == new_value
 
 
+def test_lazy_beamline_set_attribute(lazy_client):
+    """
+    Tests set on a writable attribute when the adapters are created on first
+    use (lazy_adapters), the adapter is given by the name in the data like
+    for the routes registered at startup
+    """
+    resp = lazy_client.post("/mxcube/api/v0.1/beamline/motor/resolution/data")
+    assert resp.status_code == 200
+
+    new_value = json.loads(resp.data)["return"]["value"]
+
+    resp = lazy_client.put(
+        "/mxcube/api/v0.1/beamline/motor/value/resolution",
+        data=json.dumps({"name": "resolution", "value": new_value}),
+        content_type="application/json",
+    )
+    assert resp.status_code == 200
+
+    resp = lazy_client.post("/mxcube/api/v0.1/beamline/motor/resolution/data")
+    assert json.loads(resp.data)["return"]["value"] == new_value
+
+    # Not an adapter of the type of the route
+    resp = lazy_client.put(
+        "/mxcube/api/v0.1/beamline/motor/value/resolution",
+        data=json.dumps({"name": "safety_shutter", "value": new_value}),
+        content_type="application/json",
+    )
+    assert resp.status_code == 404
+
+    resp = lazy_client.get("/mxcube/api/v0.1/beamline/")
+    data = json.loads(resp.data)
+
+    assert resp.status_code == 200
+    assert all(item["adapter"] is not None for item in MXCUBECore.adapter_dict.values())
+    assert "resolution" in data["hardwareObjects"]
+
+
+def _value_changed_names(sio, names):
+    """
+    :returns: Names of the adapters in <names> of the value changes received
+              by the Socket.IO test client <sio>
+    """
+    return [
+        event["args"][0]["name"]
+        for event in sio.get_received("/hwr")
+        if event["name"] == "hardware_object_value_changed"
+        and event["args"][0]["name"] in names
+    ]
+
+
+def test_adapter_init_failure(client, monkeypatch):
+    """
+    Checks that an adapter whose constructor does not complete within
+    adapter_init_timeout, or raises, is replaced by an unavailable adapter
+    and that the signal handlers it connected are disconnected
+    """
+    adapter = MXCUBECore.get_adapter("resolution")
+    ho = adapter._ho
+    disconnected = []
+    ho_disconnect = ho.disconnect
+
+    def disconnect(signal, handler):
+        disconnected.append(handler.__self__)
+        ho_disconnect(signal, handler)
+
+    class SlowAdapter(type(adapter)):
+        def __init__(self, *args):
+            super().__init__(*args)
+            gevent.sleep(1)
+
+    class FailingAdapter(type(adapter)):
+        def __init__(self, *args):
+            super().__init__(*args)
+            raise RuntimeError("Device not found")
+
+    monkeypatch.setattr(ho, "disconnect", disconnect)
+    monkeypatch.setattr(MXCUBEApplication.CONFIG.app, "adapter_init_timeout", 0.1)
+
+    for adapter_cls in (SlowAdapter, FailingAdapter):
+        disconnected.clear()
+        created_cls, instance, init_time = MXCUBECore._adapt_hardware_object(
+            MXCUBEApplication, "resolution", ho, adapter_cls
+        )
+
+        assert created_cls is AdapterBase
+        assert type(instance) is AdapterBase
+        assert init_time < 1
+        assert disconnected
+        assert all(isinstance(item, adapter_cls) for item in disconnected)
+
+    # The adapter that timed out is not available
+    _, instance, _ = MXCUBECore._adapt_hardware_object(
+        MXCUBEApplication, "resolution", ho, SlowAdapter
+    )
+    assert not instance.available()
+
+
+def test_adapter_subscriptions(client):
+    """
+    Checks that a client subscribed to specific adapters only receives the
+    events of those adapters, and that unknown adapter ids are ignored
+    """
+    sio = Server.flask_socketio.test_client(
+        Server.flask, namespace="/hwr", flask_test_client=client
+    )
+    assert sio.is_connected("/hwr")
+
+    ack = sio.emit("unsubscribe", "*", namespace="/hwr", callback=True)
+    assert ack == ["*"]
+
+    ack = sio.emit(
+        "subscribe", ["resolution", "unknown"], namespace="/hwr", callback=True
+    )
+    assert ack == ["resolution"]
+
+    sio.get_received("/hwr")
+
+    for name in ("resolution", "transmission"):
+        MXCUBECore.get_adapter(name).emit_ho_value_changed(1)
+
+    names = _value_changed_names(sio, ("resolution", "transmission"))
+    assert names == ["resolution"]
+
+    ack = sio.emit("unsubscribe", ["resolution"], namespace="/hwr", callback=True)
+    assert ack == ["resolution"]
+
+    ack = sio.emit("subscribe", "*", namespace="/hwr", callback=True)
+    assert ack == ["*"]
+
+    MXCUBECore.get_adapter("transmission").emit_ho_value_changed(1)
+
+    names = _value_changed_names(sio, ("resolution", "transmission"))
+    assert names == ["transmission"]
+
+    sio.disconnect(namespace="/hwr")
+
+
 def test_get_beam_info(client):
     """
     Tests retrieval of information regarding the beam, and that the data is
@@ -154,3 +389,40 @@ def test_get_data_path(client):
     data = json.loads(resp.data)
     assert isinstance(data["path"], unicode)
     assert len(data) > 0
+
+
+def test_get_event_counters(client):
+    """
+    Checks that the delivered and coalesced value change events are counted
+    for the throttled adapters (motors)
+    """
+    resp = client.get("/mxcube/api/v0.1/beamline/event_counters")
+    data = json.loads(resp.data)
+
+    assert resp.status_code == 200
+    assert set(data["diffractometer.phi"]["valueChanged"].keys()) == {
+        "delivered",
+        "coalesced",
+    }
+
+
+def test_get_poll_stats(client):
+    """
+    Checks that the adapters configured with poll_intervals (flux, machine
+    info) are polled, and only those, and that their polls are counted
+    """
+    resp = client.get("/mxcube/api/v0.1/beamline/poll_stats")
+    data = json.loads(resp.data)
+
+    assert resp.status_code == 200
+    assert "flux" in data
+    assert "machine_info" in data
+    assert "resolution" not in data
+    assert set(data["flux"].keys()) == {
+        "interval",
+        "polls",
+        "errors",
+        "changes",
+        "meanTime",
+        "maxTime",
+    }
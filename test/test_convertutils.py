@@ -0,0 +1,142 @@
+import array
+import json
+import math
+import sys
+import time
+
+from mxcubeweb.core.util.convertutils import pack_arrays
+
+# Type name used by the clients -> array type code
+TYPECODES = {"int32": "i", "float64": "d"}
+
+
+def _unpack_arrays(data):
+    """Same as unpackArrays in ui/src/serverIO.js"""
+    if isinstance(data, dict):
+        if "__array__" in data:
+            values = array.array(TYPECODES[data["__array__"]])
+            values.frombytes(data["data"])
+
+            if sys.byteorder == "big":
+                values.byteswap()
+
+            return values.tolist()
+
+        return {k: _unpack_arrays(v) for k, v in data.items()}
+    elif isinstance(data, (list, tuple)):
+        return [_unpack_arrays(v) for v in data]
+
+    return data
+
+
+def _wire_size(data):
+    """
+    :returns: Number of bytes sent for <data>, binary buffers are sent as
+              attachments after the JSON text with placeholders
+    """
+    buffers = []
+
+    def placeholder(value):
+        buffers.append(value)
+        return {"_placeholder": True, "num": len(buffers) - 1}
+
+    text = json.dumps(data, default=placeholder)
+
+    return len(text.encode()) + sum(len(buffer) for buffer in buffers)
+
+
+def test_pack_arrays_round_trip():
+    """
+    Numeric arrays are packed as int32 or float64 buffers and unpacked to the
+    same values, other values are left as they are
+    """
+    data = {
+        "ints": list(range(-5, 5)),
+        "floats": [0.5 * i for i in range(10)],
+        "mixed": [1, 2.5] * 5,
+        "large": [2**40] * 10,
+        "nested": {"points": [(i, i + 0.5) for i in range(10)]},
+        "flags": [True, False] * 5,
+        "names": ["a"] * 10,
+        "short": [1, 2],
+        "value": 1,
+    }
+
+    packed = pack_arrays(data, 10)
+
+    assert packed["ints"]["__array__"] == "int32"
+    assert packed["floats"]["__array__"] == "float64"
+    assert packed["mixed"]["__array__"] == "float64"
+    assert packed["large"]["__array__"] == "float64"
+    assert packed["flags"] is data["flags"]
+    assert packed["names"] is data["names"]
+    assert packed["short"] is data["short"]
+
+    unpacked = _unpack_arrays(packed)
+
+    assert unpacked["nested"]["points"] == [[i, i + 0.5] for i in range(10)]
+    del unpacked["nested"], data["nested"]
+    assert unpacked == data
+
+
+def test_pack_arrays_unchanged():
+    """
+    Data without arrays to pack is returned as it is, so that it is not
+    copied for every event
+    """
+    data = {"name": "phi", "value": 1.5, "limits": [0, 360]}
+
+    assert pack_arrays(data, 10) is data
+    assert pack_arrays("text", 10) == "text"
+
+
+def test_pack_arrays_benchmark():
+    """
+    Encoding time and bytes sent for representative payloads as JSON and with
+    the numeric arrays as binary buffers, run with -s to see the results. Small
+    integers and short decimals can take less space as JSON text.
+    """
+    payloads = {
+        "hardware_object_changed": {
+            "name": "diffractometer.phi",
+            "state": "READY",
+            "value": 10.5,
+            "limits": [-360, 360],
+            "msg": "",
+        },
+        "update_shapes (grid result)": {
+            "shapes": {"G1": {"id": "G1", "result": [i * 0.37 for i in range(4000)]}}
+        },
+        "plot_data": {
+            "id": "plot",
+            "x": list(range(5000)),
+            "y": [math.sin(i / 100) for i in range(5000)],
+        },
+        "current_data": {"values": [[i, i * 1.5] for i in range(2000)]},
+    }
+    repeat = 20
+
+    for name, payload in payloads.items():
+        t0 = time.perf_counter()
+
+        for _ in range(repeat):
+            text = json.dumps(payload)
+
+        json_time = (time.perf_counter() - t0) / repeat
+
+        t0 = time.perf_counter()
+
+        for _ in range(repeat):
+            packed = pack_arrays(payload, 16)
+            json.dumps(packed, default=lambda value: None)
+
+        binary_time = (time.perf_counter() - t0) / repeat
+        json_size = len(text.encode())
+        binary_size = _wire_size(packed)
+
+        print(
+            "%-28s json %8d bytes %7.3f ms, binary %8d bytes %7.3f ms"
+            % (name, json_size, json_time * 1000, binary_size, binary_time * 1000)
+        )
+
+        assert _unpack_arrays(packed) == json.loads(text)
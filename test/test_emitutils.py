@@ -0,0 +1,230 @@
+from gevent import monkey
+
+monkey.patch_all(thread=False)
+
+import gevent
+
+from gevent.queue import JoinableQueue
+
+from mxcubeweb.core.util.emitutils import BackpressureEmitter, EmitBatcher, EventLog
+
+
+class Socket:
+    """engine.io socket of a client, with the packets waiting to be written"""
+
+    def __init__(self):
+        self.queue = JoinableQueue()
+
+
+class Manager:
+    def __init__(self, clients):
+        # sid -> eio sid, all clients are in namespace /hwr
+        self.clients = clients
+
+    def get_namespaces(self):
+        return ["/hwr"]
+
+    def get_participants(self, namespace, room):
+        return list(self.clients.items())
+
+    def sid_from_eio_sid(self, eio_sid, namespace):
+        for sid, _eio_sid in self.clients.items():
+            if _eio_sid == eio_sid:
+                return sid
+
+
+class EngineIO:
+    def __init__(self, sockets):
+        self.sockets = sockets
+
+
+class SocketIOServer:
+    def __init__(self, clients):
+        self.manager = Manager(clients)
+        self.eio = EngineIO({eio_sid: Socket() for eio_sid in clients.values()})
+        self.disconnected = []
+
+    def disconnect(self, sid, namespace=None):
+        self.disconnected.append(sid)
+
+
+class SocketIO:
+    """Records the emitted events as (event, args, kwargs)"""
+
+    def __init__(self, clients=None):
+        self.server = SocketIOServer(clients or {})
+        self.emitted = []
+
+    def emit(self, event, *args, **kwargs):
+        self.emitted.append((event, args, kwargs))
+
+
+def test_batcher_flushes_on_size():
+    """
+    The events of a namespace and room are sent as one batch as soon as the
+    maximum number of events is collected
+    """
+    socketio = SocketIO()
+    batcher = EmitBatcher(socketio, 10, max_events=3)
+
+    for i in range(2):
+        batcher.emit("log_record", {"message": i}, namespace="/logging")
+
+    assert socketio.emitted == []
+
+    batcher.emit("log_record", {"message": 2}, namespace="/logging")
+
+    assert socketio.emitted == [
+        (
+            "batch",
+            ([["log_record", {"message": i}] for i in range(3)],),
+            {"namespace": "/logging"},
+        )
+    ]
+
+
+def test_batcher_flushes_on_interval():
+    """
+    The events collected are sent when the interval has passed, superseded
+    value changes are collapsed to the latest one
+    """
+    socketio = SocketIO()
+    batcher = EmitBatcher(socketio, 0.01)
+
+    batcher.emit("motor_position", {"name": "phi", "value": 1}, namespace="/hwr")
+    batcher.emit("motor_position", {"name": "kappa", "value": 1}, namespace="/hwr")
+    batcher.emit("motor_position", {"name": "phi", "value": 2}, namespace="/hwr")
+
+    assert socketio.emitted == []
+
+    gevent.sleep(0.05)
+
+    assert socketio.emitted == [
+        (
+            "batch",
+            (
+                [
+                    ["motor_position", {"name": "kappa", "value": 1}],
+                    ["motor_position", {"name": "phi", "value": 2}],
+                ],
+            ),
+            {"namespace": "/hwr"},
+        )
+    ]
+
+
+def test_batcher_keeps_order_per_room():
+    """
+    Events keep their order within a room, a bypassed event is sent after
+    the events collected for its room without sending those of other rooms
+    """
+    socketio = SocketIO()
+    batcher = EmitBatcher(socketio, 10, bypass=["forceSignout"])
+
+    batcher.emit("task", {"queueID": 1}, namespace="/hwr", to="a")
+    batcher.emit("task", {"queueID": 2}, namespace="/hwr", to="b")
+    batcher.emit("task", {"queueID": 3}, namespace="/hwr", to="a")
+    batcher.emit("forceSignout", namespace="/hwr", to="a")
+
+    assert socketio.emitted == [
+        (
+            "batch",
+            ([["task", {"queueID": 1}], ["task", {"queueID": 3}]],),
+            {"namespace": "/hwr", "to": "a"},
+        ),
+        ("forceSignout", (), {"namespace": "/hwr", "to": "a"}),
+    ]
+
+    batcher.flush()
+
+    assert socketio.emitted[-1] == (
+        "task",
+        ({"queueID": 2},),
+        {"namespace": "/hwr", "to": "b"},
+    )
+
+
+def test_event_log_replays_missed_events():
+    """
+    A client that reconnects with the stamp of the last event it received
+    gets the events emitted since to its namespace and rooms
+    """
+    log = EventLog(10)
+    stamp = log.append("task", {"queueID": 1}, namespace="/hwr")
+    log.append("task", {"queueID": 2}, namespace="/hwr")
+    log.append("log_record", {"message": "x"}, namespace="/logging")
+    log.append("task", {"queueID": 3}, namespace="/hwr", to="other")
+    log.append("task", {"queueID": 4}, namespace="/hwr", to=["sid", "other"])
+
+    assert stamp == {"log": log.id, "seq": 1}
+    assert log.since(log.id, 1, "/hwr", ["sid"]) == [
+        ["task", {"queueID": 2}],
+        ["task", {"queueID": 4}],
+    ]
+    assert log.since(log.id, 5, "/hwr", ["sid"]) == []
+
+
+def test_event_log_resets_out_of_range():
+    """
+    A client has to reload its state when the events it missed are no longer
+    kept, when its sequence number is ahead of the log or when the server
+    was restarted (other log)
+    """
+    log = EventLog(2)
+
+    for i in range(4):
+        log.append("task", {"queueID": i}, namespace="/hwr")
+
+    assert log.since(log.id, 1, "/hwr", []) is None
+    assert log.since(log.id, 2, "/hwr", []) == [
+        ["task", {"queueID": 2}],
+        ["task", {"queueID": 3}],
+    ]
+    assert log.since(log.id, 5, "/hwr", []) is None
+    assert log.since("restarted", 2, "/hwr", []) is None
+
+
+def _fill(socketio, eio_sid, packets):
+    for i in range(packets):
+        socketio.server.eio.sockets[eio_sid].queue.put(i)
+
+
+def test_backpressure_holds_events_for_slow_client():
+    """
+    State events for a client over the soft limit are held back, the other
+    clients receive them directly
+    """
+    socketio = SocketIO({"fast": "eio-fast", "slow": "eio-slow"})
+    emitter = BackpressureEmitter(socketio, socketio, 10, 100)
+    _fill(socketio, "eio-slow", 10)
+
+    emitter.emit(
+        "hardware_object_value_changed",
+        {"name": "phi", "value": 1},
+        namespace="/hwr",
+    )
+
+    assert socketio.emitted[0][2]["skip_sid"] == ["slow"]
+    assert emitter.get_clients("/hwr")[1]["held"] == 1
+
+
+def test_backpressure_resets_client_over_hard_limit():
+    """
+    A client over the hard limit has its packets dropped, is sent 'resync'
+    and is disconnected
+    """
+    socketio = SocketIO({"fast": "eio-fast", "slow": "eio-slow"})
+    emitter = BackpressureEmitter(socketio, socketio, 10, 100)
+    _fill(socketio, "eio-slow", 100)
+
+    emitter.emit(
+        "hardware_object_value_changed",
+        {"name": "phi", "value": 1},
+        namespace="/hwr",
+    )
+
+    assert ("resync", (), {"namespace": "/hwr", "to": "slow"}) in socketio.emitted
+    assert socketio.server.disconnected == ["slow"]
+    assert socketio.server.eio.sockets["eio-slow"].queue.empty()
+    assert emitter.resets == 1
+    assert socketio.emitted[-1][2]["skip_sid"] == ["slow"]
@@ -0,0 +1,129 @@
+import gevent
+import json
+
+from fixture import client, frontend
+
+from mxcubeweb.server import Server
+from mxcubeweb.core.util.emitutils import send_events
+from mxcubeweb.core.util import metricsutils
+from mxcubeweb.core.util.metricsutils import Metrics
+
+
+def test_metrics_disabled(client):
+    """
+    Checks that the metrics are not served when not enabled
+    """
+    resp = client.get("/mxcube/api/v0.1/metrics")
+
+    assert resp.status_code == 404
+
+
+def test_metrics_request_duration(client, monkeypatch):
+    """
+    Checks that the handled requests are counted, by endpoint, method and
+    status, once metrics are enabled
+    """
+    monkeypatch.setattr(Server, "metrics", Metrics())
+
+    resp = client.get("/mxcube/api/v0.1/queue/")
+    assert resp.status_code == 200
+
+    resp = client.get("/mxcube/api/v0.1/metrics")
+    text = resp.data.decode()
+
+    assert resp.status_code == 200
+    assert "# TYPE mxcubeweb_request_duration_seconds histogram" in text
+    assert any(
+        line.startswith("mxcubeweb_request_duration_seconds_count{")
+        and 'method="GET"' in line
+        and 'status="200"' in line
+        and line.endswith(" 1")
+        for line in text.splitlines()
+    )
+
+
+def test_metrics_emit_sampling(monkeypatch):
+    """
+    Checks that the data of one emit in EMIT_SAMPLE_INTERVAL is serialised,
+    and that the size of the others is counted
+    """
+    calls = []
+    dumps = json.dumps
+
+    def counting_dumps(*args, **kwargs):
+        calls.append(args)
+        return dumps(*args, **kwargs)
+
+    monkeypatch.setattr(metricsutils.json, "dumps", counting_dumps)
+    metrics = Metrics()
+    data = ({"name": "resolution", "value": 1},)
+    count = 2 * metricsutils.EMIT_SAMPLE_INTERVAL + 1
+
+    for _ in range(count):
+        metrics.emitted("hardware_object_value_changed", data, "/hwr")
+
+    monkeypatch.undo()
+    lines = metrics.render().splitlines()
+    labels = '{event="hardware_object_value_changed",namespace="/hwr"}'
+
+    assert len(calls) == 3
+    assert "mxcubeweb_emit_total%s %s" % (labels, count) in lines
+    assert (
+        "mxcubeweb_emit_bytes_total%s %s" % (labels, count * len(json.dumps(data)))
+        in lines
+    )
+
+
+def test_frontend_receives_events(frontend):
+    """
+    Checks that the events emitted by the control server reach the clients
+    of a front-end process through the message queue
+    """
+    _, frontend_client, emitter, _ = frontend
+    sio = Server.flask_socketio.test_client(
+        Server.flask, namespace="/hwr", flask_test_client=frontend_client
+    )
+    assert sio.is_connected("/hwr")
+
+    sio.get_received("/hwr")
+    send_events(
+        emitter,
+        [["hardware_object_value_changed", {"name": "resolution", "value": 1}]],
+        namespace="/hwr",
+    )
+
+    # Delivered by the greenlet listening to the message queue
+    received = []
+
+    for _ in range(50):
+        received += sio.get_received("/hwr")
+
+        if received:
+            break
+
+        gevent.sleep(0.1)
+
+    assert [event["name"] for event in received] == ["hardware_object_value_changed"]
+    assert received[0]["args"][0] == {"name": "resolution", "value": 1}
+
+    sio.disconnect(namespace="/hwr")
+
+
+def test_frontend_replay(frontend):
+    """
+    Checks that a client reconnecting to a front-end process is answered with
+    a reset, the events are numbered by the control server
+    """
+    _, frontend_client, _, event_log = frontend
+    sio = Server.flask_socketio.test_client(
+        Server.flask, namespace="/hwr", flask_test_client=frontend_client
+    )
+    assert sio.is_connected("/hwr")
+
+    stamp = {"log": event_log.id, "seq": event_log.seq}
+    ack = sio.emit("replay", stamp, namespace="/hwr", callback=True)
+
+    assert ack["reset"]
+    assert ack["log"] != event_log.id
+
+    sio.disconnect(namespace="/hwr")
@@ -0,0 +1,62 @@
+import json
+
+from fixture import mirror
+
+from mxcubeweb.server import Server
+
+
+def test_mirror_serves_state(mirror):
+    """
+    Checks that the mirror process serves the state published by the
+    control process
+    """
+    client, mirror_client = mirror
+
+    resp = client.get("/mxcube/api/v0.1/queue/queue_state")
+    expected = json.loads(resp.data)
+
+    resp = mirror_client.get("/mxcube/api/v0.1/queue/queue_state")
+
+    assert resp.status_code == 200
+    assert json.loads(resp.data) == expected
+
+    resp = mirror_client.get("/mxcube/api/v0.1/beamline/")
+
+    assert resp.status_code == 200
+    assert "hardwareObjects" in json.loads(resp.data)
+
+
+def test_mirror_rejects_writes(mirror):
+    """
+    Checks that the mirror process only serves the read-only routes, to
+    logged in users
+    """
+    _, mirror_client = mirror
+
+    # Mirrored route, only GET
+    resp = mirror_client.put(
+        "/mxcube/api/v0.1/queue/queue_state",
+        data=json.dumps({}),
+        content_type="application/json",
+    )
+    assert resp.status_code == 405
+
+    # Routes of the control process that are not mirrored
+    resp = mirror_client.post(
+        "/mxcube/api/v0.1/queue/",
+        data=json.dumps([]),
+        content_type="application/json",
+    )
+    assert resp.status_code == 404
+
+    resp = mirror_client.put(
+        "/mxcube/api/v0.1/beamline/motor/value/resolution",
+        data=json.dumps({"name": "resolution", "value": 1}),
+        content_type="application/json",
+    )
+    assert resp.status_code == 404
+
+    resp = Server.flask.test_client().get(
+        "/mxcube/api/v0.1/queue/queue_state", headers={"Accept": "application/json"}
+    )
+    assert resp.status_code == 401
@@ -2,6 +2,10 @@ import time
 import json
 import copy
 
+from unittest.mock import Mock
+
+from mxcubecore.model import queue_model_objects as qmo
+
 from input_parameters import (
     test_sample_5,
     test_sample_6,
@@ -15,6 +19,18 @@ from input_parameters import (
 
 
 from fixture import client
+from mxcubeweb.server import Server
+from mxcubeweb.routes import signals
+from mxcubeweb.app import MXCUBEApplication
+from mxcubeweb.core.components.queue_changes import QueueChangeLog
+from mxcubeweb.core.components.queue_execution import ExecutionContext
+from mxcubeweb.core.components.queue_state import (
+    QueueStateTable,
+    COLLECTED,
+    FAILED,
+    RUNNING,
+)
+from mxcubeweb.core.components.run_number_allocator import RunNumberAllocator
 
 
 def test_queue_get(client):
@@ -168,6 +184,160 @@ def test_queue_get_state(client):
     assert resp.status_code == 200
 
 
+def test_queue_get_changes(client):
+    """Test if we can get the changes made to the queue since a given version."""
+    resp = client.get("/mxcube/api/v0.1/queue/queue_state")
+    version = json.loads(resp.data)["queueVersion"]
+
+    resp = client.post(
+        "/mxcube/api/v0.1/queue/delete",
+        data=json.dumps([["1:05", 0]]),
+        content_type="application/json",
+    )
+    assert resp.status_code == 200
+
+    resp = client.get("/mxcube/api/v0.1/queue/changes?since=%s" % version)
+    data = json.loads(resp.data)
+    ops = [op for change in data["changes"] for op in change["ops"]]
+
+    assert resp.status_code == 200 and data["version"] > version
+    assert {"op": "remove", "path": "/1:05/tasks/0"} in ops
+
+    resp = client.get("/mxcube/api/v0.1/queue/changes?since=%s" % (version + 1000))
+    assert json.loads(resp.data)["reset"]
+
+
+def test_queue_changes_skip_unchanged_samples():
+    """
+    Checks that only the samples that were replaced are compared when the
+    queue changes are determined
+    """
+
+    class Uncomparable(dict):
+        def __eq__(self, other):
+            raise AssertionError("Unchanged sample compared")
+
+        __ne__ = __eq__
+
+    unchanged = Uncomparable(sampleID="1:01", queueID=1, tasks=[])
+    changed = {"sampleID": "1:02", "queueID": 2, "tasks": []}
+
+    changes = QueueChangeLog()
+    changes.update(
+        {"sample_order": ["1:01", "1:02"], "1:01": unchanged, "1:02": changed}
+    )
+    change = changes.update(
+        {
+            "sample_order": ["1:01", "1:02"],
+            "1:01": unchanged,
+            "1:02": dict(changed, checked=False),
+        }
+    )
+
+    assert change["ops"] == [{"op": "add", "path": "/1:02/checked", "value": False}]
+
+
+def test_queue_state_sample_list_sync(client):
+    """
+    Test that the sample list is only synchronized with the queue when
+    something changed.
+    """
+    resp = client.get("/mxcube/api/v0.1/queue/queue_state")
+    generation = json.loads(resp.data)["sampleListGeneration"]
+
+    resp = client.get("/mxcube/api/v0.1/queue/queue_state")
+    data = json.loads(resp.data)
+    assert resp.status_code == 200 and data["sampleListGeneration"] == generation
+
+    resp = client.post(
+        "/mxcube/api/v0.1/queue/delete",
+        data=json.dumps([["1:05", 0]]),
+        content_type="application/json",
+    )
+    assert resp.status_code == 200
+
+    resp = client.get("/mxcube/api/v0.1/queue/queue_state")
+    data = json.loads(resp.data)
+    assert data["sampleListGeneration"] > generation
+    assert len(data["sampleList"]["sampleList"]["1:05"]["tasks"]) == 0
+
+
+def test_queue_state_table_current_node(client):
+    """
+    Checks that the parent of a task is the node being executed again once
+    the task is finished, and that the states of finished nodes are kept
+    """
+    sample = MXCUBEApplication.queue.index.get_sample_node("1:05")
+    task = MXCUBEApplication.queue.index.get_task_nodes("1:05")[0]
+    group = task.get_parent()
+    states = QueueStateTable()
+
+    def entry(node):
+        return Mock(**{"get_data_model.return_value": node})
+
+    for node in (sample, group, task):
+        states.entry_started(entry(node))
+
+    states.entry_finished(entry(task), "Failed")
+    assert states.set_current_state(FAILED) is group
+    assert states.get_state(task) == FAILED
+
+    states.entry_finished(entry(group), "Aborted")
+    assert states.set_current_state(RUNNING) is sample
+
+    states.entry_finished(entry(sample), "Successful")
+    assert states.set_current_state(RUNNING) is None
+    assert states.get_state(sample) == COLLECTED
+    assert states.get_state(group) == FAILED
+
+
+def test_queue_execution_context(client, monkeypatch):
+    """
+    Checks that the execution context of a task holds its position in the
+    queue and computes its progress, and that the collection signals are
+    ignored when no task is executed
+    """
+    task = MXCUBEApplication.queue.index.get_task_nodes("1:05")[0]
+    entry = Mock(**{"get_data_model.return_value": task})
+    context = ExecutionContext(MXCUBEApplication.queue, entry)
+
+    assert context.node is task and context.queue_id == task._node_id
+    assert context.sample == "1:05" and context.idx == 0
+    assert not context.interleaved
+    assert context.total_images == 1
+    assert context.progress(0) == 0 and context.progress(1) == 1
+
+    execution = MXCUBEApplication.queue.execution
+    execution.clear()
+    assert execution.current is None
+
+    emitted = []
+    monkeypatch.setattr(Server, "emit", lambda *args, **kwargs: emitted.append(args))
+
+    signals.collect_oscillation_started()
+    signals.collect_image_taken(1)
+    signals.collect_oscillation_finished(None, None, None, "", None, None)
+    assert emitted == []
+
+    execution.entry_started(entry)
+    assert execution.current.entry is entry
+
+    signals.collect_oscillation_started()
+    assert emitted[-1][1]["queueID"] == task._node_id
+
+    execution.entry_finished(entry, "Successful")
+    assert execution.current is None
+
+
+def test_queue_progress_metrics(client):
+    """Test if we can get the frame progress metrics."""
+    resp = client.get("/mxcube/api/v0.1/queue/progress_metrics")
+    data = json.loads(resp.data)
+
+    assert resp.status_code == 200
+    assert set(data) == {"frames", "frameRate", "coalesced", "published", "pending"}
+
+
 def test_queue_delete_item(client):
     """Test if we can delete a task from sample in the queue."""
     resp = client.get("/mxcube/api/v0.1/queue/")
@@ -189,6 +359,162 @@ def test_queue_delete_item(client):
     )
 
 
+def test_queue_delete_multiple_items(client):
+    """
+    Test if we can delete several tasks from a sample in the queue at once,
+    positions refer to the queue before the deletion.
+    """
+    resp = client.get("/mxcube/api/v0.1/queue/")
+    queue_id = json.loads(resp.data).get("1:05")["queueID"]
+
+    for kappa in [90, 180]:
+        task_to_add = copy.deepcopy(test_task)
+        task_to_add["queueID"] = queue_id
+        task_to_add["tasks"][0]["sampleQueueID"] = queue_id
+        task_to_add["tasks"][0]["parameters"]["kappa"] = kappa
+
+        resp = client.post(
+            "/mxcube/api/v0.1/queue/",
+            data=json.dumps([task_to_add]),
+            content_type="application/json",
+        )
+        assert resp.status_code == 200
+
+    resp = client.post(
+        "/mxcube/api/v0.1/queue/delete",
+        data=json.dumps([["1:05", 0], ["1:05", 1]]),
+        content_type="application/json",
+    )
+    assert resp.status_code == 200
+
+    resp = client.get("/mxcube/api/v0.1/queue/")
+    tasks = json.loads(resp.data).get("1:05")["tasks"]
+    assert len(tasks) == 1 and tasks[0]["parameters"]["kappa"] == 180
+
+
+def test_queue_import(client):
+    """
+    Test if we can add several tasks in one batch, invalid items are
+    reported without aborting the import.
+    """
+    resp = client.get("/mxcube/api/v0.1/queue/")
+    queue_id = json.loads(resp.data).get("1:05")["queueID"]
+
+    task_to_add = copy.deepcopy(test_task)
+    task_to_add["queueID"] = queue_id
+    task_to_add["tasks"][0]["sampleQueueID"] = queue_id
+    task_to_add["tasks"].append(copy.deepcopy(task_to_add["tasks"][0]))
+
+    invalid_task = copy.deepcopy(test_task["tasks"][0])
+    invalid_task.pop("parameters")
+
+    resp = client.post(
+        "/mxcube/api/v0.1/queue/import",
+        data=json.dumps([task_to_add, invalid_task, "not an item"]),
+        content_type="application/json",
+    )
+    data = json.loads(resp.data)
+
+    assert resp.status_code == 200 and data["added"] == 1
+    assert [error["index"] for error in data["errors"]] == [1, 2]
+
+    resp = client.post(
+        "/mxcube/api/v0.1/queue/import",
+        data=json.dumps(task_to_add),
+        content_type="application/json",
+    )
+    assert resp.status_code == 400
+
+    resp = client.get("/mxcube/api/v0.1/queue/")
+    tasks = json.loads(resp.data).get("1:05")["tasks"]
+    run_numbers = [task["parameters"]["run_number"] for task in tasks]
+
+    assert len(tasks) == 3 and len(set(run_numbers)) == 3
+
+
+def test_queue_import_large(client, monkeypatch):
+    """
+    Test that a large batch of tasks (a full dewar has several hundred) is
+    imported at once, with a distinct run number for each task and the
+    changes sent to the clients in one event
+    """
+    resp = client.get("/mxcube/api/v0.1/queue/")
+    queue_id = json.loads(resp.data).get("1:05")["queueID"]
+
+    task_to_add = copy.deepcopy(test_task)
+    task_to_add["queueID"] = queue_id
+    task_to_add["tasks"][0]["sampleQueueID"] = queue_id
+    task_to_add["tasks"] = [copy.deepcopy(task_to_add["tasks"][0]) for _ in range(500)]
+
+    # Changes made so far are published when the queue state is read
+    client.get("/mxcube/api/v0.1/queue/queue_state")
+
+    emitted = []
+    emit = Server.emit
+
+    def recording_emit(*args, **kwargs):
+        emitted.append(args)
+        return emit(*args, **kwargs)
+
+    monkeypatch.setattr(Server, "emit", recording_emit)
+
+    resp = client.post(
+        "/mxcube/api/v0.1/queue/import",
+        data=json.dumps([task_to_add]),
+        content_type="application/json",
+    )
+    data = json.loads(resp.data)
+
+    assert resp.status_code == 200 and data["added"] == 1 and not data["errors"]
+
+    changes = [args[1] for args in emitted if args[0] in ("queue", "queue_change")]
+    ops = [op for op in changes[0]["ops"] if op["op"] == "add"]
+
+    assert len(changes) == 1 and len(ops) == 500
+
+    resp = client.get("/mxcube/api/v0.1/queue/")
+    tasks = json.loads(resp.data).get("1:05")["tasks"]
+    run_numbers = [task["parameters"]["run_number"] for task in tasks]
+
+    assert len(tasks) == 501 and len(set(run_numbers)) == 501
+
+
+def test_run_number_allocator(client, tmp_path):
+    """
+    Checks that run numbers already on disk, handed out or used in the queue
+    model are skipped, and that released run numbers are handed out again
+    """
+
+    def path_template():
+        pt = qmo.PathTemplate()
+        pt.directory = str(tmp_path)
+        pt.base_prefix = "test"
+        pt.start_num = 1
+        pt.num_files = 1
+
+        return pt
+
+    collected = path_template()
+    collected.run_number = 1
+
+    for fname in collected.get_first_and_last_file():
+        open(fname, "w").close()
+
+    allocator = RunNumberAllocator()
+    first = path_template()
+    second = path_template()
+
+    assert allocator.allocate(first) == 2
+    assert allocator.allocate(second) == 3
+
+    allocator.release(second)
+    assert allocator.allocate(path_template()) == 3
+
+    queue_model = Mock()
+    queue_model.get_next_run_number.return_value = 7
+    assert allocator.allocate(path_template(), queue_model) == 7
+
+
 def test_queue_enable_item(client):
     """Test if we can disable a task in the sample in queue."""
     resp = client.get("/mxcube/api/v0.1/queue/")
@@ -210,6 +536,32 @@ def test_queue_enable_item(client):
     )
 
 
+def test_queue_toggle_node(client):
+    """
+    Checks that toggling a sample toggles its tasks, and that toggling the
+    only task of a sample toggles the sample
+    """
+    resp = client.get("/mxcube/api/v0.1/queue/")
+    sample = json.loads(resp.data).get("1:05")
+
+    resp = client.put(f"/mxcube/api/v0.1/queue/{sample['queueID']}/toggle")
+    assert resp.status_code == 200
+
+    resp = client.get("/mxcube/api/v0.1/queue/")
+    sample = json.loads(resp.data).get("1:05")
+    assert not sample["checked"]
+    assert not sample["tasks"][0]["checked"]
+
+    task_id = sample["tasks"][0]["queueID"]
+    resp = client.put(f"/mxcube/api/v0.1/queue/{task_id}/toggle")
+    assert resp.status_code == 200
+
+    resp = client.get("/mxcube/api/v0.1/queue/")
+    sample = json.loads(resp.data).get("1:05")
+    assert sample["checked"]
+    assert sample["tasks"][0]["checked"]
+
+
 def test_queue_swap_task_item(client):
     """Test if we can swap tasks in a sample in queue. Two tasks are added with a different param and then swaped and tested
     """
@@ -0,0 +1,74 @@
+import gevent
+import json
+
+from gevent import monkey
+
+from fixture import client
+
+from mxcubeweb.server import Server
+from mxcubeweb.core.models.usermodels import User
+from mxcubeweb.core.util.geventutils import LoopMonitor
+
+# time.sleep is patched to gevent.sleep, blocks the hub
+_blocking_sleep = monkey.get_original("time", "sleep")
+
+
+def test_loop_stalls(client, monkeypatch):
+    """
+    Checks that the stalls of the event loop are reported, to staff only,
+    once the monitor is enabled
+    """
+    resp = client.get("/mxcube/api/v0.1/ra/loop_stalls")
+    assert resp.status_code == 404
+
+    monitor = LoopMonitor(0.05)
+    monkeypatch.setattr(Server, "loop_monitor", monitor)
+    monitor.start()
+
+    try:
+        gevent.sleep(0.1)
+        _blocking_sleep(0.3)
+        gevent.sleep(0.1)
+    finally:
+        monitor.stop()
+
+    resp = client.get("/mxcube/api/v0.1/ra/loop_stalls")
+    data = json.loads(resp.data)
+
+    assert resp.status_code == 200
+    assert data["stalls"] >= 1
+    assert data["maxTime"] > 0.2
+    assert max(o["maxTime"] for o in data["offenders"]) == data["maxTime"]
+
+    monkeypatch.setattr(User, "isstaff", False)
+
+    resp = client.get("/mxcube/api/v0.1/ra/loop_stalls")
+    assert resp.status_code == 401
+
+
+def test_profile(client, monkeypatch):
+    """
+    Checks that a profile is taken for the given duration, without tracing
+    allocations by default, and that invalid parameters are rejected
+    """
+    resp = client.get("/mxcube/api/v0.1/ra/profile?seconds=0.2")
+    data = json.loads(resp.data)
+
+    assert resp.status_code == 200
+    assert data["seconds"] == 0.2
+    assert data["samples"] > 0
+    assert data["allocations"] == []
+
+    resp = client.get("/mxcube/api/v0.1/ra/profile?seconds=0.2&format=collapsed")
+
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/plain"
+
+    for query in ("seconds=abc", "seconds=0", "seconds=nan", "allocations=-1"):
+        resp = client.get("/mxcube/api/v0.1/ra/profile?%s" % query)
+        assert resp.status_code == 400
+
+    monkeypatch.setattr(User, "isstaff", False)
+
+    resp = client.get("/mxcube/api/v0.1/ra/profile?seconds=0.2")
+    assert resp.status_code == 401
@@ -7,7 +7,9 @@ import { loadSample } from './sampleChanger'; // eslint-disable-line import/no-c
 import { sendAbortCentring, sendUpdateShapes } from './sampleview';
 import { selectSamplesAction, clearSampleGrid } from './sampleGrid'; // eslint-disable-line import/no-cycle
 import { TASK_UNCOLLECTED } from '../constants';
+import { applyPatch, parsePointer } from '../jsonPatch';
 import {
+  fetchQueueChanges,
   sendClearQueue,
   sendPauseQueue,
   sendResumeQueue,
@@ -811,3 +813,63 @@ export function fetchQueue() {
     }
   };
 }
+
+export function applyQueueChangesAction(serverQueue, version, sampleIDs) {
+  return { type: 'APPLY_QUEUE_CHANGES', serverQueue, version, sampleIDs };
+}
+
+function changedSampleIDs(ops) {
+  const sampleIDs = ops.map((op) => parsePointer(op.path)[0]);
+  return [...new Set(sampleIDs)].filter((id) => id !== 'sample_order');
+}
+
+// Applies a set of changes sent with queue_change (see QueueChangeLog) to the
+// copy of the server queue, and the changed samples to the sample list. The
+// copy is fetched when it is not loaded yet or when changes were missed
+export function applyQueueChange(change) {
+  return async (dispatch, getState) => {
+    const { serverQueue, queueVersion } = getState().queue;
+
+    if (serverQueue !== null && change.version <= queueVersion) {
+      return;
+    }
+
+    if (serverQueue !== null && change.version === queueVersion + 1) {
+      dispatch(
+        applyQueueChangesAction(
+          applyPatch(serverQueue, change.ops),
+          change.version,
+          changedSampleIDs(change.ops),
+        ),
+      );
+      return;
+    }
+
+    try {
+      const res = await fetchQueueChanges(
+        serverQueue === null ? -1 : queueVersion,
+      );
+
+      // Already updated while the changes were fetched
+      if (getState().queue.serverQueue !== serverQueue) {
+        return;
+      }
+
+      if (res.reset) {
+        const sampleIDs = Object.keys(res.queue);
+        dispatch(applyQueueChangesAction(res.queue, res.version, sampleIDs));
+      } else {
+        const ops = res.changes.flatMap((c) => c.ops);
+        dispatch(
+          applyQueueChangesAction(
+            applyPatch(serverQueue, ops),
+            res.version,
+            changedSampleIDs(ops),
+          ),
+        );
+      }
+    } catch (error) {
+      console.log(error); // eslint-disable-line no-console
+    }
+  };
+}
@@ -6,6 +6,10 @@ export function fetchQueueState() {
   return endpoint.get('/queue_state').json();
 }
 
+export function fetchQueueChanges(since) {
+  return endpoint.get(`/changes?since=${since}`).json();
+}
+
 export function fetchAvailableTasks() {
   return endpoint.get('/available_tasks').json();
 }
@@ -0,0 +1,71 @@
+// Minimal JSON patch (RFC 6902) support for the queue changes sent by the
+// server (see QueueChangeLog), the documents are not modified
+
+// Keys of a JSON pointer (RFC 6901)
+export function parsePointer(pointer) {
+  return pointer
+    .split('/')
+    .slice(1)
+    .map((key) => key.replace(/~1/g, '/').replace(/~0/g, '~'));
+}
+
+// Copy of <doc> with the value at <keys> replaced by fn(value)
+function updateIn(doc, keys, fn) {
+  if (keys.length === 0) {
+    return fn(doc);
+  }
+
+  const [key, ...rest] = keys;
+  const copy = Array.isArray(doc) ? [...doc] : { ...doc };
+  copy[key] = updateIn(doc[key], rest, fn);
+
+  return copy;
+}
+
+// Copy of <doc> with the operation <op> applied, only the add, remove,
+// replace and move operations are supported
+export function applyOperation(doc, op) {
+  const keys = parsePointer(op.path);
+  const key = keys.pop();
+  const index = Number(key);
+
+  switch (op.op) {
+    case 'add': {
+      return updateIn(doc, keys, (parent) =>
+        Array.isArray(parent)
+          ? [...parent.slice(0, index), op.value, ...parent.slice(index)]
+          : { ...parent, [key]: op.value },
+      );
+    }
+    case 'replace': {
+      return updateIn(doc, keys, (parent) =>
+        Array.isArray(parent)
+          ? parent.map((value, i) => (i === index ? op.value : value))
+          : { ...parent, [key]: op.value },
+      );
+    }
+    case 'remove': {
+      return updateIn(doc, keys, (parent) => {
+        if (Array.isArray(parent)) {
+          return parent.filter((value, i) => i !== index);
+        }
+
+        const rest = { ...parent };
+        delete rest[key];
+        return rest;
+      });
+    }
+    case 'move': {
+      const value = parsePointer(op.from).reduce((v, k) => v[k], doc);
+      const removed = applyOperation(doc, { op: 'remove', path: op.from });
+      return applyOperation(removed, { op: 'add', path: op.path, value });
+    }
+    default: {
+      return doc;
+    }
+  }
+}
+
+export function applyPatch(doc, ops) {
+  return ops.reduce(applyOperation, doc);
+}
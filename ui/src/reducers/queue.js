@@ -12,6 +12,10 @@ const INITIAL_STATE = {
   centringMethod: CLICK_CENTRING,
   numSnapshots: 4,
   groupFolder: '',
+  // Copy of the queue on the server and its version, updated with the
+  // changes sent with queue_change (see QueueChangeLog)
+  serverQueue: null,
+  queueVersion: null,
 };
 
 function queueReducer(state = INITIAL_STATE, action = {}) {
@@ -103,6 +107,14 @@ function queueReducer(state = INITIAL_STATE, action = {}) {
     case 'CLEAR_ALL': {
       return { ...state, ...INITIAL_STATE, autoMountNext: state.autoMountNext };
     }
+    case 'APPLY_QUEUE_CHANGES': {
+      return {
+        ...state,
+        queue: action.serverQueue.sample_order || [],
+        serverQueue: action.serverQueue,
+        queueVersion: action.version,
+      };
+    }
     case 'QUEUE_STATE': {
       return Object.assign({}, state, ...action.queueState);
     }
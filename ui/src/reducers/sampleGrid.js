@@ -37,6 +37,45 @@ const INITIAL_STATE = {
   },
 };
 
+// Fields of the queue sample that are not applied to a sample with LIMS or
+// sample changer data, as in Lims.synch_sample_list_with_queue
+function isLimsField(sample, field) {
+  if (['sampleName', 'proteinAcronym'].includes(field)) {
+    return Boolean(sample[field]);
+  }
+
+  if (['defaultPrefix', 'defaultSubDir'].includes(field)) {
+    return Boolean(sample.sampleName || sample.proteinAcronym);
+  }
+
+  return false;
+}
+
+// Sample list with the samples <sampleIDs> of the server queue <serverQueue>
+// applied, the samples removed from the queue stay in the list
+function applyQueueSamples(sampleList, serverQueue, sampleIDs) {
+  const result = { ...sampleList };
+
+  sampleIDs.forEach((sampleID) => {
+    const sample = result[sampleID];
+    const queueSample = serverQueue[sampleID];
+
+    if (sample === undefined || queueSample === undefined) {
+      return;
+    }
+
+    const data = Object.fromEntries(
+      Object.entries(queueSample).filter(
+        ([field]) => !isLimsField(sample, field),
+      ),
+    );
+
+    result[sampleID] = { ...sample, ...data };
+  });
+
+  return result;
+}
+
 // eslint-disable-next-line sonarjs/cognitive-complexity
 function sampleGridReducer(state = INITIAL_STATE, action = {}) {
   // eslint-disable-next-line sonarjs/max-switch-cases
@@ -47,6 +86,16 @@ function sampleGridReducer(state = INITIAL_STATE, action = {}) {
         sampleList: { ...action.sampleList },
       };
     }
+    case 'APPLY_QUEUE_CHANGES': {
+      return {
+        ...state,
+        sampleList: applyQueueSamples(
+          state.sampleList,
+          action.serverQueue,
+          action.sampleIDs,
+        ),
+      };
+    }
     // Set the list of samples (sampleList), clearing any existing list
     case 'UPDATE_SAMPLE_LIST': {
       const { sampleList, order } = action;
@@ -35,6 +35,7 @@ import {
   addDiffractionPlanAction,
   setSampleAttribute,
   fetchQueue,
+  applyQueueChange,
 } from './actions/queue';
 import { collapseItem, showResumeQueueDialog } from './actions/queueGUI';
 import { setLoading, showConnectionLostDialog } from './actions/general';
@@ -47,7 +48,11 @@ import {
 
 import { incChatMessageCount, getRaState } from './actions/remoteAccess';
 
-import { forcedSignout, getLoginInfo } from './actions/login';
+import {
+  forcedSignout,
+  getInitialState,
+  getLoginInfo,
+} from './actions/login';
 
 import {
   setSCState,
@@ -67,6 +72,36 @@ import { CLICK_CENTRING } from './constants';
 import { sendRefreshSession } from './api/login';
 import { store } from './store';
 
+const TYPED_ARRAYS = { int32: Int32Array, float64: Float64Array };
+
+// Replaces, in place, the numeric arrays the server sent as binary buffers
+// (see pack_arrays) with arrays
+function unpackArrays(data) {
+  if (
+    data === null ||
+    typeof data !== 'object' ||
+    data instanceof ArrayBuffer
+  ) {
+    return;
+  }
+
+  Object.entries(data).forEach(([key, value]) => {
+    if (value && value.__array__ in TYPED_ARRAYS) {
+      data[key] = Array.from(new TYPED_ARRAYS[value.__array__](value.data));
+    } else {
+      unpackArrays(value);
+    }
+  });
+}
+
+// Events sent together by the server (see EmitBatcher), handled as if they
+// were received one by one
+function handleEvents(socket, events) {
+  events.forEach(([event, ...args]) => {
+    socket.listeners(event).forEach((listener) => listener(...args));
+  });
+}
+
 class ServerIO {
   constructor() {
     this.hwrSocket = null;
@@ -75,6 +110,12 @@ class ServerIO {
     this.hwrsid = null;
     this.connected = false;
     this.initialized = false;
+    // Namespace -> {log, seq} of the last event received, when the server
+    // numbers events (see EventLog)
+    this.lastStamps = {};
+    // Set when the server dropped events for this client (see
+    // BackpressureEmitter), the state is reloaded when reconnecting
+    this.resyncRequested = false;
 
     this.uiStorage = {
       setItem: (key, value) => {
@@ -106,6 +147,51 @@ class ServerIO {
     });
   }
 
+  // Batch of events, on the form {log, seq, events} if the server numbers
+  // events
+  handleBatch(socket, batch) {
+    if (Array.isArray(batch)) {
+      handleEvents(socket, batch);
+      return;
+    }
+
+    const last = this.lastStamps[socket.nsp];
+
+    if (!last || last.log !== batch.log || batch.seq > last.seq) {
+      this.lastStamps[socket.nsp] = { log: batch.log, seq: batch.seq };
+    }
+
+    handleEvents(socket, batch.events || []);
+  }
+
+  // Asks the server for the events emitted while disconnected, the state is
+  // only reloaded if they are no longer available
+  replay(socket) {
+    const last = this.lastStamps[socket.nsp];
+
+    if (!last) {
+      if (this.resyncRequested && socket === this.hwrSocket) {
+        this.resyncRequested = false;
+        this.dispatch(getInitialState());
+      }
+
+      return;
+    }
+
+    if (socket === this.hwrSocket) {
+      this.resyncRequested = false;
+    }
+
+    socket.emit('replay', last, (batch) => {
+      if (batch.reset) {
+        this.lastStamps[socket.nsp] = { log: batch.log, seq: batch.seq };
+        this.dispatch(getInitialState());
+      } else {
+        this.handleBatch(socket, batch);
+      }
+    });
+  }
+
   disconnect() {
     this.connected = false;
     this.hwrSocket.close();
@@ -152,6 +238,25 @@ class ServerIO {
       this.dispatch(addLogRecord(record));
     });
 
+    this.loggingSocket.on('batch', (batch) => {
+      this.handleBatch(this.loggingSocket, batch);
+    });
+
+    this.hwrSocket.on('batch', (batch) => {
+      this.handleBatch(this.hwrSocket, batch);
+    });
+
+    // Receive numeric arrays as binary buffers, unpacked before the event
+    // handlers are called
+    [this.hwrSocket, this.loggingSocket].forEach((socket) => {
+      socket.prependAny((event, ...args) => args.forEach(unpackArrays));
+      socket.on('connect', () => socket.emit('set_encoding', 'binary'));
+    });
+
+    this.loggingSocket.on('connect', () => {
+      this.replay(this.loggingSocket);
+    });
+
     this.loggingSocket.on('disconnect', (reason) => {
       if (reason === 'io server disconnect') {
         const socket = this.loggingSocket;
@@ -282,6 +387,10 @@ class ServerIO {
       }
     });
 
+    this.hwrSocket.on('queue_change', (change) => {
+      this.dispatch(applyQueueChange(change));
+    });
+
     this.hwrSocket.on('sc', (record) => {
       switch (record.signal) {
         case 'operatingSampleChanger': {
@@ -382,6 +491,12 @@ class ServerIO {
     this.hwrSocket.on('connect', () => {
       this.connected = true;
       this.dispatch(showConnectionLostDialog(false));
+
+      this.replay(this.hwrSocket);
+    });
+
+    this.hwrSocket.on('resync', () => {
+      this.resyncRequested = true;
     });
 
     this.hwrSocket.on('resumeQueueDialog', () => {